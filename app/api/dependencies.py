@@ -2,6 +2,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from app.core.security import decode_token
+from app.core.context import get_request_context
 from app.db.session import get_db
 from app.models.models import User
 from typing import Optional
@@ -9,12 +10,8 @@ from typing import Optional
 security = HTTPBearer()
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user from JWT token."""
-    token = credentials.credentials
+def verify_access_token(token: str) -> dict:
+    """Verified access token claims, or 401. Does not touch the database."""
     payload = decode_token(token)
     
     if payload is None:
@@ -30,13 +27,29 @@ async def get_current_user(
             detail="Invalid token type",
         )
     
-    user_id: str = payload.get("sub")
-    if user_id is None:
+    if payload.get("sub") is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
         )
     
+    return payload
+
+
+async def get_token_payload(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+) -> dict:
+    """Verified access token claims. Does not touch the database."""
+    return verify_access_token(credentials.credentials)
+
+
+async def get_current_user(
+    payload: dict = Depends(get_token_payload),
+    db: Session = Depends(get_db)
+) -> User:
+    """Get current authenticated user from JWT token."""
+    user_id: str = payload["sub"]
+    
     user = db.query(User).filter(User.id == user_id).first()
     if user is None:
         raise HTTPException(
@@ -50,6 +63,10 @@ async def get_current_user(
             detail="Inactive user",
         )
     
+    ctx = get_request_context()
+    if ctx is not None:
+        ctx.user_role = user.role
+    
     return user
 
 
@@ -60,7 +77,24 @@ async def get_current_active_user(
     return current_user
 
 
+def require_role_claim(role: str, detail: str):
+    """
+    Reject tokens whose embedded role claim doesn't match, before the user is loaded.
+    Tokens without a role claim fall through to the database-backed check.
+    """
+    async def check(payload: dict = Depends(get_token_payload)) -> dict:
+        claimed = payload.get("role")
+        if claimed is not None and claimed != role:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=detail,
+            )
+        return payload
+    return check
+
+
 async def get_current_customer(
+    claims: dict = Depends(require_role_claim("customer", "Customer access required")),
     current_user: User = Depends(get_current_user)
 ) -> User:
     """Get current user if they are a customer."""
@@ -73,6 +107,7 @@ async def get_current_customer(
 
 
 async def get_current_technician(
+    claims: dict = Depends(require_role_claim("technician", "Technician access required")),
     current_user: User = Depends(get_current_user)
 ) -> User:
     """Get current user if they are a technician."""
@@ -85,6 +120,7 @@ async def get_current_technician(
 
 
 async def get_current_admin(
+    claims: dict = Depends(require_role_claim("admin", "Admin access required")),
     current_user: User = Depends(get_current_user)
 ) -> User:
     """Get current user if they are an admin."""
@@ -0,0 +1,168 @@
+import base64
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import func, literal_column, or_, text, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, defer
+from app.api.dependencies import get_current_admin
+from app.core.cache import TTLCache
+from app.core.chat_knowledge import knowledge_index
+from app.core.config import get_settings
+from app.core.events import broker
+from app.db.session import get_db
+from app.models.models import ARTICLE_SEARCH_DOCUMENT, Article, User
+from app.schemas.schemas import (
+    ArticleCreate,
+    ArticleDetailResponse,
+    ArticleListResponse,
+    ArticleResponse,
+    ArticleUpdate,
+)
+
+router = APIRouter(prefix="/articles", tags=["Articles"])
+settings = get_settings()
+
+# slug -> rendered ArticleDetailResponse JSON
+article_page_cache = TTLCache(max_size=settings.ARTICLE_CACHE_MAX_ENTRIES, ttl_seconds=settings.ARTICLE_CACHE_SECONDS)
+
+
+def is_published():
+    return Article.published_at.is_not(None), Article.published_at <= datetime.now(timezone.utc)
+
+
+def article_summaries(db: Session):
+    """Published articles for list views, without loading the (large) content column."""
+    return db.query(Article).options(defer(Article.content)).filter(*is_published())
+
+
+def encode_cursor(article: Article) -> str:
+    return base64.urlsafe_b64encode(f"{article.published_at.isoformat()}|{article.id}".encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        published_at, article_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(published_at), uuid.UUID(article_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+# Internal topic: every worker drops its cached copies of the articles named in the event
+ARTICLE_CHANGED_TOPIC = "internal:articles.changed"
+
+
+def drop_cached_articles(event: dict):
+    for slug in event["slugs"]:
+        article_page_cache.pop(slug)
+    knowledge_index.invalidate()
+
+
+broker.add_handler(ARTICLE_CHANGED_TOPIC, drop_cached_articles)
+
+
+async def invalidate_article(*slugs: str):
+    """Drop the articles' cached pages here and, through the Redis event channel, in every other worker."""
+    await broker.publish([ARTICLE_CHANGED_TOPIC], {"type": "articles.changed", "slugs": list(slugs)})
+
+
+@router.get("", response_model=ArticleListResponse)
+async def list_articles(
+    limit: int = Query(10, ge=1, le=settings.ARTICLE_PAGE_MAX_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Published articles, newest first. Pages by keyset (published_at, id), so deep pages
+    cost the same as the first; follow `next_cursor` for the next page.
+    """
+    query = article_summaries(db)
+    if cursor:
+        query = query.filter(tuple_(Article.published_at, Article.id) < tuple_(*decode_cursor(cursor)))
+    articles = query.order_by(Article.published_at.desc(), Article.id.desc()).limit(limit + 1).all()
+
+    next_cursor = encode_cursor(articles[limit - 1]) if len(articles) > limit else None
+    return ArticleListResponse(
+        items=[ArticleResponse.from_orm(article) for article in articles[:limit]],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get("/search", response_model=List[ArticleResponse])
+async def search_articles(
+    q: str = Query(..., min_length=2, max_length=200),
+    limit: int = Query(10, ge=1, le=settings.ARTICLE_PAGE_MAX_SIZE),
+    db: Session = Depends(get_db)
+):
+    """Full-text search over published articles, best matches first."""
+    query = article_summaries(db)
+    if db.get_bind().dialect.name == "postgresql":
+        document = text(ARTICLE_SEARCH_DOCUMENT)
+        search_query = func.websearch_to_tsquery(literal_column("'indonesian'"), q)
+        query = query.filter(document.op("@@")(search_query)).order_by(
+            func.ts_rank(document, search_query).desc(), Article.published_at.desc()
+        )
+    else:
+        pattern = f"%{q}%"
+        query = query.filter(
+            or_(Article.title.ilike(pattern), Article.excerpt.ilike(pattern), Article.content.ilike(pattern))
+        ).order_by(Article.published_at.desc())
+    return [ArticleResponse.from_orm(article) for article in query.limit(limit).all()]
+
+
+@router.get("/{slug}", response_model=ArticleDetailResponse)
+async def get_article(slug: str, db: Session = Depends(get_db)):
+    """Article by slug. Rendered pages are cached per worker until the article is edited."""
+    body = article_page_cache.get(slug)
+    if body is None:
+        article = db.query(Article).filter(Article.slug == slug, *is_published()).first()
+        if not article:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Article not found")
+        body = ArticleDetailResponse.from_orm(article).model_dump_json()
+        article_page_cache.set(slug, body)
+    return Response(content=body, media_type="application/json")
+
+
+@router.post("", response_model=ArticleDetailResponse, status_code=status.HTTP_201_CREATED)
+async def create_article(
+    data: ArticleCreate,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Create an article. Admin only."""
+    article = Article(**data.dict(), author_id=current_admin.id)
+    db.add(article)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Slug already exists")
+    db.refresh(article)
+    await invalidate_article(article.slug)
+    return ArticleDetailResponse.from_orm(article)
+
+
+@router.patch("/{article_id}", response_model=ArticleDetailResponse)
+async def update_article(
+    article_id: uuid.UUID,
+    data: ArticleUpdate,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Update an article. Admin only."""
+    article = db.query(Article).filter(Article.id == article_id).first()
+    if not article:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Article not found")
+
+    old_slug = article.slug
+    for field, value in data.dict(exclude_unset=True).items():
+        setattr(article, field, value)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Slug already exists")
+    db.refresh(article)
+    await invalidate_article(old_slug, article.slug)
+    return ArticleDetailResponse.from_orm(article)
@@ -1,62 +1,138 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import hashlib
+import logging
+import time
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from app.db.session import get_db
+from app.db.dialect import dialect_insert
 from app.models.models import User, Technician
-from app.schemas.schemas import UserCreate, UserLogin, UserResponse, TokenResponse
-from app.core.security import verify_password, get_password_hash, create_access_token, create_refresh_token
+from app.schemas.schemas import UserCreate, UserLogin, UserResponse, TokenResponse, RefreshTokenRequest
+from app.core.security import (
+    verify_password, get_password_hash, create_access_token, create_refresh_token, decode_token, access_token_claims,
+    make_unusable_password,
+)
+from app.core.token_store import refresh_token_store, TOKEN_OK, TOKEN_REUSED
 from app.api.dependencies import get_current_user
+from app.core.cache import TTLCache
+from app.core.http import get_http_client
+from app.core.resilience import UpstreamUnavailable, google_guard, service_unavailable
+from app.core.rate_limit import limit_auth_by_ip, limit_auth_by_email
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
+logger = logging.getLogger("perabox.auth")
+
+GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v2/userinfo"
+
+# sha256(Google access token) -> userinfo. Clients retrying sign-in reuse the same token.
+google_userinfo_cache = TTLCache(max_size=10_000, ttl_seconds=60)
+
+
+async def _get_google_userinfo(access_token_google: str) -> httpx.Response:
+    resp = await get_http_client().get(
+        GOOGLE_USERINFO_URL,
+        headers={"Authorization": f"Bearer {access_token_google}"},
+        timeout=google_guard.time_left(),
+    )
+    # Google-side errors count against the circuit; a rejected token doesn't
+    if resp.status_code >= 500:
+        resp.raise_for_status()
+    return resp
+
+
+async def fetch_google_userinfo(access_token_google: str) -> dict:
+    """Resolve a Google access token to its userinfo, with a short-lived cache."""
+    cache_key = hashlib.sha256(access_token_google.encode()).hexdigest()
+    cached = google_userinfo_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        resp = await google_guard.call("userinfo", _get_google_userinfo, access_token_google)
+    except UpstreamUnavailable as e:
+        raise service_unavailable(e, "Google sign-in is unavailable, please try again shortly")
+    except httpx.HTTPError:
+        logger.warning("auth.google_userinfo_failed", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Google sign-in failed, please try again")
+    if resp.status_code != 200:
+        logger.info("auth.google_token_rejected", extra={"status_code": resp.status_code})
+        raise HTTPException(status_code=401, detail="Invalid Google token")
+
+    google_data = resp.json()
+    google_userinfo_cache.set(cache_key, google_data)
+    return google_data
 
 
 @router.post("/register", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, request: Request, db: Session = Depends(get_db)):
     """Register a new user."""
-    # Check if email already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
-    if existing_user:
+    await limit_auth_by_ip(request, "register")
+    
+    # Cheap indexed lookup first, so repeated registrations of a taken email don't each pay
+    # for a bcrypt hash. ON CONFLICT DO NOTHING below still settles a race between two
+    # registrations of the same new email: the loser gets no row back.
+    if db.query(User.id).filter(User.email == user_data.email).first() is not None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered",
         )
-    
-    # Create new user
     hashed_password = get_password_hash(user_data.password)
-    new_user = User(
-        email=user_data.email,
-        password_hash=hashed_password,
-        full_name=user_data.full_name,
-        phone=user_data.phone,
-        role=user_data.role,
-    )
     
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    stmt = (
+        dialect_insert(db, User)
+        .values(
+            email=user_data.email,
+            password_hash=hashed_password,
+            full_name=user_data.full_name,
+            phone=user_data.phone,
+            role=user_data.role,
+        )
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User)
+    )
+    new_user = db.scalars(stmt).first()
+    if new_user is None:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered",
+        )
     
-    # If technician, create technician profile
+    # If technician, create technician profile in the same transaction
     if user_data.role == "technician":
         technician = Technician(user_id=new_user.id)
         db.add(technician)
-        db.commit()
+        db.flush()
+        # The user row is brand new, so it has no other profile; skip the lazy load
+        set_committed_value(new_user, "technician", technician)
     
-    # Generate tokens
-    access_token = create_access_token(data={"sub": str(new_user.id)})
+    # Generate tokens and serialize before commit expires the loaded attributes
+    access_token = create_access_token(data=access_token_claims(new_user))
     refresh_token = create_refresh_token(data={"sub": str(new_user.id)})
-    
-    return TokenResponse(
+    response = TokenResponse(
         access_token=access_token,
         refresh_token=refresh_token,
         user=UserResponse.from_orm(new_user),
     )
+    
+    db.commit()
+    logger.info("auth.registered", extra={"user_id": str(response.user.id), "role": response.user.role})
+    
+    return response
 
 
 @router.post("/login", response_model=TokenResponse)
-async def login(credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(credentials: UserLogin, request: Request, db: Session = Depends(get_db)):
     """Login user and return JWT tokens."""
+    # Reject bursts before the DB lookup and bcrypt verification
+    await limit_auth_by_ip(request, "login")
+    await limit_auth_by_email(credentials.email, "login")
+    
     # Find user by email
     user = db.query(User).filter(User.email == credentials.email).first()
     if not user:
+        logger.info("auth.login_failed", extra={"email": credentials.email, "reason": "unknown_email"})
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -64,6 +140,7 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
     
     # Verify password
     if not verify_password(credentials.password, user.password_hash):
+        logger.info("auth.login_failed", extra={"user_id": str(user.id), "reason": "bad_password"})
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -71,13 +148,14 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
     
     # Check if user is active
     if not user.is_active:
+        logger.info("auth.login_failed", extra={"user_id": str(user.id), "reason": "inactive"})
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User account is inactive",
         )
     
     # Generate tokens
-    access_token = create_access_token(data={"sub": str(user.id)})
+    access_token = create_access_token(data=access_token_claims(user))
     refresh_token = create_refresh_token(data={"sub": str(user.id)})
     
     return TokenResponse(
@@ -88,24 +166,15 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.post("/google", response_model=TokenResponse)
-async def google_login(payload: dict, db: Session = Depends(get_db)):
+async def google_login(payload: dict, request: Request, db: Session = Depends(get_db)):
     """Login or register via Google OAuth access token."""
-    import httpx, secrets
+    await limit_auth_by_ip(request, "google")
 
     access_token_google = payload.get("access_token")
     if not access_token_google:
         raise HTTPException(status_code=400, detail="Missing access_token")
 
-    # Fetch Google userinfo
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            "https://www.googleapis.com/oauth2/v2/userinfo",
-            headers={"Authorization": f"Bearer {access_token_google}"},
-        )
-    if resp.status_code != 200:
-        raise HTTPException(status_code=401, detail="Invalid Google token")
-
-    google_data = resp.json()
+    google_data = await fetch_google_userinfo(access_token_google)
     email = google_data.get("email")
     full_name = google_data.get("name") or (email.split("@")[0] if email else "User")
     picture = google_data.get("picture")
@@ -120,7 +189,7 @@ async def google_login(payload: dict, db: Session = Depends(get_db)):
         # Auto-register with Google data
         user = User(
             email=email,
-            password_hash=get_password_hash(secrets.token_hex(32)),
+            password_hash=make_unusable_password(),
             full_name=full_name,
             phone="",
             role="customer",
@@ -131,6 +200,7 @@ async def google_login(payload: dict, db: Session = Depends(get_db)):
         db.add(user)
         db.commit()
         db.refresh(user)
+        logger.info("auth.google_registered", extra={"user_id": str(user.id)})
     else:
         # Sync Google avatar if profile has none
         if picture and not user.avatar_url:
@@ -141,7 +211,7 @@ async def google_login(payload: dict, db: Session = Depends(get_db)):
     if not user.is_active:
         raise HTTPException(status_code=403, detail="Account is inactive")
 
-    access_token = create_access_token(data={"sub": str(user.id)})
+    access_token = create_access_token(data=access_token_claims(user))
     refresh_token = create_refresh_token(data={"sub": str(user.id)})
 
     return TokenResponse(
@@ -151,6 +221,67 @@ async def google_login(payload: dict, db: Session = Depends(get_db)):
     )
 
 
+def _decode_refresh_token(token: str) -> dict:
+    payload = decode_token(token)
+    if (
+        payload is None
+        or payload.get("type") != "refresh"
+        or not payload.get("sub")
+        or not payload.get("jti")
+        or not payload.get("fam")
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+        )
+    return payload
+
+
+@router.post("/refresh", response_model=TokenResponse)
+async def refresh_tokens(body: RefreshTokenRequest, db: Session = Depends(get_db)):
+    """
+    Exchange a refresh token for a new access/refresh token pair.
+    
+    Refresh tokens are single-use: each call rotates to a new one. Presenting an
+    already-used token revokes the whole session, forcing a fresh login.
+    """
+    payload = _decode_refresh_token(body.refresh_token)
+    
+    outcome = await refresh_token_store.consume(
+        payload["jti"], payload["fam"], ttl_seconds=int(payload["exp"] - time.time())
+    )
+    if outcome != TOKEN_OK:
+        if outcome == TOKEN_REUSED:
+            logger.warning("auth.refresh_token_reused", extra={"user_id": payload["sub"], "family": payload["fam"]})
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token has been revoked",
+        )
+    
+    user = db.query(User).filter(User.id == payload["sub"]).first()
+    if not user or not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+        )
+    
+    access_token = create_access_token(data=access_token_claims(user))
+    refresh_token = create_refresh_token(data={"sub": str(user.id)}, family_id=payload["fam"])
+    
+    return TokenResponse(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        user=UserResponse.from_orm(user),
+    )
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(body: RefreshTokenRequest):
+    """Revoke the session the refresh token belongs to."""
+    payload = _decode_refresh_token(body.refresh_token)
+    await refresh_token_store.revoke_family(payload["fam"])
+
+
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
     """Get current user information."""
@@ -1,15 +1,48 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import insert, select, update
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from typing import List, Optional
+from app.core.cache import TTLCache
+from app.core.config import get_settings
 from app.db.session import get_db
 from app.models.models import Booking, Service, Payment, User, Technician
-from app.schemas.schemas import BookingCreate, BookingResponse, BookingDetailResponse
-from app.api.dependencies import get_current_user, get_current_customer, get_current_admin
+from app.schemas.schemas import (
+    BookingCreate, BookingResponse, BookingDetailResponse,
+    BulkBookingStatusRequest, BulkAssignTechnicianRequest, BulkBookingOutcome, BulkBookingResult,
+)
+from app.core.booking_state import (
+    BOOKING_STATUSES, ASSIGNABLE_BOOKING_STATUSES,
+    can_transition, source_statuses, status_values, version_bump, compare_and_set_booking,
+    booking_status_event, publish_booking_event,
+)
+from app.core.jobs import enqueue_job
+from app.api.dependencies import get_current_user, get_current_customer, get_current_admin, get_token_payload
 import uuid
 from pydantic import BaseModel
+import logging
 from datetime import date
+from decimal import Decimal
 
 router = APIRouter(prefix="/bookings", tags=["Bookings"])
+settings = get_settings()
+logger = logging.getLogger("perabox.bookings")
+
+
+# service_id -> base price of an active service
+service_price_cache = TTLCache(max_size=10_000, ttl_seconds=settings.SERVICE_PRICE_CACHE_SECONDS)
+
+
+def get_service_price(db: Session, service_id: uuid.UUID) -> Optional[Decimal]:
+    """Base price of an active service, or None if it doesn't exist or is inactive."""
+    price = service_price_cache.get(service_id)
+    if price is None:
+        price = db.scalar(
+            select(Service.base_price).where(Service.id == service_id, Service.is_active == True)
+        )
+        if price is not None:
+            service_price_cache.set(service_id, price)
+    return price
 
 
 @router.post("", response_model=BookingResponse, status_code=status.HTTP_201_CREATED)
@@ -28,66 +61,60 @@ async def create_booking(
     - Business logic (price calculation)
     - Response serialization
     """
-    # Validate service exists
-    service = db.query(Service).filter(
-        Service.id == booking_data.service_id,
-        Service.is_active == True
-    ).first()
-    
-    if not service:
+    # Validate service exists (cached, so repeat bookings skip the lookup)
+    base_price = get_service_price(db, booking_data.service_id)
+    if base_price is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Service not found",
         )
     
-    # Create booking
-    booking_total = booking_data.total_price if booking_data.total_price is not None else service.base_price
-    
-    new_booking = Booking(
-        customer_id=current_user.id,
-        service_id=booking_data.service_id,
-        technician_id=booking_data.technician_id,
-        scheduled_date=booking_data.scheduled_date,
-        scheduled_time=booking_data.scheduled_time,
-        address=booking_data.address,
-        notes=booking_data.notes,
-        total_price=booking_total,
-        status="pending",
-    )
-    
-    db.add(new_booking)
-    db.flush()  # Get booking ID without committing
-    
-    # Create associated payment record
-    payment = Payment(
-        booking_id=new_booking.id,
-        amount=booking_total,
-        status="pending",
-    )
-    
-    db.add(payment)
+    booking_total = booking_data.total_price if booking_data.total_price is not None else base_price
     
-    # Commit transaction
+    # One transaction, two statements: each INSERT returns its row (server defaults
+    # included), so nothing has to be flushed, refreshed or lazy-loaded afterwards.
     try:
+        new_booking = db.scalars(
+            insert(Booking)
+            .values(
+                id=uuid.uuid4(),
+                customer_id=current_user.id,
+                service_id=booking_data.service_id,
+                technician_id=booking_data.technician_id,
+                scheduled_date=booking_data.scheduled_date,
+                scheduled_time=booking_data.scheduled_time,
+                address=booking_data.address,
+                notes=booking_data.notes,
+                total_price=booking_total,
+                status="pending",
+            )
+            .returning(Booking)
+        ).one()
+        payment = db.scalars(
+            insert(Payment)
+            .values(id=uuid.uuid4(), booking_id=new_booking.id, amount=booking_total, status="pending")
+            .returning(Payment)
+        ).one()
+        set_committed_value(new_booking, "payment", payment)
+        
+        # Serialize before commit expires the returned attributes
+        response = BookingResponse.from_orm(new_booking)
         db.commit()
-        db.refresh(new_booking)
-    except Exception as e:
+    except Exception:
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to create booking",
         )
     
-    # Reload booking to include payments relationship if needed by from_orm
-    db.refresh(new_booking)
-    
-    return BookingResponse.from_orm(new_booking)
+    return response
 
 
 @router.get("", response_model=List[BookingDetailResponse])
 async def get_user_bookings(
     status: Optional[str] = None,
     date: Optional[date] = None,
+    token: dict = Depends(get_token_payload),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -97,13 +124,16 @@ async def get_user_bookings(
     if current_user.role == "customer":
         query = query.filter(Booking.customer_id == current_user.id)
     elif current_user.role == "technician":
-        # Get technician ID
-        technician = db.query(Technician).filter(
-            Technician.user_id == current_user.id
-        ).first()
-        if not technician:
-            return []
-        query = query.filter(Booking.technician_id == technician.id)
+        # Technician ID is embedded in the token; older tokens fall back to a lookup
+        technician_id = token.get("technician_id")
+        if technician_id is None:
+            technician = db.query(Technician).filter(
+                Technician.user_id == current_user.id
+            ).first()
+            if not technician:
+                return []
+            technician_id = technician.id
+        query = query.filter(Booking.technician_id == technician_id)
     else:  # admin
         # Admin sees all, applies filters
         pass
@@ -119,6 +149,109 @@ async def get_user_bookings(
     return [BookingDetailResponse.from_orm(booking) for booking in bookings]
 
 
+def _bulk_outcomes(db: Session, booking_ids: List[uuid.UUID], updated_rows) -> BulkBookingResult:
+    """
+    Per-id outcomes of a bulk UPDATE. Ids the UPDATE didn't return were either missing or
+    in a state the change doesn't apply to; one SELECT (only when some failed) tells which.
+    """
+    updated = {row.id: row.status for row in updated_rows}
+    current = {}
+    skipped = [booking_id for booking_id in booking_ids if booking_id not in updated]
+    if skipped:
+        current = dict(db.execute(select(Booking.id, Booking.status).where(Booking.id.in_(skipped))).all())
+    
+    results = []
+    for booking_id in booking_ids:
+        if booking_id in updated:
+            results.append(BulkBookingOutcome(booking_id=booking_id, outcome="updated", status=updated[booking_id]))
+        elif booking_id in current:
+            results.append(
+                BulkBookingOutcome(booking_id=booking_id, outcome="invalid_transition", status=current[booking_id])
+            )
+        else:
+            results.append(BulkBookingOutcome(booking_id=booking_id, outcome="not_found"))
+    return BulkBookingResult(updated=len(updated), results=results)
+
+
+@router.patch("/bulk/status", response_model=BulkBookingResult)
+async def bulk_update_booking_status(
+    request: BulkBookingStatusRequest,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Set the status of many bookings at once. Admin only.
+    
+    Applied with a single UPDATE; bookings whose current status can't move to the target
+    (see BOOKING_TRANSITIONS) are left unchanged and reported as invalid_transition.
+    """
+    if request.status not in BOOKING_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid status. Must be one of: {', '.join(BOOKING_STATUSES)}",
+        )
+    booking_ids = list(dict.fromkeys(request.booking_ids))
+    
+    rows = db.execute(
+        update(Booking)
+        .where(Booking.id.in_(booking_ids), Booking.status.in_(source_statuses(request.status)))
+        .values(**version_bump(), **status_values(request.status))
+        .returning(Booking.id, Booking.customer_id, Booking.technician_id, Booking.status, Booking.version)
+        .execution_options(synchronize_session=False)
+    ).all()
+    result = _bulk_outcomes(db, booking_ids, rows)
+    if request.status == "cancelled":
+        for row in rows:
+            enqueue_job(db, "payments.expire_transaction", {"booking_id": str(row.id)})
+    db.commit()
+    for row in rows:
+        await publish_booking_event(booking_status_event(row))
+    
+    logger.info(
+        "bookings.bulk_status",
+        extra={"status": request.status, "requested": len(booking_ids), "updated": result.updated},
+    )
+    return result
+
+
+@router.patch("/bulk/assign", response_model=BulkBookingResult)
+async def bulk_assign_technician(
+    request: BulkAssignTechnicianRequest,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Assign one technician to many bookings at once, confirming them. Admin only.
+    
+    Only pending or confirmed bookings are assigned; others are reported as invalid_transition.
+    """
+    technician_exists = db.scalar(select(Technician.id).where(Technician.id == request.technician_id))
+    if technician_exists is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Technician not found",
+        )
+    booking_ids = list(dict.fromkeys(request.booking_ids))
+    
+    rows = db.execute(
+        update(Booking)
+        .where(Booking.id.in_(booking_ids), Booking.status.in_(ASSIGNABLE_BOOKING_STATUSES))
+        .values(**version_bump(), technician_id=request.technician_id, status="confirmed")
+        .returning(Booking.id, Booking.customer_id, Booking.technician_id, Booking.status, Booking.version)
+        .execution_options(synchronize_session=False)
+    ).all()
+    result = _bulk_outcomes(db, booking_ids, rows)
+    db.commit()
+    for row in rows:
+        await publish_booking_event(booking_status_event(row))
+    
+    logger.info(
+        "bookings.bulk_assign",
+        extra={"technician_id": str(request.technician_id), "requested": len(booking_ids), "updated": result.updated},
+    )
+    return result
+
+
 @router.get("/{booking_id}", response_model=BookingDetailResponse)
 async def get_booking(
     booking_id: uuid.UUID,
@@ -148,10 +281,17 @@ async def get_booking(
 async def update_booking_status(
     booking_id: uuid.UUID,
     new_status: str,
+    expected_version: Optional[int] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Update booking status."""
+    """
+    Update booking status.
+    
+    Only transitions in BOOKING_TRANSITIONS are allowed. The write is a compare-and-set on the
+    status read here (and on `expected_version`, if the client sends the version it last saw),
+    so a concurrent change by another admin, technician or payment webhook returns 409.
+    """
     booking = db.query(Booking).filter(Booking.id == booking_id).first()
     
     if not booking:
@@ -161,11 +301,10 @@ async def update_booking_status(
         )
     
     # Validate status
-    valid_statuses = ["pending", "confirmed", "in_progress", "completed", "cancelled"]
-    if new_status not in valid_statuses:
+    if new_status not in BOOKING_STATUSES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}",
+            detail=f"Invalid status. Must be one of: {', '.join(BOOKING_STATUSES)}",
         )
     
     # Authorization check
@@ -177,19 +316,35 @@ async def update_booking_status(
                 detail="Not authorized",
             )
     
-    booking.status = new_status
+    if not can_transition(booking.status, new_status):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Cannot change booking status from {booking.status} to {new_status}",
+        )
     
-    if new_status == "completed":
-        from datetime import datetime
-        booking.completed_at = datetime.utcnow()
+    updated = compare_and_set_booking(
+        db, booking_id, [booking.status], status_values(new_status), expected_version=expected_version
+    )
+    if updated is None:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Booking was modified by another request. Reload and try again.",
+        )
+    
+    # Expiring the Midtrans charge runs after commit, off the request path
+    if new_status == "cancelled":
+        enqueue_job(db, "payments.expire_transaction", {"booking_id": str(booking_id)})
     
+    response = BookingResponse.from_orm(updated)
     db.commit()
-    db.refresh(booking)
+    await publish_booking_event(booking_status_event(response))
     
-    return BookingResponse.from_orm(booking)
+    return response
 
 class AssignTechnicianRequest(BaseModel):
     technician_id: uuid.UUID
+    expected_version: Optional[int] = None
 
 @router.patch("/{booking_id}/assign")
 async def assign_technician(
@@ -198,9 +353,9 @@ async def assign_technician(
     current_admin: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
-    """Assign a technician to a booking. Admin only."""
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
-    if not booking:
+    """Assign a technician to a booking and confirm it. Admin only."""
+    booking_status = db.scalar(select(Booking.status).where(Booking.id == booking_id))
+    if booking_status is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Booking not found",
@@ -212,11 +367,30 @@ async def assign_technician(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Technician not found",
         )
-        
-    booking.technician_id = request.technician_id
-    booking.status = "confirmed" # Auto confirm when tech is assigned
     
+    if booking_status not in ASSIGNABLE_BOOKING_STATUSES:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Cannot assign a technician to a {booking_status} booking",
+        )
+    
+    # Auto confirm when tech is assigned
+    updated = compare_and_set_booking(
+        db,
+        booking_id,
+        ASSIGNABLE_BOOKING_STATUSES,
+        {"technician_id": request.technician_id, "status": "confirmed"},
+        expected_version=request.expected_version,
+    )
+    if updated is None:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Booking was modified by another request. Reload and try again.",
+        )
+    
+    response = BookingResponse.from_orm(updated)
     db.commit()
-    db.refresh(booking)
+    await publish_booking_event(booking_status_event(response))
     
-    return BookingResponse.from_orm(booking)
+    return response
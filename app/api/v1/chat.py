@@ -1,23 +1,40 @@
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import os
+import logging
 import google.generativeai as genai
 from dotenv import load_dotenv
 
 load_dotenv()
 
 router = APIRouter(tags=["Chat"])
+logger = logging.getLogger("perabox.chat")
 
 # Configure Google Gemini
 from app.core.config import get_settings
+from app.core.cache import TTLCache
+from app.core.chat_sessions import ChatSession, chat_sessions, summary_prompt
+from app.core.chat_cache import chat_response_cache
+from app.core.chat_intents import catalog_index, match_intent
+from app.core.chat_knowledge import knowledge_index
+from app.core.metrics import chat_messages_total
+from app.core.resilience import UpstreamUnavailable, gemini_guard, service_unavailable
+from app.db.session import get_db
+from sqlalchemy.orm import Session
 
 settings = get_settings()
 
 # Configure Google Gemini
 def configure_genai():
     api_key = os.getenv("GOOGLE_API_KEY") or settings.GOOGLE_API_KEY
-    if api_key:
+    if api_key and settings.GEMINI_API_ENDPOINT:
+        genai.configure(
+            api_key=api_key,
+            transport="rest",
+            client_options={"api_endpoint": settings.GEMINI_API_ENDPOINT},
+        )
+    elif api_key:
         genai.configure(api_key=api_key)
     return api_key
 
@@ -26,25 +43,26 @@ configure_genai()
 
 class ChatMessage(BaseModel):
     role: str # 'user' or 'model'
-    content: str
+    content: str = Field(..., max_length=settings.CHAT_MAX_MESSAGE_CHARS * 2)
 
 class ChatRequest(BaseModel):
-    message: str
-    history: List[ChatMessage] = []
+    message: str = Field(..., min_length=1, max_length=settings.CHAT_MAX_MESSAGE_CHARS)
+    # Returned by the previous reply; the server keeps the conversation history
+    session_id: Optional[str] = Field(None, max_length=64)
+    # Deprecated: only used to start a session for clients that still send the full history
+    history: List[ChatMessage] = Field(default=[], max_length=settings.CHAT_MAX_HISTORY_MESSAGES)
 
 class ChatResponse(BaseModel):
     response: str
+    session_id: Optional[str] = None
 
 # System Prompt for PERABOX
 SYSTEM_INSTRUCTION = """
 You are "Pera-Bot", the official AI assistant of PERABOX.
 PERABOX is a premium homecare service platform in Indonesia.
 
-Our main services are:
-1. AC Cleaning (Cuci AC): Starts from Rp 75,000. Comprehensive cleaning of filters, evaporator, and outdoor units.
-2. AC Installation (Pasang AC): Starts from Rp 250,000. Professional installation by certified technicians.
-3. AC Repair (Perbaikan AC): Price depends on diagnostics. We fix leaks, noise, and AC not cooling.
-4. Freon Refill (Isi Freon): Starts from Rp 150,000. Using high-quality refrigerant (R32, R410A).
+Services, prices and articles relevant to the customer's question are listed under
+"PERABOX information" below; they come from our live catalog.
 
 Brand Voice:
 - Professional, helpful, and friendly.
@@ -52,83 +70,201 @@ Brand Voice:
 - Call to Action: Encourage users to click "Let's Start" or "Pesan Sekarang" to book a service.
 
 Guidelines:
-- If asked about prices not listed above, say that the final price will be determined after technician diagnostics.
+- Only quote prices given in the PERABOX information. For anything not listed there, say that
+  the final price will be determined after technician diagnostics.
 - Keep responses concise and easy to read.
 - Use emojis occasionally to stay friendly (🏠, ❄️, ✅).
 - If the user greeting, reply with a warm welcome and ask how you can help.
 """
 
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.8,
+    "top_k": 40,
+    "max_output_tokens": 1024,
+}
+
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+]
+
+# Priority list
+FAV_MODELS = ['models/gemini-1.5-flash', 'models/gemini-1.0-pro', 'models/chat-bison-001']
+
+# The model list rarely changes; don't pay a list_models round-trip on every message
+model_name_cache = TTLCache(max_size=1, ttl_seconds=3600)
+
+
+def list_generate_models() -> List[str]:
+    return [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
+
+
+async def resolve_model_name() -> str:
+    """Pick a working Gemini model, preferring FAV_MODELS."""
+    cached = model_name_cache.get("model")
+    if cached is not None:
+        return cached
+
+    # Try to find a working model dynamically
+    available_models = []
+    try:
+        available_models = await gemini_guard.call("list_models", list_generate_models)
+        logger.debug("gemini.available_models", extra={"models": available_models})
+    except Exception:
+        logger.warning("gemini.list_models_failed", exc_info=True)
+
+    model_to_use = None
+    
+    # 1. Try favorites that are actually in the available list
+    for fav in FAV_MODELS:
+        if fav in available_models:
+            model_to_use = fav
+            break
+    
+    # 2. If no favorites found, use any available model
+    if not model_to_use and available_models:
+        model_to_use = available_models[0]
+        
+    # 3. Fallback to hardcoded favorite if all else fails (not cached, so listing is retried)
+    if not model_to_use:
+        return FAV_MODELS[0]
+
+    logger.debug("gemini.model_selected", extra={"model": model_to_use})
+    model_name_cache.set("model", model_to_use)
+    return model_to_use
+
+
+def build_gemini_history(session: ChatSession, knowledge: str = "") -> List[dict]:
+    """System prompt (with retrieved snippets and the summary of older turns), then the turns within the budget."""
+    instruction = SYSTEM_INSTRUCTION
+    if knowledge:
+        instruction += f"\nPERABOX information:\n{knowledge}\n"
+    if session.summary:
+        instruction += f"\nSummary of the conversation so far:\n{session.summary}\n"
+    gemini_history = [
+        {"role": "user", "parts": [instruction]},
+        {"role": "model", "parts": [
+            "Mengerti. Saya adalah Pera-Bot, asisten AI resmi PERABOX. "
+            "Saya siap membantu pelanggan dengan informasi layanan kami."
+        ]}
+    ]
+    for turn in session.turns:
+        gemini_history.append({"role": turn["role"], "parts": [turn["content"]]})
+    return gemini_history
+
+
+async def summarize_evicted_turns(model, session: ChatSession, evicted: List[dict]):
+    """Fold turns that fell out of the history budget into the session's rolling summary."""
+    try:
+        result = await gemini_guard.call(
+            "summarize", model.generate_content, summary_prompt(session.summary, evicted),
+            request_options={"timeout": gemini_guard.time_left()},
+        )
+        words = result.text.split()
+        session.summary = " ".join(words[:settings.CHAT_SUMMARY_MAX_WORDS * 2])
+    except Exception:
+        # Keep the previous summary; only the evicted turns' details are lost
+        logger.warning("gemini.summarize_failed", exc_info=True, extra={"session_id": session.id})
+
+
+def retrieval_query(session: ChatSession, message: str) -> str:
+    """The question plus the previous one, so follow-ups ("berapa harganya?") keep their subject."""
+    previous = [t["content"] for t in session.turns if t["role"] == "user"][-1:]
+    return " ".join(previous + [message])
+
+
+async def reply_without_llm(session: ChatSession, message: str, reply: str) -> ChatResponse:
+    session.add_turn("user", message)
+    session.add_turn("model", reply)
+    await chat_sessions.save(session)
+    return ChatResponse(response=reply, session_id=session.id)
+
+
 @router.post("/chat/message", response_model=ChatResponse)
-async def chat_message(request: ChatRequest):
+async def chat_message(request: ChatRequest, db: Session = Depends(get_db)):
+    session = await chat_sessions.get(request.session_id) if request.session_id else None
+    if session is None:
+        session = ChatSession()
+        for msg in request.history:
+            session.add_turn(msg.role, msg.content)
+
+    try:
+        if settings.CHAT_LOCAL_INTENTS_ENABLED or settings.CHAT_RESPONSE_CACHE_ENABLED:
+            catalog_index.refresh_if_stale(db)
+        if settings.CHAT_RETRIEVAL_ENABLED:
+            knowledge_index.refresh_if_stale(db)
+    except Exception:
+        logger.warning("chat.catalog_refresh_failed", exc_info=True)
+    # Cached answers were grounded in the catalog and articles as they were
+    chat_response_cache.sync_catalog(hash((catalog_index.fingerprint, knowledge_index.version)))
+
+    # Greetings, prices and how-to-book are answered from the live catalog without the LLM
+    if settings.CHAT_LOCAL_INTENTS_ENABLED:
+        match = match_intent(request.message, catalog_index)
+        if match is not None:
+            chat_messages_total.labels("local", match.intent).inc()
+            return await reply_without_llm(session, request.message, match.answer)
+
+    # A first turn doesn't depend on any history, so earlier answers to the same question apply
+    first_turn = not session.turns and not session.summary
+    if first_turn and settings.CHAT_RESPONSE_CACHE_ENABLED:
+        cached, how = chat_response_cache.get(request.message)
+        if cached is not None:
+            chat_messages_total.labels("cache", how).inc()
+            return await reply_without_llm(session, request.message, cached)
+    chat_messages_total.labels("llm", "other").inc()
+
     api_key = configure_genai()
     if not api_key:
-        return ChatResponse(response="Halo! Saya Pera-Bot. (Mode Debug: GOOGLE_API_KEY tidak ditemukan di environment. Pastikan sudah input di Vercel Settings & Redeploy.)")
+        return ChatResponse(
+            response="Halo! Saya Pera-Bot. (Mode Debug: GOOGLE_API_KEY tidak ditemukan di environment. "
+                     "Pastikan sudah input di Vercel Settings & Redeploy.)"
+        )
 
     try:
-        generation_config = {
-            "temperature": 0.7,
-            "top_p": 0.8,
-            "top_k": 40,
-            "max_output_tokens": 1024,
-        }
-        
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-        ]
-
-        # Prepare history for Gemini format
-        gemini_history = [
-            {"role": "user", "parts": [SYSTEM_INSTRUCTION]},
-            {"role": "model", "parts": ["Mengerti. Saya adalah Pera-Bot, asisten AI resmi PERABOX. Saya siap membantu pelanggan dengan informasi layanan kami."]}
-        ]
-        
-        for msg in request.history:
-            gemini_history.append({"role": msg.role, "parts": [msg.content]})
-
-        # Try to find a working model dynamically
-        available_models = []
-        try:
-            for m in genai.list_models():
-                if 'generateContent' in m.supported_generation_methods:
-                    available_models.append(m.name)
-            print(f"Available Models: {available_models}")
-        except Exception as e:
-            print(f"Error listing models: {e}")
-
-        # Priority list
-        fav_models = ['models/gemini-1.5-flash', 'models/gemini-1.0-pro', 'models/chat-bison-001']
-        model_to_use = None
-        
-        # 1. Try favorites that are actually in the available list
-        for fav in fav_models:
-            if fav in available_models:
-                model_to_use = fav
-                break
-        
-        # 2. If no favorites found, use any available model
-        if not model_to_use and available_models:
-            model_to_use = available_models[0]
-            
-        # 3. Fallback to hardcoded favorite if all else fails
-        if not model_to_use:
-            model_to_use = 'models/gemini-1.5-flash'
-
-        print(f"Using model: {model_to_use}")
         model = genai.GenerativeModel(
-            model_name=model_to_use,
-            generation_config=generation_config,
-            safety_settings=safety_settings
+            model_name=await resolve_model_name(),
+            generation_config=GENERATION_CONFIG,
+            safety_settings=SAFETY_SETTINGS
         )
-        chat = model.start_chat(history=gemini_history)
-        response = chat.send_message(request.message)
-        return ChatResponse(response=response.text)
 
+        # Keep the replayed history within budget so per-turn cost stays flat
+        evicted = session.evict_over_budget(settings.CHAT_HISTORY_TOKEN_BUDGET)
+        if evicted:
+            await summarize_evicted_turns(model, session, evicted)
+
+        knowledge = ""
+        if settings.CHAT_RETRIEVAL_ENABLED:
+            knowledge = knowledge_index.context_for(
+                retrieval_query(session, request.message), settings.CHAT_RETRIEVAL_TOP_K
+            )
+        chat = model.start_chat(history=build_gemini_history(session, knowledge))
+        response = await gemini_guard.call(
+            "send_message", chat.send_message, request.message,
+            request_options={"timeout": gemini_guard.time_left()},
+        )
+        reply = response.text
+    except UpstreamUnavailable as e:
+        logger.warning("gemini.unavailable", extra={"reason": e.reason})
+        raise service_unavailable(e, "Pera-Bot sedang sibuk, silakan coba lagi sebentar lagi.")
     except Exception as e:
         error_msg = str(e)
         if "finish_reason" in error_msg and "SAFETY" in error_msg:
-             return ChatResponse(response="Maaf, saya tidak dapat menjawab pertanyaan tersebut karena melanggar panduan keamanan kami.")
+             logger.info("gemini.safety_blocked")
+             return ChatResponse(
+                 response="Maaf, saya tidak dapat menjawab pertanyaan tersebut karena melanggar panduan keamanan kami.",
+                 session_id=session.id,
+             )
         
+        logger.error("gemini.send_message_failed", exc_info=True)
         raise HTTPException(status_code=500, detail=f"AI Error: {str(e)}")
+
+    if first_turn and settings.CHAT_RESPONSE_CACHE_ENABLED:
+        chat_response_cache.set(request.message, reply)
+    session.add_turn("user", request.message)
+    session.add_turn("model", reply)
+    await chat_sessions.save(session)
+    return ChatResponse(response=reply, session_id=session.id)
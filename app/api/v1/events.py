@@ -0,0 +1,67 @@
+import asyncio
+import json
+import time
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from app.api.dependencies import verify_access_token
+from app.core.config import get_settings
+from app.core.events import broker
+
+router = APIRouter(prefix="/events", tags=["Events"])
+settings = get_settings()
+
+optional_bearer = HTTPBearer(auto_error=False)
+
+
+async def get_stream_token_payload(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer),
+    access_token: Optional[str] = Query(None, description="For EventSource clients, which can't send headers"),
+) -> dict:
+    token = credentials.credentials if credentials else access_token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return verify_access_token(token)
+
+
+def event_topics(payload: dict) -> List[str]:
+    """Topics a user may listen to, from their token claims."""
+    topics = [f"user:{payload['sub']}"]
+    if payload.get("role") == "admin":
+        topics.append("bookings")
+    elif payload.get("technician_id"):
+        topics.append(f"technician:{payload['technician_id']}")
+    return topics
+
+
+async def event_stream(topics: List[str], expires_at: float):
+    async with broker.subscribe(topics) as queue:
+        yield ": connected\n\n"
+        while time.time() < expires_at:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+@router.get("")
+async def stream_events(payload: dict = Depends(get_stream_token_payload)):
+    """
+    Server-sent events for the current user's bookings (status changes, technician
+    assignment, payment confirmation). Admins receive every booking's events.
+
+    Authenticates from the token only, so an open stream holds no database connection.
+    The stream ends when the access token expires; reconnect with a fresh one.
+    """
+    return StreamingResponse(
+        event_stream(event_topics(payload), payload["exp"]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
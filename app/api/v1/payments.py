@@ -1,5 +1,6 @@
 import uuid
 import time
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.db.session import get_db
@@ -7,10 +8,14 @@ from app.models.models import Payment, Booking
 from app.api.dependencies import get_current_user
 import midtransclient
 from app.core.config import get_settings
+from app.core.jobs import job_handler, run_async
+from app.core.resilience import UpstreamUnavailable, midtrans_guard, service_unavailable
+from app.core.booking_state import compare_and_set_booking, status_values, booking_status_event, publish_booking_event
 from app.schemas.schemas import QRISResponse, PaymentStatusResponse
 
 router = APIRouter()
 settings = get_settings()
+logger = logging.getLogger("perabox.payments")
 
 midtrans_core = midtransclient.CoreApi(
     is_production=settings.MIDTRANS_IS_PRODUCTION,
@@ -24,6 +29,12 @@ midtrans_snap = midtransclient.Snap(
     client_key=settings.MIDTRANS_CLIENT_KEY
 )
 
+if settings.MIDTRANS_API_BASE_URL:
+    base_url = settings.MIDTRANS_API_BASE_URL.rstrip("/")
+    for api in (midtrans_core, midtrans_snap):
+        api.api_config.CORE_SANDBOX_BASE_URL = api.api_config.CORE_PRODUCTION_BASE_URL = base_url
+        api.api_config.SNAP_SANDBOX_BASE_URL = api.api_config.SNAP_PRODUCTION_BASE_URL = f"{base_url}/snap/v1"
+
 @router.get("/{payment_id}/qris", response_model=QRISResponse)
 async def get_qris_code(
     payment_id: uuid.UUID,
@@ -50,8 +61,11 @@ async def get_qris_code(
 
     try:
         # Charge QRIS via Midtrans
-        print(f"[Midtrans Debug] Charging QRIS for Order {payment.id}. Amount: {payment.amount}")
-        print(f"[Midtrans Debug] Using Production: {settings.MIDTRANS_IS_PRODUCTION}")
+        logger.debug(
+            "midtrans.qris_charge",
+            extra={"payment_id": str(payment.id), "amount": str(payment.amount),
+                   "production": settings.MIDTRANS_IS_PRODUCTION},
+        )
         
         param = {
             "payment_type": "qris",
@@ -72,8 +86,11 @@ async def get_qris_code(
             }
         }
 
-        charge_response = midtrans_core.charge(param)
-        print(f"[Midtrans Debug] Charge response received: {charge_response.get('status_code')}")
+        charge_response = await midtrans_guard.call("charge", midtrans_core.charge, param)
+        logger.debug(
+            "midtrans.qris_charge_response",
+            extra={"payment_id": str(payment.id), "status_code": charge_response.get("status_code")},
+        )
         
         # Extract actions (QR URL)
         qr_url = ""
@@ -94,12 +111,14 @@ async def get_qris_code(
             amount=payment.amount,
             expiry_time=int(time.time()) + 900
         )
+    except UpstreamUnavailable as e:
+        raise service_unavailable(e, "Payment provider is unavailable, please try again shortly")
     except Exception as e:
-        print(f"[Midtrans Error] Full Trace: {str(e)}")
+        logger.warning("midtrans.qris_charge_failed", exc_info=True, extra={"payment_id": str(payment.id)})
         # Check if keys are actually loaded
         has_key = settings.MIDTRANS_SERVER_KEY and "YOUR_SERVER_KEY" not in settings.MIDTRANS_SERVER_KEY
         if not has_key:
-             print("[Midtrans Error] Keys are missing or default. Falling back to mock.")
+             logger.warning("midtrans.keys_missing_mock_fallback", extra={"payment_id": str(payment.id)})
              qris_string = f"00020101021126670014ID.CO.QRIS.WWW01189360052200000302065204000053033605802ID5911PERABOX.INC6007JAKARTA61051234562070703A016304ABCD"
              qr_url = f"https://api.qrserver.com/v1/create-qr-code/?size=300x300&data={qris_string}"
              return QRISResponse(
@@ -156,11 +175,13 @@ async def get_snap_token(
             }
         }
 
-        transaction = midtrans_snap.create_transaction(param)
+        transaction = await midtrans_guard.call("snap_create_transaction", midtrans_snap.create_transaction, param)
         return {
             "token": transaction['token'],
             "redirect_url": transaction['redirect_url']
         }
+    except UpstreamUnavailable as e:
+        raise service_unavailable(e, "Payment provider is unavailable, please try again shortly")
     except Exception as e:
         # Fallback for local development if keys are missing
         if "YOUR_SERVER_KEY" in settings.MIDTRANS_SERVER_KEY or not settings.MIDTRANS_SERVER_KEY:
@@ -187,19 +208,20 @@ async def verify_payment(
         )
 
     try:
-        # Check status from Midtrans
-        status_response = midtrans_core.status(str(payment.id))
+        # Check status from Midtrans (an unavailable provider falls through to the stored status)
+        status_response = await midtrans_guard.call("status", midtrans_core.status, str(payment.id))
         transaction_status = status_response.get("transaction_status")
         fraud_status = status_response.get("fraud_status")
 
         if transaction_status == "capture" or transaction_status == "settlement":
             if fraud_status == "accept" or fraud_status is None:
                 payment.status = "paid"
-                # Update associated booking
-                booking = db.query(Booking).filter(Booking.id == payment.booking_id).first()
-                if booking and booking.status == "pending":
-                    booking.status = "confirmed"
+                # Confirm the booking unless it already moved on (compare-and-set, no lock)
+                booking = compare_and_set_booking(db, payment.booking_id, ["pending"], status_values("confirmed"))
+                event = booking_status_event(booking) if booking else None
                 db.commit()
+                if event:
+                    await publish_booking_event(event)
         elif transaction_status == "deny" or transaction_status == "cancel" or transaction_status == "expire":
             payment.status = "failed"
             db.commit()
@@ -242,18 +264,42 @@ async def midtrans_webhook(
         if not payment:
             return {"status": "error", "message": "Payment not found"}
 
+        event = None
         if transaction_status == "capture" or transaction_status == "settlement":
             if fraud_status == "accept" or fraud_status is None:
                 payment.status = "paid"
-                booking = db.query(Booking).filter(Booking.id == payment.booking_id).first()
-                if booking and booking.status == "pending":
-                    booking.status = "confirmed"
+                booking = compare_and_set_booking(db, payment.booking_id, ["pending"], status_values("confirmed"))
+                event = booking_status_event(booking) if booking else None
         elif transaction_status == "deny" or transaction_status == "cancel" or transaction_status == "expire":
             payment.status = "failed"
         elif transaction_status == "pending":
             payment.status = "pending"
 
         db.commit()
+        if event:
+            await publish_booking_event(event)
         return {"status": "ok"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
+
+
+@job_handler("payments.expire_transaction")
+def expire_cancelled_booking_payment(db: Session, payload: dict):
+    """
+    Outbox job enqueued when a booking is cancelled: expire its pending Midtrans transaction
+    so the customer can no longer pay for it, and mark the payment failed.
+    """
+    payment = db.query(Payment).filter(Payment.booking_id == payload["booking_id"]).first()
+    if not payment or payment.status != "pending":
+        return
+    
+    # No transaction_id means no charge was ever created at Midtrans. Refused or timed-out
+    # calls raise UpstreamUnavailable and the job is retried.
+    if payment.transaction_id:
+        run_async(midtrans_guard.call("expire", midtrans_core.transactions.expire, str(payment.id)))
+    
+    payment.status = "failed"
+    logger.info(
+        "midtrans.transaction_expired",
+        extra={"payment_id": str(payment.id), "booking_id": payload["booking_id"]},
+    )
@@ -1,15 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List
 from app.db.session import get_db
 from app.models.models import Technician, User
-from app.schemas.schemas import TechnicianResponse, TechnicianUpdate
-from app.api.dependencies import get_current_admin
+from app.schemas.schemas import FileDownload, LocationPing, LocationPingResult, TechnicianResponse, TechnicianUpdate
+from app.api.dependencies import get_current_admin, get_current_technician, get_current_user, require_role_claim
+from app.core.config import get_settings
+from app.core.locations import location_store
+from app.core.uploads import download_url
 import uuid
 from pydantic import BaseModel
 from decimal import Decimal
 
 router = APIRouter(prefix="/technicians", tags=["Technicians"])
+settings = get_settings()
 
 # Extended response model to include user details
 class TechnicianDetailResponse(TechnicianResponse):
@@ -17,6 +21,8 @@ class TechnicianDetailResponse(TechnicianResponse):
     user_email: str
     user_phone: str
     avatar_url: str | None
+    # Thumbnails by size and format; list pages should use these instead of the full-size avatar
+    avatar_variants: Dict[str, Dict[str, str]] | None = None
     bio: str | None = None
 
     class Config:
@@ -45,6 +51,7 @@ async def get_technicians(
             user_email=tech.user.email,
             user_phone=tech.user.phone,
             avatar_url=tech.user.avatar_url,
+            avatar_variants=tech.user.avatar_variants,
             # Background Check Fields
             address=tech.address,
             emergency_contact_name=tech.emergency_contact_name,
@@ -52,7 +59,7 @@ async def get_technicians(
             date_of_birth=tech.date_of_birth,
             parent_name=tech.parent_name,
             has_signed_contract=tech.has_signed_contract,
-            contract_url=tech.contract_url,
+            contract_url=download_url(tech.contract_url),
             bio=tech.bio
         ))
         
@@ -84,6 +91,7 @@ async def get_available_technicians(
             user_email=tech.user.email,
             user_phone=tech.user.phone,
             avatar_url=tech.user.avatar_url,
+            avatar_variants=tech.user.avatar_variants,
             # Background Check Fields
             address=tech.address,
             emergency_contact_name=tech.emergency_contact_name,
@@ -91,13 +99,48 @@ async def get_available_technicians(
             date_of_birth=tech.date_of_birth,
             parent_name=tech.parent_name,
             has_signed_contract=tech.has_signed_contract,
-            contract_url=tech.contract_url,
+            # Contracts are private: admins and the technician use /technicians/{id}/contract
+            contract_url=None,
             bio=tech.bio
         ))
     
     return results
 
 
+@router.post("/me/location", response_model=LocationPingResult, status_code=status.HTTP_202_ACCEPTED)
+async def report_location(
+    data: LocationPing,
+    claims: dict = Depends(require_role_claim("technician", "Technician access required")),
+    db: Session = Depends(get_db)
+):
+    """
+    Report the signed-in technician's current position. Meant to be called every few
+    seconds: tokens carrying the technician role claim are trusted without a database read,
+    and the position reaches the technicians table in the next batched flush.
+    """
+    if claims.get("role") is None:
+        await get_current_technician(claims, await get_current_user(claims, db))
+    moved = await location_store.record(claims["sub"], data.latitude, data.longitude)
+    return LocationPingResult(moved=moved)
+
+
+@router.get("/{technician_id}/contract", response_model=FileDownload)
+async def get_technician_contract(
+    technician_id: uuid.UUID,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Short-lived download link for a technician's contract. Admins, or the technician themselves.
+    """
+    tech = db.query(Technician).filter(Technician.id == technician_id).first()
+    if not tech or (current_user.role != "admin" and tech.user_id != current_user.id):
+        raise HTTPException(status_code=404, detail="Technician not found")
+    if not tech.contract_url:
+        raise HTTPException(status_code=404, detail="No contract uploaded")
+    return FileDownload(url=download_url(tech.contract_url), expires_in=settings.UPLOAD_PRIVATE_URL_EXPIRE_SECONDS)
+
+
 @router.patch("/{technician_id}", response_model=TechnicianResponse)
 async def update_technician(
     technician_id: uuid.UUID,
@@ -137,7 +180,10 @@ async def update_technician(
         tech.experience_years = data.experience_years
     if data.avatar_url is not None:
         tech.user.avatar_url = data.avatar_url
+        tech.user.avatar_variants = None
         
     db.commit()
     db.refresh(tech)
-    return TechnicianResponse.from_orm(tech)
+    response = TechnicianResponse.from_orm(tech)
+    response.contract_url = download_url(tech.contract_url)
+    return response
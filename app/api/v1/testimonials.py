@@ -0,0 +1,145 @@
+import hashlib
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.api.dependencies import get_current_admin, get_current_user
+from app.core.config import get_settings
+from app.core.events import broker
+from app.db.session import get_db
+from app.models.models import Testimonial, User
+from app.schemas.schemas import (
+    FeaturedTestimonialsResponse,
+    TestimonialCreate,
+    TestimonialResponse,
+    TestimonialSummary,
+)
+
+router = APIRouter(prefix="/testimonials", tags=["Testimonials"])
+settings = get_settings()
+
+# Internal topic: every worker drops its testimonial snapshot when a testimonial changes
+TESTIMONIALS_CHANGED_TOPIC = "internal:testimonials.changed"
+
+
+@dataclass
+class Snapshot:
+    body: str
+    etag: str
+    built_at: float
+
+
+class TestimonialSnapshot:
+    """
+    Rendered featured testimonials and rating aggregates. Dropped in every worker when a
+    testimonial is written (through TESTIMONIALS_CHANGED_TOPIC on the Redis event channel)
+    and rebuilt on the next read, or when older than TESTIMONIALS_SNAPSHOT_MAX_AGE_SECONDS
+    if Redis is down; otherwise reads never touch the table.
+    """
+
+    def __init__(self, max_age_seconds: float):
+        self.max_age_seconds = max_age_seconds
+        self._snapshot: Optional[Snapshot] = None
+        broker.add_handler(TESTIMONIALS_CHANGED_TOPIC, self.drop)
+
+    def get(self, db: Session) -> Snapshot:
+        snapshot = self._snapshot
+        if snapshot is None or time.monotonic() - snapshot.built_at > self.max_age_seconds:
+            snapshot = self.rebuild(db)
+        return snapshot
+
+    def rebuild(self, db: Session) -> Snapshot:
+        featured = db.query(Testimonial).filter(Testimonial.is_featured == True).order_by(
+            Testimonial.created_at.desc()
+        ).limit(settings.TESTIMONIALS_FEATURED_LIMIT).all()
+        counts = dict(db.execute(select(Testimonial.rating, func.count()).group_by(Testimonial.rating)).all())
+
+        total = sum(counts.values())
+        summary = TestimonialSummary(
+            count=total,
+            average=round(sum(rating * n for rating, n in counts.items()) / total, 2) if total else None,
+            distribution={rating: counts.get(rating, 0) for rating in range(1, 6)},
+        )
+        body = FeaturedTestimonialsResponse(
+            featured=[TestimonialResponse.from_orm(t) for t in featured],
+            summary=summary,
+        ).model_dump_json()
+        self._snapshot = Snapshot(
+            body=body,
+            etag='"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"',
+            built_at=time.monotonic(),
+        )
+        return self._snapshot
+
+    def clear(self):
+        self._snapshot = None
+
+    def drop(self, event: dict):
+        self.clear()
+
+
+testimonial_snapshot = TestimonialSnapshot(max_age_seconds=settings.TESTIMONIALS_SNAPSHOT_MAX_AGE_SECONDS)
+
+
+async def invalidate_testimonials():
+    """Drop the testimonial snapshot here and, through the Redis event channel, in every other worker."""
+    await broker.publish([TESTIMONIALS_CHANGED_TOPIC], {"type": "testimonials.changed"})
+
+
+@router.get("/featured", response_model=FeaturedTestimonialsResponse)
+async def get_featured_testimonials(request: Request, db: Session = Depends(get_db)):
+    """
+    Featured testimonials and rating aggregates for the landing page. Public, cacheable
+    by browsers and CDNs, and revalidated with ETag / If-None-Match.
+    """
+    snapshot = testimonial_snapshot.get(db)
+    headers = {
+        "Cache-Control": f"public, max-age={settings.TESTIMONIALS_HTTP_MAX_AGE_SECONDS}, "
+                         f"stale-while-revalidate={settings.TESTIMONIALS_HTTP_MAX_AGE_SECONDS * 5}",
+        "ETag": snapshot.etag,
+    }
+    if request.headers.get("if-none-match") == snapshot.etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+
+@router.post("", response_model=TestimonialResponse, status_code=status.HTTP_201_CREATED)
+async def create_testimonial(
+    data: TestimonialCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Leave a testimonial. Customers only; admins choose which ones are featured."""
+    if current_user.role != "customer":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only customers can leave testimonials")
+
+    testimonial = Testimonial(customer_id=current_user.id, content=data.content, rating=data.rating, is_featured=False)
+    db.add(testimonial)
+    db.commit()
+    db.refresh(testimonial)
+    await invalidate_testimonials()
+    testimonial_snapshot.rebuild(db)
+    return TestimonialResponse.from_orm(testimonial)
+
+
+@router.patch("/{testimonial_id}/featured", response_model=TestimonialResponse)
+async def set_testimonial_featured(
+    testimonial_id: uuid.UUID,
+    is_featured: bool,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Feature or unfeature a testimonial on the landing page. Admin only."""
+    testimonial = db.query(Testimonial).filter(Testimonial.id == testimonial_id).first()
+    if not testimonial:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Testimonial not found")
+
+    testimonial.is_featured = is_featured
+    db.commit()
+    db.refresh(testimonial)
+    await invalidate_testimonials()
+    testimonial_snapshot.rebuild(db)
+    return TestimonialResponse.from_orm(testimonial)
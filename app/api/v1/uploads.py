@@ -0,0 +1,282 @@
+import logging
+import uuid
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+from app.api.dependencies import get_current_user
+from app.core.config import get_settings
+from app.core.images import ImageError, derivative_key, render_in_pool
+from app.core.jobs import enqueue_job, job_handler, run_async
+from app.core.storage import StorageError, object_storage
+from app.core.uploads import (
+    MULTIPART_OVERHEAD_BYTES,
+    SNIFF_BYTES,
+    UPLOAD_KINDS,
+    MultipartFileReader,
+    UploadKind,
+    download_url,
+    is_upload_key,
+    new_upload_key,
+    sniff_content_type,
+    stored_key,
+)
+from app.db.session import get_db
+from app.models.models import Technician, User
+from app.schemas.schemas import UploadCompleteRequest, UploadResult, UploadTicket, UploadTicketRequest
+
+router = APIRouter(prefix="/uploads", tags=["Uploads"])
+settings = get_settings()
+logger = logging.getLogger("perabox.uploads")
+
+
+def get_upload_kind(kind: str, user: User) -> UploadKind:
+    upload_kind = UPLOAD_KINDS.get(kind)
+    if upload_kind is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown upload kind")
+    if upload_kind.role and user.role != upload_kind.role:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail=f"Only {upload_kind.role}s can upload a {kind}"
+        )
+    return upload_kind
+
+
+def too_large(upload_kind: UploadKind) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File is larger than {upload_kind.max_bytes // (1024 * 1024)} MB",
+    )
+
+
+def check_size(size: int, upload_kind: UploadKind):
+    if size > upload_kind.max_bytes:
+        raise too_large(upload_kind)
+
+
+def storage_unavailable(e: StorageError) -> HTTPException:
+    logger.error("uploads.storage_failed", extra={"error": str(e)})
+    return HTTPException(
+        status_code=status.HTTP_502_BAD_GATEWAY, detail="File storage is unavailable, please try again"
+    )
+
+
+def variant_keys(variants: Optional[dict]) -> List[str]:
+    """Object keys of the stored avatar derivatives in a User.avatar_variants mapping."""
+    urls = [url for formats in (variants or {}).values() for url in formats.values()]
+    return [key for key in map(object_storage.key_from_url, urls) if key]
+
+
+async def delete_objects(keys: List[str]):
+    for key in keys:
+        try:
+            await object_storage.delete_object(key)
+        except StorageError:
+            logger.warning("uploads.previous_object_not_deleted", extra={"key": key})
+
+
+async def attach_upload(db: Session, user: User, kind: str, key: str):
+    """
+    Point the user's avatar or technician contract at the uploaded object, replacing the
+    previous one. A new avatar is served full size until its derivatives are rendered; a
+    contract is private, so it is recorded by key and the returned URL is presigned.
+    """
+    url = download_url(key) if UPLOAD_KINDS[kind].private else object_storage.public_url(key)
+    stale = []
+    if kind == "avatar":
+        previous, user.avatar_url = user.avatar_url, url
+        stale, user.avatar_variants = variant_keys(user.avatar_variants), None
+        enqueue_job(db, "uploads.avatar_derivatives", {"user_id": str(user.id), "key": key})
+    else:
+        technician = db.query(Technician).filter(Technician.user_id == user.id).first()
+        if not technician:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Technician profile not found")
+        previous, technician.contract_url = technician.contract_url, key
+    db.commit()
+
+    previous_key = stored_key(previous)
+    if previous_key and previous_key != key:
+        stale.append(previous_key)
+    await delete_objects(stale)
+    return url
+
+
+async def render_avatar_derivatives(key: str) -> Optional[Dict[str, Dict[str, str]]]:
+    """
+    Render the avatar's thumbnails in the image process pool and store them next to the
+    original. Returns their URLs by size and format, or None if the image can't be decoded.
+    """
+    try:
+        rendered = await render_in_pool(await object_storage.get_object(key))
+    except ImageError as e:
+        # Not worth retrying; the original keeps being served
+        logger.warning("uploads.avatar_not_rendered", extra={"key": key, "error": str(e)})
+        return None
+
+    variants = {}
+    for size, formats in rendered.items():
+        for fmt, data in formats.items():
+            derivative = derivative_key(key, size, fmt)
+            await object_storage.put_object(derivative, data, f"image/{fmt}")
+            variants.setdefault(str(size), {})[fmt] = object_storage.public_url(derivative)
+    return variants
+
+
+@job_handler("uploads.avatar_derivatives")
+def generate_avatar_derivatives(db: Session, payload: dict):
+    """
+    Outbox job enqueued by attach_upload: render and store the avatar's thumbnails and record
+    their URLs on the user. Database work stays on the worker thread; only the storage and
+    rendering coroutine runs on the event loop.
+    """
+    key = payload["key"]
+    user = db.get(User, uuid.UUID(payload["user_id"]))
+    if not user or object_storage.key_from_url(user.avatar_url) != key:
+        return  # Replaced or removed since
+
+    variants = run_async(render_avatar_derivatives(key))
+    if variants is None:
+        return
+
+    db.refresh(user)
+    if object_storage.key_from_url(user.avatar_url) != key:
+        # A newer avatar was attached while rendering; it gets its own job
+        run_async(delete_objects(variant_keys(variants)))
+        return
+    user.avatar_variants = variants
+    logger.info("uploads.avatar_rendered", extra={"key": key, "derivatives": len(variant_keys(variants))})
+
+
+@router.post("/presign", response_model=UploadTicket)
+async def create_upload_ticket(
+    data: UploadTicketRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Presigned URL for uploading a file straight to object storage, so the bytes never pass
+    through the API. The declared content type and size are signed; call /uploads/complete
+    after the PUT to verify and attach the file.
+    """
+    upload_kind = get_upload_kind(data.kind, current_user)
+    if data.content_type not in upload_kind.content_types:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported file type")
+    check_size(data.size, upload_kind)
+
+    key = new_upload_key(data.kind, current_user.id, data.content_type)
+    url = object_storage.presigned_put_url(key, data.content_type, data.size, settings.UPLOAD_URL_EXPIRE_SECONDS)
+    return UploadTicket(
+        key=key,
+        url=url,
+        headers={"Content-Type": data.content_type},
+        expires_in=settings.UPLOAD_URL_EXPIRE_SECONDS,
+    )
+
+
+@router.post("/complete", response_model=UploadResult)
+async def complete_upload(
+    data: UploadCompleteRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Verify a presigned upload (size and actual file type) and attach it."""
+    kind = next((k for k in UPLOAD_KINDS if is_upload_key(k, current_user.id, data.key)), None)
+    if kind is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not your upload")
+    upload_kind = get_upload_kind(kind, current_user)
+
+    try:
+        head = await object_storage.head_object(data.key)
+        if head is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+        sniffed = sniff_content_type(await object_storage.get_range(data.key, 0, SNIFF_BYTES - 1))
+        if head["size"] > upload_kind.max_bytes or sniffed not in upload_kind.content_types \
+                or sniffed != head["content_type"]:
+            await object_storage.delete_object(data.key)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="File content doesn't match an allowed type"
+            )
+        url = await attach_upload(db, current_user, kind, data.key)
+    except StorageError as e:
+        raise storage_unavailable(e)
+    return UploadResult(key=data.key, url=url, content_type=sniffed, size=head["size"])
+
+
+# /uploads/{kind} reads its body itself; this documents it as the usual file form
+FILE_FORM_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["file"],
+            "properties": {"file": {"type": "string", "format": "binary"}},
+        }}},
+    }
+}
+
+
+@router.post("/{kind}", response_model=UploadResult, status_code=status.HTTP_201_CREATED, openapi_extra=FILE_FORM_BODY)
+async def upload_file(
+    kind: str,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload through the API, for clients that can't PUT to storage directly. The form body
+    is parsed as it arrives and the file streamed to storage one part at a time (a
+    multipart upload when it spans several parts), so neither memory nor disk use grows
+    with its size; a body over the kind's limit is refused before or while it is read.
+    """
+    upload_kind = get_upload_kind(kind, current_user)
+    max_body = upload_kind.max_bytes + MULTIPART_OVERHEAD_BYTES
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_body:
+        raise too_large(upload_kind)
+    try:
+        reader = MultipartFileReader(request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    part_size = settings.UPLOAD_PART_SIZE_BYTES
+    key = content_type = upload_id = None
+    received, etags = 0, []
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_body:
+                raise too_large(upload_kind)
+            try:
+                reader.feed(chunk)
+            except ValueError:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed multipart body")
+            check_size(reader.size, upload_kind)
+
+            if key is None:
+                if len(reader.data) < SNIFF_BYTES and not reader.complete:
+                    continue
+                content_type = sniff_content_type(bytes(reader.data[:SNIFF_BYTES]))
+                if content_type not in upload_kind.content_types:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported file type")
+                key = new_upload_key(kind, current_user.id, content_type)
+            # Whatever is left when the body ends becomes the last (or only) part
+            while len(reader.data) > part_size:
+                if upload_id is None:
+                    upload_id = await object_storage.create_multipart_upload(key, content_type)
+                etags.append(await object_storage.upload_part(key, upload_id, len(etags) + 1, reader.take(part_size)))
+
+        if not reader.complete or not reader.ended:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a file in the 'file' field")
+        if upload_id is None:
+            await object_storage.put_object(key, reader.take(), content_type)
+        else:
+            etags.append(await object_storage.upload_part(key, upload_id, len(etags) + 1, reader.take()))
+            await object_storage.complete_multipart_upload(key, upload_id, etags)
+            upload_id = None
+        url = await attach_upload(db, current_user, kind, key)
+    except StorageError as e:
+        raise storage_unavailable(e)
+    finally:
+        if upload_id is not None:
+            try:
+                await object_storage.abort_multipart_upload(key, upload_id)
+            except StorageError:
+                logger.warning("uploads.abort_failed", extra={"key": key, "upload_id": upload_id})
+    return UploadResult(key=key, url=url, content_type=content_type, size=reader.size)
@@ -0,0 +1,87 @@
+from typing import Dict, Iterable, List, Optional
+import uuid
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from app.core.events import broker
+from app.models.models import Booking
+
+BOOKING_STATUSES = ["pending", "confirmed", "in_progress", "completed", "cancelled"]
+
+# status -> statuses it may move to. completed and cancelled are final.
+BOOKING_TRANSITIONS: Dict[str, List[str]] = {
+    "pending": ["confirmed", "cancelled"],
+    "confirmed": ["in_progress", "cancelled"],
+    "in_progress": ["completed", "cancelled"],
+    "completed": [],
+    "cancelled": [],
+}
+
+# Assigning a technician auto-confirms, so only bookings not yet started can be (re)assigned
+ASSIGNABLE_BOOKING_STATUSES = ["pending", "confirmed"]
+
+
+def can_transition(current: str, new: str) -> bool:
+    return new in BOOKING_TRANSITIONS.get(current, [])
+
+
+def source_statuses(new: str) -> List[str]:
+    """Statuses a booking may be in to move to `new`."""
+    return [current for current, targets in BOOKING_TRANSITIONS.items() if new in targets]
+
+
+def status_values(new_status: str) -> dict:
+    """Column values for moving a booking to `new_status`."""
+    values = {"status": new_status}
+    if new_status == "completed":
+        values["completed_at"] = func.now()
+    return values
+
+
+def version_bump() -> dict:
+    """Column values every booking write adds, so concurrent writers can detect each other."""
+    return {"version": Booking.version + 1, "updated_at": func.now()}
+
+
+def compare_and_set_booking(
+    db: Session,
+    booking_id: uuid.UUID,
+    expected_statuses: Iterable[str],
+    values: dict,
+    expected_version: Optional[int] = None,
+) -> Optional[Booking]:
+    """
+    Apply `values` to a booking only if it is still in one of `expected_statuses` (and at
+    `expected_version`, when given), as a single conditional UPDATE ... RETURNING. Returns the
+    updated booking, or None if another writer got there first. No row lock is taken; callers
+    decide whether a lost race is a conflict (409) or a no-op. Does not commit.
+    """
+    conditions = [Booking.id == booking_id, Booking.status.in_(list(expected_statuses))]
+    if expected_version is not None:
+        conditions.append(Booking.version == expected_version)
+    return db.scalars(
+        update(Booking)
+        .where(*conditions)
+        .values(**version_bump(), **values)
+        .returning(Booking)
+        .execution_options(synchronize_session="fetch")
+    ).first()
+
+
+def booking_status_event(booking) -> dict:
+    """Event payload for a booking's current status. Build it before commit expires the row."""
+    return {
+        "type": "booking.status",
+        "booking_id": str(booking.id),
+        "customer_id": str(booking.customer_id),
+        "technician_id": str(booking.technician_id) if booking.technician_id else None,
+        "status": booking.status,
+        "version": booking.version,
+    }
+
+
+async def publish_booking_event(event: dict):
+    """Push a booking event to its customer, its technician and admins. Call after commit."""
+    topics = ["bookings", f"user:{event['customer_id']}"]
+    if event["technician_id"]:
+        topics.append(f"technician:{event['technician_id']}")
+    await broker.publish(topics, event)
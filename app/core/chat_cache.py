@@ -0,0 +1,130 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Set, Tuple
+from app.core.chat_intents import tokenize
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+def normalize(text: str) -> str:
+    """Case, punctuation and whitespace-insensitive form of a prompt."""
+    return " ".join(tokenize(text))
+
+
+def trigrams(normalized: str) -> FrozenSet[str]:
+    padded = f" {normalized} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+@dataclass
+class CachedResponse:
+    response: str
+    grams: FrozenSet[str]
+    numbers: FrozenSet[str]
+    expires_at: float
+
+
+class ChatResponseCache:
+    """
+    Per-process cache of LLM answers to first-turn questions.
+
+    Lookups try the exact normalized prompt first, then the most similar cached prompt by
+    character-trigram Jaccard similarity (>= `similarity_threshold`, 0 disables it) found
+    through a trigram inverted index. Prompts that differ in any number ("1 PK" vs "2 PK")
+    never match. Everything is dropped when the service catalog changes.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, similarity_threshold: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.catalog_fingerprint: Optional[int] = None
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._grams: Dict[str, Set[str]] = {}
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for gram in entry.grams:
+            keys = self._grams.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._grams[gram]
+
+    def _live(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        return entry
+
+    def get(self, prompt: str) -> Tuple[Optional[str], str]:
+        """Cached response for `prompt` and how it matched: exact, similar or miss."""
+        key = normalize(prompt)
+        entry = self._live(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry.response, "exact"
+        if self.similarity_threshold <= 0 or not key:
+            return None, "miss"
+
+        grams = trigrams(key)
+        numbers = frozenset(t for t in key.split() if t.isdigit())
+        overlap: Dict[str, int] = {}
+        for gram in grams:
+            for candidate in self._grams.get(gram, ()):
+                overlap[candidate] = overlap.get(candidate, 0) + 1
+
+        best_key, best_score = None, 0.0
+        for candidate, shared in overlap.items():
+            entry = self._entries[candidate]
+            score = shared / (len(grams) + len(entry.grams) - shared)
+            if score > best_score and entry.numbers == numbers:
+                best_key, best_score = candidate, score
+        if best_key is None or best_score < self.similarity_threshold:
+            return None, "miss"
+        entry = self._live(best_key)
+        if entry is None:
+            return None, "miss"
+        return entry.response, "similar"
+
+    def set(self, prompt: str, response: str):
+        key = normalize(prompt)
+        if not key:
+            return
+        self._remove(key)
+        grams = trigrams(key)
+        self._entries[key] = CachedResponse(
+            response=response,
+            grams=grams,
+            numbers=frozenset(t for t in key.split() if t.isdigit()),
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        for gram in grams:
+            self._grams.setdefault(gram, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def sync_catalog(self, fingerprint: Optional[int]):
+        """Drop all entries when the service catalog changed since they were cached."""
+        if fingerprint != self.catalog_fingerprint:
+            self.clear()
+            self.catalog_fingerprint = fingerprint
+
+    def clear(self):
+        self._entries.clear()
+        self._grams.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+chat_response_cache = ChatResponseCache(
+    max_entries=settings.CHAT_RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.CHAT_RESPONSE_CACHE_TTL_SECONDS,
+    similarity_threshold=settings.CHAT_RESPONSE_CACHE_SIMILARITY,
+)
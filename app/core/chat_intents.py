@@ -0,0 +1,198 @@
+import math
+import re
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, List, Optional, Set
+from sqlalchemy.orm import Session
+from app.core.config import get_settings
+from app.models.models import Service
+
+settings = get_settings()
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+GREETING_WORDS = {"halo", "hallo", "hai", "hi", "hello", "hey", "pagi", "siang", "sore", "malam", "selamat",
+                  "assalamualaikum", "permisi", "min", "kak", "bot", "pera"}
+PRICE_WORDS = {"harga", "berapa", "biaya", "tarif", "ongkos", "price", "prices", "cost", "much", "rate"}
+BOOKING_WORDS = {"pesan", "memesan", "booking", "book", "order", "jadwal", "reservasi"}
+HOW_WORDS = {"cara", "bagaimana", "gimana", "how"}
+CATALOG_WORDS = {"layanan", "jasa", "service", "services", "apa", "saja", "what", "list", "daftar"}
+ENGLISH_WORDS = {"hi", "hello", "hey", "price", "prices", "cost", "much", "how", "what", "book", "services", "the"}
+# Words that carry no intent on their own
+FILLER_WORDS = {"ya", "dong", "nya", "untuk", "buat", "di", "ke", "the", "a", "an", "is", "of", "for", "to",
+                "do", "i", "saya", "aku", "mau", "ingin", "tolong", "please", "itu", "ini", "kah", "yang", "and", "dan"}
+
+# Indonesian/colloquial terms -> words that appear in service names and descriptions
+ALIASES: Dict[str, List[str]] = {
+    "cuci": ["cleaning", "maintenance"],
+    "bersih": ["cleaning"],
+    "servis": ["maintenance", "repair"],
+    "perbaikan": ["repair"],
+    "perbaiki": ["repair"],
+    "rusak": ["repair"],
+    "betulin": ["repair"],
+    "pasang": ["installation"],
+    "instalasi": ["installation"],
+    "lampu": ["light"],
+    "listrik": ["electrical"],
+    "pipa": ["plumbing"],
+    "ledeng": ["plumbing"],
+    "bocor": ["repair", "plumbing"],
+    "pendingin": ["ac"],
+}
+
+# Longer messages are usually specific questions the LLM handles better
+MAX_LOCAL_TOKENS = 12
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def format_rupiah(amount: Decimal) -> str:
+    return "Rp " + f"{int(amount):,}".replace(",", ".")
+
+
+@dataclass
+class CatalogEntry:
+    name: str
+    description: str
+    base_price: Decimal
+    duration_minutes: int
+
+
+@dataclass
+class IntentMatch:
+    intent: str
+    answer: str
+
+
+class ServiceCatalogIndex:
+    """
+    Keyword index over active services (name and slug words), rebuilt from the database
+    at most every CHAT_CATALOG_REFRESH_SECONDS so price answers follow the live catalog.
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.entries: List[CatalogEntry] = []
+        self._postings: Dict[str, Set[int]] = {}
+        self._loaded_at: Optional[float] = None
+        # Changes whenever a service is added, removed, renamed or repriced
+        self.fingerprint: Optional[int] = None
+
+    def build(self, services: List[Service]):
+        entries, postings = [], {}
+        for i, service in enumerate(sorted(services, key=lambda s: s.base_price)):
+            entries.append(
+                CatalogEntry(service.name, service.description or "", service.base_price, service.duration_minutes)
+            )
+            for token in set(tokenize(f"{service.name} {service.slug}")) - FILLER_WORDS:
+                postings.setdefault(token, set()).add(i)
+        self.entries, self._postings = entries, postings
+        self.fingerprint = hash(tuple((e.name, e.description, str(e.base_price), e.duration_minutes) for e in entries))
+        self._loaded_at = time.monotonic()
+
+    def refresh_if_stale(self, db: Session):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds:
+            self.build(db.query(Service).filter(Service.is_active == True).all())
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def vocabulary(self) -> Set[str]:
+        return set(self._postings)
+
+    def best_match(self, tokens: List[str]) -> Optional[CatalogEntry]:
+        """The service sharing the most (rarest-weighted) name words with `tokens`, if any."""
+        expanded = set(tokens)
+        for token in tokens:
+            expanded.update(ALIASES.get(token, ()))
+        scores: Dict[int, float] = {}
+        for token in expanded:
+            posting = self._postings.get(token)
+            if not posting:
+                continue
+            weight = math.log(1 + len(self.entries) / len(posting))
+            for i in posting:
+                scores[i] = scores.get(i, 0.0) + weight
+        if not scores:
+            return None
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        # Ambiguous (e.g. just "AC" with several AC services): let the caller list them instead
+        if len(ranked) > 1 and ranked[0][1] == ranked[1][1]:
+            return None
+        return self.entries[ranked[0][0]]
+
+
+catalog_index = ServiceCatalogIndex(refresh_seconds=settings.CHAT_CATALOG_REFRESH_SECONDS)
+
+
+def _price_list(entries: List[CatalogEntry], english: bool) -> str:
+    lines = [f"• {e.name}: {'from' if english else 'mulai'} {format_rupiah(e.base_price)}" for e in entries]
+    if english:
+        return "Here are our service prices 🏠\n" + "\n".join(lines) + \
+            "\nFinal prices are confirmed after the technician's check. Tap \"Pesan Sekarang\" to book ✅"
+    return "Berikut harga layanan kami 🏠\n" + "\n".join(lines) + \
+        "\nHarga akhir ditentukan setelah diagnosa teknisi. Klik \"Pesan Sekarang\" untuk booking ✅"
+
+
+def _service_answer(entry: CatalogEntry, english: bool) -> str:
+    price = format_rupiah(entry.base_price)
+    if english:
+        summary = f"{entry.name} starts from {price} (about {entry.duration_minutes} minutes). {entry.description}"
+        return summary.strip() + "\nTap \"Pesan Sekarang\" to book ✅"
+    summary = f"{entry.name} mulai dari {price} (sekitar {entry.duration_minutes} menit). {entry.description}"
+    return summary.strip() + "\nKlik \"Pesan Sekarang\" untuk booking ✅"
+
+
+def match_intent(message: str, index: ServiceCatalogIndex) -> Optional[IntentMatch]:
+    """
+    Answer greetings, price questions, catalog questions and "how do I book" locally.
+    Returns None when the message should go to the LLM.
+    """
+    tokens = tokenize(message)
+    if not tokens or len(tokens) > MAX_LOCAL_TOKENS:
+        return None
+    words = set(tokens)
+    english = bool(words & ENGLISH_WORDS) and not words & {"harga", "berapa", "cara", "layanan", "pesan", "halo"}
+    content = words - FILLER_WORDS
+
+    if content and content <= GREETING_WORDS:
+        if english:
+            return IntentMatch("greeting", "Hi, welcome to PERABOX! 🏠 I'm Pera-Bot. How can I help you today?")
+        return IntentMatch(
+            "greeting", "Halo, selamat datang di PERABOX! 🏠 Saya Pera-Bot. Ada yang bisa saya bantu hari ini?"
+        )
+
+    known = (
+        GREETING_WORDS | PRICE_WORDS | BOOKING_WORDS | HOW_WORDS | CATALOG_WORDS | index.vocabulary() | set(ALIASES)
+    )
+    # Any word we don't understand (a symptom, a location, a complaint) goes to the LLM
+    if not content <= known:
+        return None
+
+    if words & PRICE_WORDS and index.entries:
+        entry = index.best_match(tokens)
+        if entry is not None:
+            return IntentMatch("price", _service_answer(entry, english))
+        return IntentMatch("price_list", _price_list(index.entries, english))
+
+    if words & BOOKING_WORDS and words & HOW_WORDS:
+        if english:
+            answer = ("Booking is easy ✅\n1. Tap \"Pesan Sekarang\" and pick a service\n"
+                      "2. Choose a date, time and your address\n3. Pay via QRIS and a technician will be assigned")
+        else:
+            answer = ("Cara pesan mudah ✅\n1. Klik \"Pesan Sekarang\" dan pilih layanan\n"
+                      "2. Pilih tanggal, jam, dan alamat\n3. Bayar via QRIS, lalu teknisi kami akan ditugaskan")
+        return IntentMatch("how_to_book", answer)
+
+    if index.entries:
+        entry = index.best_match(tokens)
+        if entry is not None:
+            return IntentMatch("service_info", _service_answer(entry, english))
+        if words & CATALOG_WORDS:
+            return IntentMatch("catalog", _price_list(index.entries, english))
+
+    return None
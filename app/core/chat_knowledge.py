@@ -0,0 +1,224 @@
+import math
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.core.chat_intents import ALIASES, FILLER_WORDS, format_rupiah, tokenize
+from app.core.config import get_settings
+from app.models.models import Article, Service, ServiceCategory
+
+settings = get_settings()
+
+SOURCE_LABELS = {"service": "Layanan", "category": "Kategori", "article": "Artikel"}
+
+
+@dataclass
+class Passage:
+    key: str
+    source: str
+    title: str
+    text: str
+
+
+def index_terms(text: str) -> List[str]:
+    return [t for t in tokenize(text) if t not in FILLER_WORDS]
+
+
+def query_terms(text: str) -> List[str]:
+    """Question words plus the catalog words their Indonesian/colloquial aliases map to."""
+    terms = index_terms(text)
+    for term in list(terms):
+        terms.extend(ALIASES.get(term, ()))
+    return terms
+
+
+def split_passages(text: str, max_words: int) -> List[str]:
+    """Paragraph-aligned chunks of at most ~`max_words` words, so a snippet stays small."""
+    chunks, current = [], []
+    for paragraph in (p.split() for p in text.split("\n") if p.strip()):
+        if current and len(current) + len(paragraph) > max_words:
+            chunks.append(" ".join(current))
+            current = []
+        while len(paragraph) > max_words:
+            chunks.append(" ".join(paragraph[:max_words]))
+            paragraph = paragraph[max_words:]
+        current.extend(paragraph)
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 over passages, with incremental add/remove (document statistics are kept up to date)."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.passages: Dict[str, Passage] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+
+    def add(self, passage: Passage):
+        self.remove(passage.key)
+        terms = Counter(index_terms(f"{passage.title} {passage.text}"))
+        self.passages[passage.key] = passage
+        self._lengths[passage.key] = sum(terms.values())
+        self._total_length += self._lengths[passage.key]
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[passage.key] = tf
+
+    def remove(self, key: str):
+        passage = self.passages.pop(key, None)
+        if passage is None:
+            return
+        self._total_length -= self._lengths.pop(key)
+        for term in set(index_terms(f"{passage.title} {passage.text}")):
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(key, None)
+                if not posting:
+                    del self._postings[term]
+
+    def search(self, terms: Iterable[str], k: int) -> List[Tuple[Passage, float]]:
+        if not self.passages:
+            return []
+        n = len(self.passages)
+        avg_length = self._total_length / n or 1
+        scores: Dict[str, float] = {}
+        for term in set(terms):
+            posting = self._postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for key, tf in posting.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[key] / avg_length)
+                scores[key] = scores.get(key, 0.0) + idf * tf * (self.k1 + 1) / norm
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:k]
+        return [(self.passages[key], score) for key, score in ranked]
+
+
+class KnowledgeIndex:
+    """
+    Retrieval index for Pera-Bot over active services and categories and published articles.
+
+    Refreshed at most every CHAT_CATALOG_REFRESH_SECONDS, incrementally: only (id, updated_at)
+    pairs are read to find what changed, and only new or changed rows are loaded and
+    re-indexed. `version` changes whenever the indexed content does.
+    """
+
+    def __init__(self, refresh_seconds: float, passage_words: int):
+        self.refresh_seconds = refresh_seconds
+        self.passage_words = passage_words
+        self.index = BM25Index()
+        self.version = 0
+        # (source, id) -> (row version, passage keys)
+        self._documents: Dict[Tuple[str, str], Tuple[object, List[str]]] = {}
+        self._loaded_at: Optional[float] = None
+
+    def refresh_if_stale(self, db: Session):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds:
+            self.refresh(db)
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def _sync(self, source: str, current: Dict[str, object], load) -> bool:
+        """Drop documents gone from `current` (id -> row version) and re-index changed ones via `load(ids)`."""
+        changed = False
+        for key in [key for key in self._documents if key[0] == source and key[1] not in current]:
+            for passage_key in self._documents.pop(key)[1]:
+                self.index.remove(passage_key)
+            changed = True
+        stale = [doc_id for doc_id, version in current.items()
+                 if self._documents.get((source, doc_id), (None,))[0] != version]
+        if stale:
+            for doc_id, passages in load(stale).items():
+                for passage_key in self._documents.get((source, doc_id), (None, []))[1]:
+                    self.index.remove(passage_key)
+                for passage in passages:
+                    self.index.add(passage)
+                self._documents[(source, doc_id)] = (current[doc_id], [p.key for p in passages])
+            changed = True
+        return changed
+
+    def refresh(self, db: Session):
+        categories = db.execute(
+            select(ServiceCategory.id, ServiceCategory.name, ServiceCategory.description)
+            .where(ServiceCategory.is_active == True)
+        ).all()
+        category_rows = {str(c.id): c for c in categories}
+        changed = self._sync(
+            "category",
+            {doc_id: (c.name, c.description) for doc_id, c in category_rows.items()},
+            lambda ids: {doc_id: [Passage(f"category:{doc_id}", "category", category_rows[doc_id].name,
+                                          category_rows[doc_id].description or "")] for doc_id in ids},
+        )
+
+        # A service's text includes its category name, so a renamed category re-indexes it too
+        services = db.execute(
+            select(Service.id, Service.updated_at, ServiceCategory.name)
+            .join(ServiceCategory, Service.category_id == ServiceCategory.id)
+            .where(Service.is_active == True)
+        ).all()
+        changed |= self._sync(
+            "service",
+            {str(s.id): (s.updated_at, s.name) for s in services},
+            lambda ids: self._load_services(db, ids),
+        )
+
+        articles = db.execute(
+            select(Article.id, Article.updated_at)
+            .where(Article.published_at.is_not(None), Article.published_at <= datetime.now(timezone.utc))
+        ).all()
+        changed |= self._sync(
+            "article",
+            {str(a.id): a.updated_at for a in articles},
+            lambda ids: self._load_articles(db, ids),
+        )
+
+        if changed:
+            self.version += 1
+        self._loaded_at = time.monotonic()
+
+    def _load_services(self, db: Session, ids: List[str]) -> Dict[str, List[Passage]]:
+        rows = db.execute(
+            select(Service, ServiceCategory.name)
+            .join(ServiceCategory, Service.category_id == ServiceCategory.id)
+            .where(Service.id.in_([uuid.UUID(i) for i in ids]))
+        ).all()
+        loaded = {}
+        for service, category_name in rows:
+            text = (f"{service.description or ''} Kategori {category_name}. "
+                    f"Harga mulai {format_rupiah(service.base_price)}, "
+                    f"durasi sekitar {service.duration_minutes} menit.")
+            loaded[str(service.id)] = [Passage(f"service:{service.id}", "service", service.name, text.strip())]
+        return loaded
+
+    def _load_articles(self, db: Session, ids: List[str]) -> Dict[str, List[Passage]]:
+        loaded = {}
+        for article in db.query(Article).filter(Article.id.in_([uuid.UUID(i) for i in ids])):
+            chunks = split_passages(f"{article.excerpt or ''}\n{article.content}", self.passage_words)
+            loaded[str(article.id)] = [
+                Passage(f"article:{article.id}:{n}", "article", article.title, chunk) for n, chunk in enumerate(chunks)
+            ]
+        return loaded
+
+    def search(self, question: str, k: int) -> List[Passage]:
+        return [passage for passage, _ in self.index.search(query_terms(question), k)]
+
+    def context_for(self, question: str, k: int) -> str:
+        """The top-k passages for `question`, formatted for the system prompt ("" if none match)."""
+        return "\n".join(
+            f"- [{SOURCE_LABELS[p.source]}] {p.title}: {p.text}" for p in self.search(question, k)
+        )
+
+
+knowledge_index = KnowledgeIndex(
+    refresh_seconds=settings.CHAT_CATALOG_REFRESH_SECONDS,
+    passage_words=settings.CHAT_RETRIEVAL_PASSAGE_WORDS,
+)
@@ -0,0 +1,93 @@
+import json
+import secrets
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+from redis.exceptions import RedisError
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.redis import get_redis, mark_redis_unavailable
+
+settings = get_settings()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token); close enough for budgeting history."""
+    return len(text) // 4 + 1
+
+
+@dataclass
+class ChatSession:
+    id: str = field(default_factory=lambda: secrets.token_urlsafe(16))
+    # Rolling summary of turns that no longer fit the history budget
+    summary: str = ""
+    # [{"role": "user" | "model", "content": str}], oldest first
+    turns: List[dict] = field(default_factory=list)
+
+    def add_turn(self, role: str, content: str):
+        self.turns.append({"role": role, "content": content})
+
+    def history_tokens(self) -> int:
+        return sum(estimate_tokens(t["content"]) for t in self.turns)
+
+    def evict_over_budget(self, budget_tokens: int) -> List[dict]:
+        """
+        Drop the oldest turns until the rest fit `budget_tokens` and return them, to be folded
+        into the summary. Turns are removed in user/model pairs so the history stays aligned.
+        """
+        evicted = []
+        while len(self.turns) > 2 and self.history_tokens() > budget_tokens:
+            evicted.extend(self.turns[:2])
+            del self.turns[:2]
+        return evicted
+
+
+class ChatSessionStore:
+    """
+    Chat sessions by id: in Redis when available (shared across workers), otherwise in a
+    per-process LRU. Sessions expire CHAT_SESSION_TTL_SECONDS after their last turn.
+    """
+
+    def __init__(self):
+        self._memory = TTLCache(
+            max_size=settings.CHAT_SESSION_MAX_SESSIONS, ttl_seconds=settings.CHAT_SESSION_TTL_SECONDS
+        )
+
+    async def get(self, session_id: str) -> Optional[ChatSession]:
+        redis = get_redis()
+        if redis is not None:
+            try:
+                data = await redis.get(f"chat:session:{session_id}")
+                return ChatSession(**json.loads(data)) if data else None
+            except (RedisError, OSError) as e:
+                mark_redis_unavailable(e)
+        return self._memory.get(session_id)
+
+    async def save(self, session: ChatSession):
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.set(
+                    f"chat:session:{session.id}", json.dumps(asdict(session)), ex=settings.CHAT_SESSION_TTL_SECONDS
+                )
+                return
+            except (RedisError, OSError) as e:
+                mark_redis_unavailable(e)
+        self._memory.set(session.id, session)
+
+
+chat_sessions = ChatSessionStore()
+
+
+def format_turns(turns: List[dict]) -> str:
+    return "\n".join(f"{'Customer' if t['role'] == 'user' else 'Pera-Bot'}: {t['content']}" for t in turns)
+
+
+def summary_prompt(previous_summary: str, evicted: List[dict]) -> str:
+    """Prompt asking the model to fold `evicted` turns into the running summary."""
+    return (
+        f"Update the summary of a customer service conversation in at most {settings.CHAT_SUMMARY_MAX_WORDS} words. "
+        "Keep the customer's needs, details they gave (service, AC type, location, schedule) "
+        "and anything already answered. Reply with the summary only, in the conversation's language.\n\n"
+        f"Current summary:\n{previous_summary or '(none)'}\n\n"
+        f"New messages:\n{format_turns(evicted)}"
+    )
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
-from typing import Optional
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -9,28 +9,152 @@ class Settings(BaseSettings):
     
     # Redis
     REDIS_URL: str = "redis://redis:6379/0"
+    REDIS_ENABLED: bool = True
     
     # MinIO
     MINIO_ENDPOINT: str = "minio:9000"
     MINIO_ACCESS_KEY: str = "minioadmin"
     MINIO_SECRET_KEY: str = "minioadmin"
     MINIO_BUCKET: str = "perabox-uploads"
+    MINIO_REGION: str = "us-east-1"
+    MINIO_SECURE: bool = False
+    # Base URL objects are served from (CDN or public bucket); defaults to the endpoint
+    MINIO_PUBLIC_URL: Optional[str] = None
     
     # JWT
     SECRET_KEY: str = "dev_secret_key_change_in_production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # Asymmetric algorithms (RS256/ES256): PEM private key, its kid, and a local JWKS of
+    # additional public keys still accepted for verification (key rotation)
+    JWT_PRIVATE_KEY_PATH: Optional[str] = None
+    JWT_KEY_ID: Optional[str] = None
+    JWT_JWKS_PATH: Optional[str] = None
+    TOKEN_VERIFY_CACHE_SIZE: int = 4096
     
     # Environment
     ENVIRONMENT: str = "development"
     FRONTEND_URL: str = "http://localhost:3000"
     GOOGLE_API_KEY: Optional[str] = None
+    # Override the Gemini REST endpoint (e.g. a local stand-in for load tests)
+    GEMINI_API_ENDPOINT: Optional[str] = None
+    
+    # Chat sessions: history beyond the token budget is folded into a rolling summary
+    CHAT_SESSION_TTL_SECONDS: int = 86400
+    CHAT_SESSION_MAX_SESSIONS: int = 10_000
+    CHAT_HISTORY_TOKEN_BUDGET: int = 2000
+    CHAT_SUMMARY_MAX_WORDS: int = 150
+    CHAT_MAX_MESSAGE_CHARS: int = 2000
+    CHAT_MAX_HISTORY_MESSAGES: int = 40
+    # Local answers for greetings/prices/how-to-book; the service catalog is re-read this often
+    CHAT_LOCAL_INTENTS_ENABLED: bool = True
+    CHAT_CATALOG_REFRESH_SECONDS: float = 60.0
+    # Per-process cache of LLM answers to first-turn questions (exact, then trigram similarity)
+    CHAT_RESPONSE_CACHE_ENABLED: bool = True
+    CHAT_RESPONSE_CACHE_TTL_SECONDS: float = 3600.0
+    CHAT_RESPONSE_CACHE_MAX_ENTRIES: int = 5000
+    # Minimum Jaccard similarity of character trigrams; 0 = exact matches only
+    CHAT_RESPONSE_CACHE_SIMILARITY: float = 0.85
+    # Retrieval: the top-k matching service/category/article passages go into the prompt
+    CHAT_RETRIEVAL_ENABLED: bool = True
+    CHAT_RETRIEVAL_TOP_K: int = 4
+    CHAT_RETRIEVAL_PASSAGE_WORDS: int = 80
     
     # Midtrans
     MIDTRANS_SERVER_KEY: Optional[str] = None
     MIDTRANS_CLIENT_KEY: Optional[str] = None
     MIDTRANS_IS_PRODUCTION: bool = False
+    # Override the Midtrans Core/Snap base URL (e.g. a local stand-in for load tests)
+    MIDTRANS_API_BASE_URL: Optional[str] = None
+    
+    # Upstream providers (Gemini, Midtrans, Google): per-call timeouts, a bulkhead of at most
+    # UPSTREAM_MAX_CONCURRENCY calls per provider, and a circuit breaker
+    UPSTREAM_GEMINI_TIMEOUT_SECONDS: float = 20.0
+    UPSTREAM_MIDTRANS_TIMEOUT_SECONDS: float = 10.0
+    UPSTREAM_GOOGLE_TIMEOUT_SECONDS: float = 5.0
+    UPSTREAM_MAX_CONCURRENCY: int = 20
+    UPSTREAM_QUEUE_TIMEOUT_SECONDS: float = 1.0
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_SECONDS: float = 30.0
+    # Total time budget of a request; upstream timeouts are capped by what is left of it
+    REQUEST_DEADLINE_SECONDS: float = 30.0
+    
+    # Auth rate limiting (Redis when reachable, per-process memory otherwise)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_AUTH_PER_IP: int = 20
+    RATE_LIMIT_AUTH_PER_EMAIL: int = 5
+    RATE_LIMIT_AUTH_WINDOW_SECONDS: int = 60
+    # Take the client IP from X-Forwarded-For. Only enable behind trusted proxies: the client
+    # controls the leading hops, so the IP used is the one appended by the outermost of
+    # RATE_LIMIT_TRUSTED_PROXIES proxies (counted from the right).
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False
+    RATE_LIMIT_TRUSTED_PROXIES: int = 1
+    
+    # Health checks
+    HEALTH_READY_CACHE_SECONDS: float = 5.0
+    
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = True
+    LOG_DEBUG_SAMPLE_RATE: float = 0.1
+    
+    # SQL profiling (always on when enabled; otherwise per-request via X-SQL-Profile for admins)
+    SQL_PROFILING_ENABLED: bool = False
+    SQL_SLOW_QUERY_MS: float = 100.0
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5
+    
+    # Bookings
+    # How long an active service's base price is reused when creating bookings
+    SERVICE_PRICE_CACHE_SECONDS: float = 60.0
+    
+    # Articles: rendered detail pages are cached per worker and dropped in every worker (via the
+    # Redis event channel) when an article is edited. The TTL bounds staleness without Redis.
+    ARTICLE_CACHE_SECONDS: float = 300.0
+    ARTICLE_CACHE_MAX_ENTRIES: int = 1000
+    ARTICLE_PAGE_MAX_SIZE: int = 50
+    
+    # Landing-page testimonials: served from a per-worker snapshot, dropped in every worker (via
+    # the Redis event channel) on write. The max age bounds staleness without Redis.
+    TESTIMONIALS_FEATURED_LIMIT: int = 6
+    TESTIMONIALS_SNAPSHOT_MAX_AGE_SECONDS: float = 300.0
+    TESTIMONIALS_HTTP_MAX_AGE_SECONDS: int = 60
+    
+    # Uploads (avatars, technician contracts): presigned PUT directly to object storage,
+    # or streamed through the API in parts of UPLOAD_PART_SIZE_BYTES (S3 requires >= 5 MiB)
+    UPLOAD_URL_EXPIRE_SECONDS: int = 900
+    # Private uploads (contracts) are stored under private/, which the bucket's public read
+    # policy must not cover, and are only handed out as presigned GETs valid this long
+    UPLOAD_PRIVATE_URL_EXPIRE_SECONDS: int = 300
+    UPLOAD_MAX_AVATAR_BYTES: int = 5 * 1024 * 1024
+    UPLOAD_MAX_CONTRACT_BYTES: int = 20 * 1024 * 1024
+    UPLOAD_PART_SIZE_BYTES: int = 8 * 1024 * 1024
+    # Avatar derivatives: square thumbnails (WebP and JPEG) rendered in a process pool after
+    # an avatar upload and stored next to the original
+    AVATAR_DERIVATIVE_SIZES: List[int] = [64, 160, 320]
+    IMAGE_WORKERS: int = 2
+    IMAGE_MAX_PIXELS: int = 40_000_000
+    
+    # Event stream (/api/v1/events)
+    EVENTS_QUEUE_SIZE: int = 100
+    EVENTS_HEARTBEAT_SECONDS: float = 15.0
+    
+    # Background jobs (transactional outbox). Disable on serverless deployments without a
+    # long-running process; jobs then wait in the outbox for a worker that has it enabled.
+    JOB_RUNNER_ENABLED: bool = True
+    JOB_WORKERS: int = 4
+    JOB_POLL_SECONDS: float = 5.0
+    JOB_LEASE_SECONDS: int = 300
+    JOB_MAX_ATTEMPTS: int = 8
+    JOB_BACKOFF_BASE_SECONDS: float = 5.0
+    JOB_BACKOFF_MAX_SECONDS: float = 3600.0
+    
+    # Technician location pings: the latest position is kept in Redis (or memory) and written
+    # to the technicians table in batches every LOCATION_FLUSH_SECONDS. Positions are compared
+    # at LOCATION_PRECISION_DECIMALS (5 ~ 1 m); a ping that doesn't move is not written at all.
+    LOCATION_FLUSH_SECONDS: float = 5.0
+    LOCATION_FLUSH_BATCH_SIZE: int = 1000
+    LOCATION_PRECISION_DECIMALS: int = 5
     
     class Config:
         env_file = ".env"
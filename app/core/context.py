@@ -0,0 +1,75 @@
+import time
+import uuid
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+
+@dataclass
+class RequestContext:
+    """Per-request state shared by middleware, database instrumentation and handlers."""
+    method: str
+    path: str
+    request_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    scope: dict = field(repr=False, default_factory=dict)
+    sql_count: int = 0
+    sql_seconds: float = 0.0
+    user_role: Optional[str] = None
+    sql_profile: Optional[Any] = None
+    # time.monotonic() by which the response should be sent
+    deadline: Optional[float] = None
+
+    @property
+    def route(self) -> str:
+        """Route template (e.g. /api/v1/bookings/{booking_id}) once routing has happened."""
+        route = self.scope.get("route")
+        return getattr(route, "path", "unmatched")
+
+
+_request_context: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+
+def get_request_context() -> Optional[RequestContext]:
+    """Context of the request being served, or None outside a request (scripts, startup)."""
+    return _request_context.get()
+
+
+class RequestContextMiddleware:
+    """
+    Outermost middleware: creates the RequestContext and correlates the request id.
+
+    An incoming X-Request-ID (e.g. from the load balancer) is reused, otherwise one is
+    generated; either way it is echoed back on the response.
+    """
+
+    def __init__(self, app, deadline_seconds: Optional[float] = None):
+        self.app = app
+        self.deadline_seconds = deadline_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        ctx = RequestContext(method=scope["method"], path=scope["path"], scope=scope)
+        if self.deadline_seconds:
+            ctx.deadline = time.monotonic() + self.deadline_seconds
+        for key, value in scope["headers"]:
+            if key == REQUEST_ID_HEADER and value:
+                ctx.request_id = value.decode("latin-1")[:128]
+                break
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER, ctx.request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _request_context.set(ctx)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_context.reset(token)
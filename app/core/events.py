@@ -0,0 +1,124 @@
+import asyncio
+import json
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from redis.exceptions import RedisError
+from app.core.config import get_settings
+from app.core.metrics import event_subscribers
+from app.core.redis import get_redis, mark_redis_unavailable, UNAVAILABLE_BACKOFF_SECONDS
+
+settings = get_settings()
+logger = logging.getLogger("perabox.events")
+
+REDIS_CHANNEL = "perabox:events"
+
+
+class EventBroker:
+    """
+    In-process pub/sub for pushing changes to connected clients.
+
+    Subscribers get a bounded queue per connection; a slow consumer loses its oldest events
+    instead of growing memory. With Redis available, published events are also fanned out
+    through a Redis channel so clients connected to other workers receive them; each worker
+    skips its own messages, which it already delivered locally.
+
+    Handlers registered with add_handler receive events in every worker, which is how
+    per-worker caches are invalidated when another worker changes the data.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.instance_id = uuid.uuid4().hex
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._handlers: Dict[str, List[Callable[[dict], None]]] = {}
+        self._listener_task: Optional[asyncio.Task] = None
+
+    def _deliver(self, topics: Iterable[str], event: dict):
+        delivered = set()
+        for topic in topics:
+            for queue in self._subscribers.get(topic, ()):
+                if id(queue) in delivered:
+                    continue
+                delivered.add(id(queue))
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(event)
+        for topic in topics:
+            for handler in self._handlers.get(topic, ()):
+                try:
+                    handler(event)
+                except Exception:
+                    logger.exception("events.handler_failed", extra={"topic": topic})
+
+    def add_handler(self, topic: str, handler: Callable[[dict], None]):
+        """Call `handler(event)` in this worker for every event on `topic`, whichever worker published it."""
+        self._handlers.setdefault(topic, []).append(handler)
+
+    async def publish(self, topics: Iterable[str], event: dict):
+        topics = list(topics)
+        self._deliver(topics, event)
+        redis = get_redis()
+        if redis is None:
+            return
+        message = json.dumps({"origin": self.instance_id, "topics": topics, "event": event}, default=str)
+        try:
+            await redis.publish(REDIS_CHANNEL, message)
+        except (RedisError, OSError) as e:
+            mark_redis_unavailable(e)
+
+    @asynccontextmanager
+    async def subscribe(self, topics: Iterable[str]):
+        """Register a queue on `topics` for the duration of the block."""
+        topics = list(topics)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        for topic in topics:
+            self._subscribers.setdefault(topic, set()).add(queue)
+        event_subscribers.inc()
+        try:
+            yield queue
+        finally:
+            event_subscribers.dec()
+            for topic in topics:
+                queues = self._subscribers.get(topic)
+                if queues is not None:
+                    queues.discard(queue)
+                    if not queues:
+                        del self._subscribers[topic]
+
+    async def _listen(self):
+        while True:
+            redis = get_redis()
+            if redis is None:
+                await asyncio.sleep(UNAVAILABLE_BACKOFF_SECONDS)
+                continue
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(REDIS_CHANNEL)
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    data = json.loads(message["data"])
+                    if data.get("origin") != self.instance_id:
+                        self._deliver(data["topics"], data["event"])
+            except (RedisError, OSError) as e:
+                mark_redis_unavailable(e)
+            except Exception:
+                logger.exception("events.listener_failed")
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.aclose()
+
+    def start(self):
+        if self._listener_task is None and settings.REDIS_ENABLED:
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            self._listener_task = None
+
+
+broker = EventBroker(queue_size=settings.EVENTS_QUEUE_SIZE)
@@ -0,0 +1,160 @@
+import asyncio
+import socket
+import time
+from typing import Optional
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from app.core.config import get_settings
+from app.db.session import engine
+
+settings = get_settings()
+
+
+def get_pool_stats() -> dict:
+    """Snapshot of the SQLAlchemy connection pool counters."""
+    pool = engine.pool
+    stats = {"pool_class": type(pool).__name__}
+    # NullPool has none of these; QueuePool exposes all of them.
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        counter = getattr(pool, name, None)
+        if callable(counter):
+            stats[name] = counter()
+    return stats
+
+
+def check_database() -> Optional[str]:
+    """Run SELECT 1 against the database. Returns the error message, or None if healthy."""
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return None
+    except Exception as e:
+        return str(getattr(e, "orig", e))
+
+
+class ReadinessCache:
+    """
+    Caches the database readiness check so load balancer polling never waits on the DB.
+
+    A background loop refreshes the result every `ttl_seconds`. Reads return the cached
+    result immediately and only block when nothing has been checked yet or the result is
+    far too old to trust (e.g. the loop is not running on a serverless worker).
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._result: Optional[dict] = None
+        self._checked_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> dict:
+        started = time.monotonic()
+        error = await run_in_threadpool(check_database)
+        self._checked_at = time.monotonic()
+        self._result = {
+            "status": "ok" if error is None else "error",
+            "database": "ok" if error is None else error,
+            "check_latency_ms": round((self._checked_at - started) * 1000, 2),
+        }
+        return self._result
+
+    def _schedule_refresh(self) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+        return self._refresh_task
+
+    async def get(self) -> dict:
+        age = time.monotonic() - self._checked_at
+        if self._result is None or age > self.ttl_seconds * 3:
+            await self._schedule_refresh()
+        elif age > self.ttl_seconds:
+            self._schedule_refresh()
+
+        return {
+            **self._result,
+            "age_seconds": round(time.monotonic() - self._checked_at, 2),
+            "pool": get_pool_stats(),
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                pass
+            await asyncio.sleep(self.ttl_seconds)
+
+    def start(self):
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+
+
+readiness = ReadinessCache(ttl_seconds=settings.HEALTH_READY_CACHE_SECONDS)
+
+
+def run_network_diagnostic() -> dict:
+    """
+    Deep DNS/TCP/DB probe of the configured database host.
+
+    Blocking (up to several seconds): call through a threadpool, never on the event loop.
+    """
+    real_url = str(engine.url)
+    hostname = "unknown"
+    if "@" in real_url:
+        hostname = real_url.split("@")[1].split(":")[0]
+
+    probe_results = {
+        "hostname": hostname,
+        "dns_a": [],
+        "dns_aaaa": [],
+        "tcp_5432": "untested",
+        "tcp_6543": "untested",
+        "engine_url_masked": engine.url.render_as_string(hide_password=True),
+    }
+
+    # 1. DNS Probe
+    try:
+        ais = socket.getaddrinfo(hostname, 0, 0, 0, 0)
+        for result in ais:
+            family, _, _, _, sockaddr = result
+            ip = sockaddr[0]
+            if family == socket.AF_INET:
+                probe_results["dns_a"].append(ip)
+            elif family == socket.AF_INET6:
+                probe_results["dns_aaaa"].append(ip)
+    except Exception as e:
+        probe_results["dns_error"] = str(e)
+
+    # 2. TCP Probe
+    def check_port(host, port):
+        try:
+            sock = socket.create_connection((host, port), timeout=3)
+            sock.close()
+            return "open"
+        except Exception as e:
+            return f"closed: {e}"
+
+    probe_results["tcp_5432"] = check_port(hostname, 5432)
+    probe_results["tcp_6543"] = check_port(hostname, 6543)
+
+    # 3. DB Connect Probe
+    error = check_database()
+    if error is None:
+        return {
+            "status": "ok",
+            "message": "Database connection successful",
+            "probe": probe_results,
+            "pool": get_pool_stats(),
+        }
+    return {
+        "status": "error",
+        "message": error,
+        "probe": probe_results,
+        "pool": get_pool_stats(),
+    }
@@ -0,0 +1,32 @@
+import asyncio
+from typing import Optional
+import httpx
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Process-wide async HTTP client. Reusing it keeps TLS connections (HTTP/2 where the
+    server supports it) warm across requests instead of handshaking per call.
+    Recreated if the event loop changes, since pooled connections are bound to their loop.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(10.0, connect=3.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_http_client():
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        _client_loop = None
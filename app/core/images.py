@@ -0,0 +1,86 @@
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Optional
+from PIL import Image, ImageOps
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Derivative format -> (Pillow encoder, file extension, save options)
+DERIVATIVE_FORMATS = {
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class ImageError(ValueError):
+    """The file can't be decoded as an image (corrupt, unsupported or too large)."""
+
+
+def render_derivatives(data: bytes, sizes: Iterable[int], max_pixels: int) -> Dict[int, Dict[str, bytes]]:
+    """
+    Square, center-cropped thumbnails of an image in every derivative format. CPU-bound:
+    runs in the image process pool, so it must stay a picklable top-level function.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as original:
+            # Checked before decoding: the header alone is enough to spot a decompression bomb
+            if original.width * original.height > max_pixels:
+                raise ImageError(f"Image is {original.width}x{original.height}, over {max_pixels} pixels")
+            image = ImageOps.exif_transpose(original).convert("RGB")
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ImageError(str(e)) from e
+
+    rendered = {}
+    for size in sizes:
+        thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        rendered[size] = {}
+        for fmt, (encoder, _, options) in DERIVATIVE_FORMATS.items():
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, encoder, **options)
+            rendered[size][fmt] = buffer.getvalue()
+    return rendered
+
+
+def derivative_key(key: str, size: int, fmt: str) -> str:
+    """Object key of a derivative, next to the original: avatars/<user>/<id>_160.webp."""
+    stem = key.rsplit(".", 1)[0]
+    return f"{stem}_{size}.{DERIVATIVE_FORMATS[fmt][1]}"
+
+
+def start_image_pool():
+    """
+    Create the image process pool; called at app startup. Workers come from a forkserver
+    (spawn where that's unavailable), never a fork of this process: a fork would copy the
+    event loop, the thread pool and whatever locks their threads held at that moment.
+    """
+    global _pool
+    if _pool is None:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_WORKERS, mp_context=context)
+
+
+def image_pool() -> ProcessPoolExecutor:
+    # Started lazily where the app's startup hooks don't run (scripts, tests)
+    start_image_pool()
+    return _pool
+
+
+async def render_in_pool(data: bytes) -> Dict[int, Dict[str, bytes]]:
+    """Render the avatar derivatives without holding the event loop or the GIL."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        image_pool(), render_derivatives, data, tuple(settings.AVATAR_DERIVATIVE_SIZES), settings.IMAGE_MAX_PIXELS
+    )
+
+
+def shutdown_image_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
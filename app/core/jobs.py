@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.config import get_settings
+from app.core.metrics import job_duration, jobs_total
+from app.db.session import SessionLocal
+from app.models.models import OutboxJob
+
+settings = get_settings()
+logger = logging.getLogger("perabox.jobs")
+
+# kind -> handler(db, payload). Handlers are synchronous and run in a worker thread with
+# their own Session; the parts that need the shared async clients go through run_async.
+JOB_HANDLERS: Dict[str, Callable[[Session, dict], Any]] = {}
+
+# The runner executing a handler on this thread, for run_async
+_running = threading.local()
+
+
+def job_handler(kind: str):
+    """Register the handler for outbox jobs of `kind`."""
+    def register(func):
+        if asyncio.iscoroutinefunction(func):
+            raise TypeError(f"Job handler for {kind!r} must be synchronous; await upstreams through run_async")
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+def run_async(coro):
+    """
+    Run a coroutine from a job handler and return its result. It runs on the app's event loop
+    (where the shared async clients live) while the worker thread waits, and is cancelled if
+    it outlasts the job lease. Keep database work out of it: the handler's Session belongs
+    to the worker thread.
+    """
+    runner = getattr(_running, "runner", None)
+    if runner is None or runner._loop is None:
+        # Not started (scripts, tests): no loop of ours to borrow
+        return asyncio.run(coro)
+    future = asyncio.run_coroutine_threadsafe(coro, runner._loop)
+    try:
+        return future.result(timeout=settings.JOB_LEASE_SECONDS)
+    except TimeoutError:
+        future.cancel()
+        raise
+
+
+def enqueue_job(db: Session, kind: str, payload: dict):
+    """
+    Add a job to the outbox in the caller's transaction. It runs only if that transaction
+    commits, and the runner is woken right after the commit.
+    """
+    db.add(OutboxJob(kind=kind, payload=payload, status="pending", attempts=0, run_after=utcnow()))
+    db.info["outbox_jobs_enqueued"] = True
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def retry_delay_seconds(attempts: int) -> float:
+    """Exponential backoff with jitter, capped at JOB_BACKOFF_MAX_SECONDS."""
+    delay = min(settings.JOB_BACKOFF_MAX_SECONDS, settings.JOB_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return random.uniform(delay / 2, delay)
+
+
+class JobRunner:
+    """
+    Drains the outbox with a pool of asyncio workers.
+
+    A worker claims one due job at a time (FOR UPDATE SKIP LOCKED on Postgres, so several
+    app instances can share the table), leases it for JOB_LEASE_SECONDS and runs its handler
+    in a thread. The handler's own writes commit together with marking the job done. Failures
+    are retried with backoff until JOB_MAX_ATTEMPTS, then the job is dead-lettered (status
+    'dead', last_error kept) for inspection. Jobs whose worker died are picked up again once
+    the lease runs out, so handlers must tolerate running more than once.
+    """
+
+    def __init__(self, session_factory=SessionLocal, workers: int = 4):
+        self.session_factory = session_factory
+        self.workers = workers
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def claim(self) -> Optional[OutboxJob]:
+        now = utcnow()
+        with self.session_factory() as db:
+            due = (
+                select(OutboxJob.id)
+                .where(OutboxJob.status.in_(["pending", "processing"]), OutboxJob.run_after <= now)
+                .order_by(OutboxJob.run_after)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            job = db.scalars(
+                update(OutboxJob)
+                .where(OutboxJob.id == due)
+                .values(
+                    status="processing",
+                    attempts=OutboxJob.attempts + 1,
+                    run_after=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                )
+                .returning(OutboxJob)
+                .execution_options(synchronize_session=False)
+            ).first()
+            if job is not None:
+                db.expunge(job)
+            db.commit()
+            return job
+
+    def _settle(self, db: Session, job: OutboxJob, **values):
+        # Only the lease holder may settle: a reclaimed job has a higher attempt count.
+        db.execute(
+            update(OutboxJob)
+            .where(OutboxJob.id == job.id, OutboxJob.status == "processing", OutboxJob.attempts == job.attempts)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+    def run(self, job: OutboxJob) -> str:
+        """Run one claimed job. Returns the outcome: done, retry or dead."""
+        started = time.perf_counter()
+        with self.session_factory() as db:
+            try:
+                handler = JOB_HANDLERS.get(job.kind)
+                if handler is None:
+                    raise LookupError(f"No handler registered for job kind {job.kind!r}")
+                _running.runner = self
+                try:
+                    handler(db, job.payload)
+                finally:
+                    _running.runner = None
+                self._settle(db, job, status="done", last_error=None)
+                db.commit()
+                outcome = "done"
+            except Exception as e:
+                db.rollback()
+                error = f"{type(e).__name__}: {e}"[:2000]
+                if job.attempts >= settings.JOB_MAX_ATTEMPTS:
+                    self._settle(db, job, status="dead", last_error=error)
+                    outcome = "dead"
+                    logger.error(
+                        "jobs.dead_lettered",
+                        extra={"job_id": str(job.id), "kind": job.kind, "attempts": job.attempts, "error": error},
+                    )
+                else:
+                    delay = retry_delay_seconds(job.attempts)
+                    self._settle(
+                        db, job, status="pending", last_error=error, run_after=utcnow() + timedelta(seconds=delay)
+                    )
+                    outcome = "retry"
+                    logger.warning(
+                        "jobs.failed",
+                        extra={"job_id": str(job.id), "kind": job.kind, "attempts": job.attempts,
+                               "retry_in_seconds": round(delay, 1), "error": error},
+                    )
+                db.commit()
+        jobs_total.labels(job.kind, outcome).inc()
+        job_duration.labels(job.kind).observe(time.perf_counter() - started)
+        return outcome
+
+    def notify(self):
+        """Wake idle workers (thread-safe)."""
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _worker(self):
+        while True:
+            # Clear before claiming so a job enqueued while we look isn't missed
+            self._wake.clear()
+            try:
+                job = await run_in_threadpool(self.claim)
+                if job is not None:
+                    await run_in_threadpool(self.run, job)
+                    continue
+            except Exception:
+                logger.exception("jobs.worker_error")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._tasks or not settings.JOB_RUNNER_ENABLED:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._loop = None
+
+
+job_runner = JobRunner(workers=settings.JOB_WORKERS)
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_runner_after_commit(session: Session):
+    if session.info.pop("outbox_jobs_enqueued", False):
+        job_runner.notify()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_enqueued_jobs(session: Session):
+    session.info.pop("outbox_jobs_enqueued", None)
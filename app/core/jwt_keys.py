@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional
+from jose import jwk, jwt, JWTError
+from jose.backends.base import Key
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger("perabox.auth")
+
+SYMMETRIC_ALGORITHMS = {"HS256", "HS384", "HS512"}
+ASYMMETRIC_ALGORITHMS = {"RS256", "RS384", "RS512", "ES256", "ES384", "ES512"}
+
+# How often decode checks whether the JWKS / private key files changed on disk.
+RELOAD_CHECK_SECONDS = 30.0
+
+
+class KeyRing:
+    """
+    Prepared JWT signing and verification keys.
+
+    Keys are parsed once (PEM/JWK parsing dominates RS/ES verification cost) and looked up by
+    the token's `kid` header. For asymmetric algorithms the private key at JWT_PRIVATE_KEY_PATH
+    signs, and the public keys in the local JWKS at JWT_JWKS_PATH (plus the signing key's own
+    public half) verify. To rotate, add the new key's public JWK to the JWKS, switch the private
+    key and JWT_KEY_ID, and drop the old JWK once its tokens have expired.
+    """
+
+    def __init__(self):
+        self.algorithm = settings.ALGORITHM
+        self.signing_kid: Optional[str] = None
+        self.signing_key: Optional[Key] = None
+        self.verification_keys: Dict[str, Key] = {}
+        self.public_jwks: list = []
+        self._mtimes: tuple = ()
+        self._checked_at = 0.0
+        self.load()
+
+    def _watched_files(self) -> tuple:
+        return tuple(p for p in (settings.JWT_PRIVATE_KEY_PATH, settings.JWT_JWKS_PATH) if p)
+
+    def _current_mtimes(self) -> tuple:
+        return tuple(os.stat(p).st_mtime for p in self._watched_files())
+
+    def load(self):
+        if self.algorithm in SYMMETRIC_ALGORITHMS:
+            self.signing_kid = None
+            self.signing_key = jwk.construct(settings.SECRET_KEY, self.algorithm)
+            self.verification_keys = {}
+            self.public_jwks = []
+            return
+
+        if self.algorithm not in ASYMMETRIC_ALGORITHMS:
+            raise ValueError(f"Unsupported JWT algorithm: {self.algorithm}")
+        if not settings.JWT_PRIVATE_KEY_PATH:
+            raise ValueError(f"JWT_PRIVATE_KEY_PATH is required for {self.algorithm}")
+
+        with open(settings.JWT_PRIVATE_KEY_PATH) as f:
+            signing_key = jwk.construct(f.read(), self.algorithm)
+        signing_kid = settings.JWT_KEY_ID or "default"
+
+        public_jwks = []
+        if settings.JWT_JWKS_PATH:
+            with open(settings.JWT_JWKS_PATH) as f:
+                public_jwks = [k for k in json.load(f).get("keys", []) if k.get("kid") != signing_kid]
+        own_public = {**signing_key.public_key().to_dict(), "kid": signing_kid, "use": "sig", "alg": self.algorithm}
+        public_jwks.append(own_public)
+
+        self.verification_keys = {
+            k["kid"]: jwk.construct(k, k.get("alg", self.algorithm)) for k in public_jwks if k.get("kid")
+        }
+        self.signing_key = signing_key
+        self.signing_kid = signing_kid
+        self.public_jwks = public_jwks
+        self._mtimes = self._current_mtimes()
+
+    def maybe_reload(self):
+        now = time.monotonic()
+        if not self._watched_files() or now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        try:
+            if self._current_mtimes() != self._mtimes:
+                self.load()
+        except Exception as e:
+            # Usually a key file caught mid-write: keep verifying with the previous keys and
+            # try again on the next check rather than failing the request that noticed.
+            logger.error("auth.key_reload_failed", extra={"error": f"{type(e).__name__}: {e}"})
+
+    def sign(self, claims: dict) -> str:
+        headers = {"kid": self.signing_kid} if self.signing_kid else None
+        return jwt.encode(claims, self.signing_key, algorithm=self.algorithm, headers=headers)
+
+    def verify(self, token: str) -> dict:
+        """Verify signature and registered claims. Raises JWTError."""
+        self.maybe_reload()
+        key = self.signing_key
+        if self.signing_kid is not None:
+            kid = jwt.get_unverified_header(token).get("kid")
+            key = self.verification_keys.get(kid)
+            if key is None:
+                raise JWTError("Unknown signing key")
+        return jwt.decode(token, key, algorithms=[self.algorithm])
+
+
+keyring = KeyRing()
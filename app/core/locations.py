@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional, Set, Tuple
+from redis.exceptions import RedisError
+from sqlalchemy import bindparam, update
+from starlette.concurrency import run_in_threadpool
+from app.core.config import get_settings
+from app.core.metrics import location_pings_total, location_rows_flushed_total
+from app.core.redis import get_redis, mark_redis_unavailable
+from app.db.session import SessionLocal
+from app.models.models import Technician
+
+settings = get_settings()
+logger = logging.getLogger("perabox.locations")
+
+LATEST_KEY = "locations:latest"  # user id -> "lat,lng"
+REPORTED_AT_KEY = "locations:reported_at"  # user id -> unix time of the last move
+DIRTY_KEY = "locations:dirty"  # user ids moved since the last flush
+
+# Store a position unless it equals the current one. KEYS = latest, reported_at, dirty;
+# ARGV = user id, "lat,lng", unix time. Returns 1 if the technician moved.
+RECORD_LUA = """
+if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[3])
+redis.call('SADD', KEYS[3], ARGV[1])
+return 1
+"""
+
+# Pop up to ARGV[1] moved technicians with their positions: {id, "lat,lng", time, id, ...}.
+# SPOP hands each one to a single flusher when several app instances share Redis.
+DRAIN_LUA = """
+local out = {}
+for _, id in ipairs(redis.call('SPOP', KEYS[3], ARGV[1])) do
+    out[#out + 1] = id
+    out[#out + 1] = redis.call('HGET', KEYS[1], id)
+    out[#out + 1] = redis.call('HGET', KEYS[2], id)
+end
+return out
+"""
+
+# (user id, "lat,lng", unix time)
+Position = Tuple[str, str, float]
+
+
+class LocationStore:
+    """
+    Latest technician positions, written to the technicians table in periodic batches.
+
+    Pings only touch Redis (or process memory when Redis is unavailable): a position equal to
+    the stored one at LOCATION_PRECISION_DECIMALS is dropped, a new one marks the technician
+    dirty. Every LOCATION_FLUSH_SECONDS the dirty set is drained and written with one
+    executemany UPDATE per LOCATION_FLUSH_BATCH_SIZE technicians, so the database sees at most
+    one write per moving technician per interval however often they ping.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._latest: Dict[str, Tuple[str, float]] = {}
+        self._dirty: Set[str] = set()
+        self._record_script = None
+        self._drain_script = None
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def position_key(latitude: float, longitude: float) -> str:
+        decimals = settings.LOCATION_PRECISION_DECIMALS
+        return f"{latitude:.{decimals}f},{longitude:.{decimals}f}"
+
+    async def record(self, user_id: str, latitude: float, longitude: float) -> bool:
+        """Store a technician's position. Returns False if they haven't moved."""
+        position, now = self.position_key(latitude, longitude), time.time()
+        moved = await self._record_redis(user_id, position, now)
+        if moved is None:
+            current = self._latest.get(user_id)
+            moved = current is None or current[0] != position
+            if moved:
+                self._latest[user_id] = (position, now)
+                self._dirty.add(user_id)
+        location_pings_total.labels("moved" if moved else "unchanged").inc()
+        return moved
+
+    async def _record_redis(self, user_id: str, position: str, now: float) -> Optional[bool]:
+        redis = get_redis()
+        if redis is None:
+            return None
+        if self._record_script is None:
+            self._record_script = redis.register_script(RECORD_LUA)
+        try:
+            return bool(await self._record_script(
+                keys=[LATEST_KEY, REPORTED_AT_KEY, DIRTY_KEY], args=[user_id, position, now]
+            ))
+        except (RedisError, OSError) as e:
+            mark_redis_unavailable(e)
+            return None
+
+    async def _drain_memory(self, limit: int) -> List[Position]:
+        rows = []
+        while self._dirty and len(rows) < limit:
+            user_id = self._dirty.pop()
+            rows.append((user_id, *self._latest[user_id]))
+        return rows
+
+    async def _requeue_memory(self, rows: List[Position]):
+        for user_id, position, reported_at in rows:
+            # Keep a newer position recorded while the write was failing
+            self._latest.setdefault(user_id, (position, reported_at))
+            self._dirty.add(user_id)
+
+    async def _drain_redis(self, limit: int) -> List[Position]:
+        redis = get_redis()
+        if redis is None:
+            return []
+        if self._drain_script is None:
+            self._drain_script = redis.register_script(DRAIN_LUA)
+        try:
+            flat = await self._drain_script(keys=[LATEST_KEY, REPORTED_AT_KEY, DIRTY_KEY], args=[limit])
+        except (RedisError, OSError) as e:
+            mark_redis_unavailable(e)
+            return []
+        return [(flat[i], flat[i + 1], float(flat[i + 2])) for i in range(0, len(flat), 3) if flat[i + 1]]
+
+    async def _requeue_redis(self, rows: List[Position]):
+        try:
+            await get_redis().sadd(DIRTY_KEY, *(user_id for user_id, _, _ in rows))
+        except (AttributeError, RedisError, OSError) as e:
+            # Redis went away in between: keep the positions in memory instead
+            logger.warning("locations.requeue_failed", extra={"error": str(e), "count": len(rows)})
+            await self._requeue_memory(rows)
+
+    def write(self, rows: List[Position]):
+        """One batched UPDATE of technicians' positions, keyed by user id."""
+        table = Technician.__table__
+        statement = (
+            update(table)
+            .where(table.c.user_id == bindparam("uid"))
+            .values(latitude=bindparam("lat"), longitude=bindparam("lng"), location_updated_at=bindparam("at"))
+        )
+        params = []
+        for user_id, position, reported_at in rows:
+            latitude, longitude = position.split(",")
+            params.append({
+                "uid": uuid.UUID(user_id),
+                "lat": Decimal(latitude),
+                "lng": Decimal(longitude),
+                "at": datetime.fromtimestamp(reported_at, timezone.utc),
+            })
+        with self.session_factory() as db:
+            db.execute(statement, params)
+            db.commit()
+
+    async def flush(self) -> int:
+        """Write every pending position to the database. Returns how many technicians were written."""
+        batch_size = settings.LOCATION_FLUSH_BATCH_SIZE
+        written = 0
+        for drain, requeue in ((self._drain_memory, self._requeue_memory), (self._drain_redis, self._requeue_redis)):
+            while True:
+                rows = await drain(batch_size)
+                if not rows:
+                    break
+                try:
+                    await run_in_threadpool(self.write, rows)
+                except Exception:
+                    await requeue(rows)
+                    raise
+                written += len(rows)
+                location_rows_flushed_total.inc(len(rows))
+                if len(rows) < batch_size:
+                    break
+        return written
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.LOCATION_FLUSH_SECONDS)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("locations.flush_failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        # Positions only held in memory would be lost otherwise
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("locations.flush_failed")
+
+
+location_store = LocationStore()
@@ -0,0 +1,107 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from app.core.config import get_settings
+from app.core.context import get_request_context
+
+settings = get_settings()
+
+# Attributes every LogRecord has; anything else was passed via `extra=` and is emitted as a field.
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Copies request id and route onto the record. Attached to the QueueHandler so it runs in
+    the emitting thread, where the request context is still visible.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        ctx = get_request_context()
+        record.request_id = ctx.request_id if ctx is not None else None
+        record.route = ctx.route if ctx is not None else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Drops a fraction of high-volume records. A record's rate comes from `extra={"sample_rate": r}`;
+    DEBUG records without one use LOG_DEBUG_SAMPLE_RATE. Warnings and errors are never sampled.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = getattr(record, "sample_rate", None)
+        if rate is None:
+            if record.levelno > logging.DEBUG:
+                return True
+            rate = settings.LOG_DEBUG_SAMPLE_RATE
+        return rate >= 1 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, event, request id and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and key != "sample_rate" and value is not None:
+                entry[key] = value
+        if record.exc_text or record.exc_info:
+            entry["exc_info"] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _EnqueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Keep `extra` fields and exc_info as-is for the formatter on the listener thread;
+        # the default prepare() merges args into msg and drops exc_info.
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        return record
+
+
+def setup_logging():
+    """
+    Route the `perabox` logger tree through a queue so request handlers never block on stdout.
+    Idempotent; the listener thread is stopped (and the queue flushed) at interpreter exit.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    enqueue = _EnqueueHandler(log_queue)
+    enqueue.addFilter(SamplingFilter())
+    enqueue.addFilter(RequestContextFilter())
+
+    stream = logging.StreamHandler(sys.stdout)
+    if settings.LOG_JSON:
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    root = logging.getLogger("perabox")
+    root.setLevel(settings.LOG_LEVEL.upper())
+    root.addHandler(enqueue)
+    root.propagate = False
+
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
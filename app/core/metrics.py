@@ -0,0 +1,174 @@
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from sqlalchemy import event
+from starlette.responses import Response
+from app.core.context import get_request_context
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+http_request_duration = Histogram(
+    "perabox_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+http_requests_in_progress = Gauge(
+    "perabox_http_requests_in_progress",
+    "HTTP requests currently being served",
+    ["method"],
+)
+db_queries_per_request = Histogram(
+    "perabox_db_queries_per_request",
+    "SQL statements executed per HTTP request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+db_query_seconds_per_request = Histogram(
+    "perabox_db_query_seconds_per_request",
+    "Total time spent in SQL statements per HTTP request",
+    ["route"],
+    buckets=LATENCY_BUCKETS,
+)
+db_connect_seconds = Histogram(
+    "perabox_db_connect_seconds",
+    "Time to obtain a new DBAPI connection (every pool checkout under NullPool)",
+    buckets=LATENCY_BUCKETS,
+)
+upstream_request_duration = Histogram(
+    "perabox_upstream_request_duration_seconds",
+    "Latency of calls to external providers",
+    ["provider", "operation", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+upstream_requests_total = Counter(
+    "perabox_upstream_requests_total",
+    "Calls to external providers",
+    ["provider", "operation", "outcome"],
+)
+upstream_circuit_state = Gauge(
+    "perabox_upstream_circuit_state",
+    "Circuit breaker state per provider (0 closed, 1 half-open, 2 open)",
+    ["provider"],
+)
+upstream_in_flight = Gauge(
+    "perabox_upstream_in_flight",
+    "Calls to a provider holding a bulkhead slot (including abandoned, still-running ones)",
+    ["provider"],
+)
+upstream_rejections_total = Counter(
+    "perabox_upstream_rejections_total",
+    "Provider calls refused or abandoned (circuit_open, bulkhead_full, deadline, timeout)",
+    ["provider", "reason"],
+)
+chat_messages_total = Counter(
+    "perabox_chat_messages_total",
+    "Pera-Bot messages by how they were answered (local intent or escalated to the LLM)",
+    ["route", "intent"],
+)
+location_pings_total = Counter(
+    "perabox_location_pings_total",
+    "Technician location pings by outcome (moved, unchanged)",
+    ["outcome"],
+)
+location_rows_flushed_total = Counter(
+    "perabox_location_rows_flushed_total",
+    "Technician rows updated by the batched location flush",
+)
+jobs_total = Counter(
+    "perabox_jobs_total",
+    "Outbox job runs by outcome (done, retry, dead)",
+    ["kind", "outcome"],
+)
+job_duration = Histogram(
+    "perabox_job_duration_seconds",
+    "Outbox job handler run time",
+    ["kind"],
+    buckets=LATENCY_BUCKETS,
+)
+event_subscribers = Gauge(
+    "perabox_event_subscribers",
+    "Clients connected to the event stream on this worker",
+)
+
+
+@contextmanager
+def track_upstream(provider: str, operation: str):
+    """Time a call to an external provider (midtrans, gemini, google)."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        upstream_request_duration.labels(provider, operation, outcome).observe(time.perf_counter() - started)
+        upstream_requests_total.labels(provider, operation, outcome).inc()
+
+
+def instrument_engine(engine):
+    """Attach SQL timing and connection-wait listeners to an Engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._perabox_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        ctx = get_request_context()
+        started = getattr(context, "_perabox_started", None)
+        if ctx is None or started is None:
+            return
+        ctx.sql_count += 1
+        ctx.sql_seconds += time.perf_counter() - started
+
+    @event.listens_for(engine, "do_connect")
+    def _do_connect(dialect, conn_rec, cargs, cparams):
+        started = time.perf_counter()
+        try:
+            return dialect.connect(*cargs, **cparams)
+        finally:
+            db_connect_seconds.observe(time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording per-route latency, in-flight requests and SQL usage.
+    Must sit inside RequestContextMiddleware.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        ctx = get_request_context()
+        if scope["type"] != "http" or ctx is None:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = http_requests_in_progress.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            route = ctx.route
+            http_request_duration.labels(method, route, str(status_code)).observe(elapsed)
+            db_queries_per_request.labels(route).observe(ctx.sql_count)
+            db_query_seconds_per_request.labels(route).observe(ctx.sql_seconds)
+
+
+async def metrics_endpoint():
+    """Prometheus scrape endpoint."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
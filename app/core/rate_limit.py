@@ -0,0 +1,117 @@
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Tuple
+from fastapi import HTTPException, Request, status
+from redis.exceptions import RedisError
+from app.core.config import get_settings
+from app.core.redis import get_redis, mark_redis_unavailable
+
+settings = get_settings()
+
+# Sliding-window log in a sorted set. Atomic, so concurrent workers cannot overshoot the limit.
+# KEYS[1] = bucket key; ARGV = now_ms, window_ms, limit, member
+# Returns {allowed (1/0), retry_after_ms}
+SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+local count = redis.call('ZCARD', key)
+if count < limit then
+    redis.call('ZADD', key, now, ARGV[4])
+    redis.call('PEXPIRE', key, window)
+    return {1, 0}
+end
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+return {0, tonumber(oldest[2]) + window - now}
+"""
+
+
+class InMemorySlidingWindow:
+    """Per-process sliding-window log, used when Redis is unavailable. Bounded to `max_keys` buckets."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, deque]" = OrderedDict()
+
+    def hit(self, key: str, limit: int, window_seconds: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = deque()
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        while bucket and bucket[0] <= now - window_seconds:
+            bucket.popleft()
+        if len(bucket) < limit:
+            bucket.append(now)
+            return True, 0.0
+        return False, bucket[0] + window_seconds - now
+
+
+class RateLimiter:
+    def __init__(self):
+        self._memory = InMemorySlidingWindow()
+        self._script = None
+
+    async def hit(self, key: str, limit: int, window_seconds: float) -> Tuple[bool, float]:
+        """Count one attempt against `key`. Returns (allowed, retry_after_seconds)."""
+        redis = get_redis()
+        if redis is not None:
+            if self._script is None:
+                self._script = redis.register_script(SLIDING_WINDOW_LUA)
+            try:
+                allowed, retry_after_ms = await self._script(
+                    keys=[f"ratelimit:{key}"],
+                    args=[int(time.time() * 1000), int(window_seconds * 1000), limit, uuid.uuid4().hex],
+                )
+                return bool(allowed), retry_after_ms / 1000
+            except (RedisError, OSError) as e:
+                mark_redis_unavailable(e)
+        return self._memory.hit(key, limit, window_seconds)
+
+
+limiter = RateLimiter()
+
+
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        # Each proxy appends the address it saw; anything left of our proxies' hops is client-supplied
+        if len(hops) >= settings.RATE_LIMIT_TRUSTED_PROXIES > 0:
+            return hops[-settings.RATE_LIMIT_TRUSTED_PROXIES]
+    return request.client.host if request.client else "unknown"
+
+
+async def enforce_rate_limit(key: str, limit: int, window_seconds: float):
+    """Raise 429 with Retry-After when `key` has exceeded `limit` attempts in the window."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    allowed, retry_after = await limiter.hit(key, limit, window_seconds)
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts. Please try again later.",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
+
+async def limit_auth_by_ip(request: Request, action: str):
+    await enforce_rate_limit(
+        f"auth:{action}:ip:{client_ip(request)}",
+        settings.RATE_LIMIT_AUTH_PER_IP,
+        settings.RATE_LIMIT_AUTH_WINDOW_SECONDS,
+    )
+
+
+async def limit_auth_by_email(email: str, action: str):
+    await enforce_rate_limit(
+        f"auth:{action}:email:{email.strip().lower()}",
+        settings.RATE_LIMIT_AUTH_PER_EMAIL,
+        settings.RATE_LIMIT_AUTH_WINDOW_SECONDS,
+    )
@@ -0,0 +1,47 @@
+import logging
+import time
+from typing import Optional
+import redis.asyncio as aioredis
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger("perabox.redis")
+
+# After a connection failure, skip Redis for this long and let callers use their in-memory fallback.
+UNAVAILABLE_BACKOFF_SECONDS = 30.0
+
+_client: Optional[aioredis.Redis] = None
+_unavailable_until = 0.0
+
+
+def get_redis() -> Optional[aioredis.Redis]:
+    """
+    Shared async Redis client, or None if Redis is disabled or was recently unreachable.
+    Callers must treat None as "use the in-process fallback".
+    """
+    global _client
+    if not settings.REDIS_ENABLED or time.monotonic() < _unavailable_until:
+        return None
+    if _client is None:
+        _client = aioredis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=0.25,
+            socket_timeout=0.25,
+            decode_responses=True,
+        )
+    return _client
+
+
+def mark_redis_unavailable(exc: Exception):
+    """Record a Redis failure so callers fall back for UNAVAILABLE_BACKOFF_SECONDS."""
+    global _unavailable_until
+    if time.monotonic() >= _unavailable_until:
+        logger.warning("redis.unavailable", extra={"error": str(exc), "backoff_seconds": UNAVAILABLE_BACKOFF_SECONDS})
+    _unavailable_until = time.monotonic() + UNAVAILABLE_BACKOFF_SECONDS
+
+
+async def close_redis():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,214 @@
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from fastapi import HTTPException, status
+from app.core.config import get_settings
+from app.core.context import get_request_context
+from app.core.metrics import (
+    track_upstream,
+    upstream_circuit_state,
+    upstream_in_flight,
+    upstream_rejections_total,
+)
+
+settings = get_settings()
+logger = logging.getLogger("perabox.upstream")
+
+CIRCUIT_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class UpstreamUnavailable(Exception):
+    """A call was not made (or abandoned) because the provider is failing or saturated."""
+
+    def __init__(self, provider: str, reason: str):
+        super().__init__(f"{provider} unavailable: {reason}")
+        self.provider = provider
+        # circuit_open, bulkhead_full, deadline or timeout
+        self.reason = reason
+
+
+def service_unavailable(exc: UpstreamUnavailable, detail: str) -> HTTPException:
+    """503 for a refused upstream call; retry after the circuit's cool-down if it is open."""
+    retry_after = settings.CIRCUIT_RESET_SECONDS if exc.reason == "circuit_open" else 1
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": str(max(1, int(retry_after)))},
+    )
+
+
+def is_client_error(exc: Exception) -> bool:
+    """
+    4xx answers (bad card details, rejected token, invalid prompt) mean the provider is
+    healthy, so they don't count against the circuit. 408 and 429 do.
+    """
+    code = getattr(exc, "http_status_code", None) or getattr(exc, "code", None)
+    return isinstance(code, int) and 400 <= code < 500 and code not in (408, 429)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_seconds`. Then it is half-open: a single probe call is let through, and its
+    outcome closes the circuit again or re-opens it for another `reset_seconds`.
+    """
+
+    def __init__(self, provider: str, failure_threshold: int, reset_seconds: float):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        upstream_circuit_state.labels(provider).set(0)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning("upstream.circuit_" + state, extra={"provider": self.provider, "failures": self.failures})
+        self.state = state
+        upstream_circuit_state.labels(self.provider).set(CIRCUIT_STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._set_state("half_open")
+        if self.state == "closed":
+            return True
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release(self):
+        """The allowed call never reached the provider; let another one probe."""
+        self._probing = False
+
+    def record_success(self):
+        self._probing = False
+        self.failures = 0
+        self._set_state("closed")
+
+    def record_failure(self):
+        self._probing = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            self._set_state("open")
+
+
+class UpstreamGuard:
+    """
+    Isolates calls to one provider: a circuit breaker, a bulkhead of `max_concurrency`
+    calls (waiting at most `queue_timeout` seconds for a slot), and a per-call timeout
+    capped by the remaining request deadline.
+
+    Synchronous SDK calls run on the guard's own threads. A timed-out call is abandoned
+    but keeps its slot until its thread returns, so a hung provider can't pile up threads.
+    """
+
+    def __init__(self, provider: str, timeout: float, max_concurrency: int, queue_timeout: float,
+                 failure_threshold: int, reset_seconds: float):
+        self.provider = provider
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.breaker = CircuitBreaker(provider, failure_threshold, reset_seconds)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"upstream-{provider}")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Semaphores are bound to the loop that first waits on them
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    def time_left(self) -> float:
+        """Seconds this call may take: the provider timeout, or less if the request deadline is nearer."""
+        ctx = get_request_context()
+        if ctx is None or ctx.deadline is None:
+            return self.timeout
+        return min(self.timeout, ctx.deadline - time.monotonic())
+
+    def _reject(self, reason: str):
+        upstream_rejections_total.labels(self.provider, reason).inc()
+        raise UpstreamUnavailable(self.provider, reason)
+
+    async def call(self, operation: str, fn: Callable, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` (sync or async) under the guard."""
+        timeout = self.time_left()
+        if timeout <= 0:
+            self._reject("deadline")
+        if not self.breaker.allow():
+            self._reject("circuit_open")
+
+        semaphore = self._get_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=min(self.queue_timeout, timeout))
+        except asyncio.TimeoutError:
+            self.breaker.release()
+            self._reject("bulkhead_full")
+        except asyncio.CancelledError:
+            # Cancelled while queued: a half-open probe must not stay claimed forever
+            self.breaker.release()
+            raise
+
+        in_flight = upstream_in_flight.labels(self.provider)
+        in_flight.inc()
+
+        def release(*_):
+            semaphore.release()
+            in_flight.dec()
+
+        timeout = self.time_left()
+        if asyncio.iscoroutinefunction(fn):
+            pending = asyncio.ensure_future(fn(*args, **kwargs))
+            pending.add_done_callback(release)
+        else:
+            loop = asyncio.get_running_loop()
+            future = self._executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+            future.add_done_callback(lambda _: loop.call_soon_threadsafe(release))
+            pending = asyncio.wrap_future(future)
+
+        try:
+            with track_upstream(self.provider, operation):
+                result = await asyncio.wait_for(pending, timeout=max(timeout, 0))
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            upstream_rejections_total.labels(self.provider, "timeout").inc()
+            logger.warning("upstream.timeout", extra={"provider": self.provider, "operation": operation,
+                                                      "timeout_seconds": round(timeout, 3)})
+            raise UpstreamUnavailable(self.provider, "timeout") from None
+        except asyncio.CancelledError:
+            # Client went away; the outcome is unknown
+            self.breaker.release()
+            raise
+        except Exception as e:
+            if is_client_error(e):
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+
+def _guard(provider: str, timeout: float) -> UpstreamGuard:
+    return UpstreamGuard(
+        provider,
+        timeout=timeout,
+        max_concurrency=settings.UPSTREAM_MAX_CONCURRENCY,
+        queue_timeout=settings.UPSTREAM_QUEUE_TIMEOUT_SECONDS,
+        failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds=settings.CIRCUIT_RESET_SECONDS,
+    )
+
+
+gemini_guard = _guard("gemini", settings.UPSTREAM_GEMINI_TIMEOUT_SECONDS)
+midtrans_guard = _guard("midtrans", settings.UPSTREAM_MIDTRANS_TIMEOUT_SECONDS)
+google_guard = _guard("google", settings.UPSTREAM_GOOGLE_TIMEOUT_SECONDS)
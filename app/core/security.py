@@ -1,14 +1,34 @@
+import secrets
+import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
+from jose import JWTError
 import bcrypt
 from app.core.config import get_settings
+from app.core.jwt_keys import keyring
 
 settings = get_settings()
 
+# token -> verified payload. Tokens are presented on every request for their whole lifetime,
+# so most verifications are repeats; entries are still checked against `exp` on every hit.
+_verified_tokens: "OrderedDict[str, dict]" = OrderedDict()
+
+
+# Password hashes starting with this never verify (accounts that sign in via OAuth only).
+UNUSABLE_PASSWORD_PREFIX = "!"
+
+
+def make_unusable_password() -> str:
+    """Placeholder password hash for password-less accounts. No bcrypt work needed."""
+    return UNUSABLE_PASSWORD_PREFIX + secrets.token_hex(16)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash."""
+    if hashed_password.startswith(UNUSABLE_PASSWORD_PREFIX):
+        return False
     try:
         password_bytes = plain_password.encode('utf-8')
         hashed_bytes = hashed_password.encode('utf-8')
@@ -34,23 +54,55 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode.update({"exp": expire, "type": "access"})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    return keyring.sign(to_encode)
 
 
-def create_refresh_token(data: dict) -> str:
-    """Create a JWT refresh token."""
+def access_token_claims(user) -> dict:
+    """
+    Claims for a user's access token. Role and technician id are embedded so authorization
+    checks and technician-scoped queries don't need to look them up per request.
+    """
+    claims = {"sub": str(user.id), "role": user.role}
+    if user.role == "technician" and user.technician is not None:
+        claims["technician_id"] = str(user.technician.id)
+    return claims
+
+
+def create_refresh_token(data: dict, family_id: Optional[str] = None) -> str:
+    """
+    Create a JWT refresh token.
+    
+    Each token has a unique `jti`; `fam` identifies the login session and is carried over
+    when the token is rotated, so a reused token can revoke every descendant.
+    """
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire, "type": "refresh"})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    to_encode.update({
+        "exp": expire,
+        "type": "refresh",
+        "jti": uuid.uuid4().hex,
+        "fam": family_id or uuid.uuid4().hex,
+    })
+    return keyring.sign(to_encode)
 
 
 def decode_token(token: str) -> Optional[dict]:
     """Decode and verify a JWT token."""
+    payload = _verified_tokens.get(token)
+    if payload is not None:
+        if payload["exp"] > time.time():
+            _verified_tokens.move_to_end(token)
+            return payload
+        del _verified_tokens[token]
+        return None
+    
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
+        payload = keyring.verify(token)
     except JWTError:
         return None
+    
+    if settings.TOKEN_VERIFY_CACHE_SIZE > 0 and "exp" in payload:
+        _verified_tokens[token] = payload
+        if len(_verified_tokens) > settings.TOKEN_VERIFY_CACHE_SIZE:
+            _verified_tokens.popitem(last=False)
+    return payload
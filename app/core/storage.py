@@ -0,0 +1,201 @@
+import hashlib
+import hmac
+import re
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+import httpx
+from app.core.config import get_settings
+from app.core.http import get_http_client
+
+settings = get_settings()
+
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+
+class StorageError(Exception):
+    pass
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode(), hashlib.sha256).digest()
+
+
+def _canonical_query(params: Dict[str, str]) -> str:
+    return "&".join(f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in sorted(params.items()))
+
+
+def sign_v4(method: str, host: str, path: str, query: Dict[str, str], headers: Dict[str, str],
+            access_key: str, secret_key: str, region: str, now: datetime,
+            payload_hash: str = UNSIGNED_PAYLOAD,
+            presign_expires: Optional[int] = None) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    AWS Signature Version 4 for S3 (what MinIO implements). `headers` must not include host.
+    Returns the query and headers to send: with `presign_expires` the signature goes in the
+    query string (a presigned URL), otherwise in the Authorization header.
+    """
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    scope = f"{now.strftime('%Y%m%d')}/{region}/s3/aws4_request"
+    signed = {"host": host, **{k.lower(): v.strip() for k, v in headers.items()}}
+    signed_names = ";".join(sorted(signed))
+    query = dict(query)
+    headers = dict(headers)
+    if presign_expires is not None:
+        query.update({
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{access_key}/{scope}",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(presign_expires),
+            "X-Amz-SignedHeaders": signed_names,
+        })
+    else:
+        headers["x-amz-date"] = signed["x-amz-date"] = amz_date
+        headers["x-amz-content-sha256"] = signed["x-amz-content-sha256"] = payload_hash
+        signed_names = ";".join(sorted(signed))
+
+    canonical_request = "\n".join([
+        method,
+        quote(path, safe="/-_.~"),
+        _canonical_query(query),
+        "".join(f"{name}:{signed[name]}\n" for name in sorted(signed)),
+        signed_names,
+        payload_hash,
+    ])
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest(),
+    ])
+    key = _hmac(_hmac(_hmac(_hmac(f"AWS4{secret_key}".encode(), now.strftime("%Y%m%d")), region), "s3"), "aws4_request")
+    signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+    if presign_expires is not None:
+        query["X-Amz-Signature"] = signature
+    else:
+        headers["Authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, SignedHeaders={signed_names}, Signature={signature}"
+        )
+    return query, headers
+
+
+class ObjectStorage:
+    """
+    Minimal S3 client (path-style, as MinIO serves it) for the upload pipeline: presigned
+    PUT and GET URLs, single and multipart uploads, HEAD, GET (whole or ranged) and DELETE.
+    """
+
+    def __init__(self, endpoint: str, access_key: str, secret_key: str, bucket: str, region: str,
+                 secure: bool, public_url: Optional[str] = None):
+        self.host = endpoint
+        self.base_url = f"{'https' if secure else 'http'}://{endpoint}"
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.bucket = bucket
+        self.region = region
+        self._public_url = (public_url or f"{self.base_url}/{bucket}").rstrip("/")
+        # Overridable for tests; defaults to the shared client
+        self.http_client: Optional[httpx.AsyncClient] = None
+
+    def _path(self, key: str) -> str:
+        return f"/{self.bucket}/{key}"
+
+    def public_url(self, key: str) -> str:
+        return f"{self._public_url}/{quote(key)}"
+
+    def key_from_url(self, url: str) -> Optional[str]:
+        prefix = f"{self._public_url}/"
+        return url[len(prefix):] if url and url.startswith(prefix) else None
+
+    def presigned_put_url(self, key: str, content_type: str, content_length: int, expires_seconds: int) -> str:
+        """URL the client PUTs the file to directly. Content type and exact size are part of the signature."""
+        query, _ = sign_v4(
+            "PUT", self.host, self._path(key), {},
+            {"content-length": str(content_length), "content-type": content_type},
+            self.access_key, self.secret_key, self.region, datetime.now(timezone.utc),
+            presign_expires=expires_seconds,
+        )
+        return f"{self.base_url}{quote(self._path(key))}?{_canonical_query(query)}"
+
+    def presigned_get_url(self, key: str, expires_seconds: int) -> str:
+        """Short-lived download URL for an object that isn't publicly readable."""
+        query, _ = sign_v4(
+            "GET", self.host, self._path(key), {}, {},
+            self.access_key, self.secret_key, self.region, datetime.now(timezone.utc),
+            presign_expires=expires_seconds,
+        )
+        return f"{self.base_url}{quote(self._path(key))}?{_canonical_query(query)}"
+
+    async def _request(self, method: str, key: str, query: Optional[Dict[str, str]] = None,
+                       headers: Optional[Dict[str, str]] = None, content: bytes = b"") -> httpx.Response:
+        query, headers = sign_v4(
+            method, self.host, self._path(key), query or {}, headers or {},
+            self.access_key, self.secret_key, self.region, datetime.now(timezone.utc),
+            payload_hash=hashlib.sha256(content).hexdigest(),
+        )
+        client = self.http_client or get_http_client()
+        url = f"{self.base_url}{quote(self._path(key))}"
+        if query:
+            url += "?" + _canonical_query(query)
+        resp = await client.request(method, url, headers=headers, content=content)
+        if resp.status_code >= 300 and not (method == "HEAD" and resp.status_code == 404):
+            raise StorageError(f"{method} {key} failed with HTTP {resp.status_code}")
+        return resp
+
+    async def put_object(self, key: str, data: bytes, content_type: str):
+        await self._request("PUT", key, headers={"content-type": content_type}, content=data)
+
+    async def head_object(self, key: str) -> Optional[Dict[str, str]]:
+        """Size and content type of an object, or None if it doesn't exist."""
+        resp = await self._request("HEAD", key)
+        if resp.status_code == 404:
+            return None
+        return {
+            "size": int(resp.headers.get("content-length", 0)),
+            "content_type": resp.headers.get("content-type", ""),
+        }
+
+    async def get_object(self, key: str) -> bytes:
+        resp = await self._request("GET", key)
+        return resp.content
+
+    async def get_range(self, key: str, start: int, end: int) -> bytes:
+        resp = await self._request("GET", key, headers={"range": f"bytes={start}-{end}"})
+        return resp.content[:end - start + 1]
+
+    async def delete_object(self, key: str):
+        await self._request("DELETE", key)
+
+    async def create_multipart_upload(self, key: str, content_type: str) -> str:
+        resp = await self._request("POST", key, query={"uploads": ""}, headers={"content-type": content_type})
+        match = re.search(r"<UploadId>([^<]+)</UploadId>", resp.text)
+        if not match:
+            raise StorageError("No UploadId in CreateMultipartUpload response")
+        return match.group(1)
+
+    async def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        resp = await self._request(
+            "PUT", key, query={"partNumber": str(part_number), "uploadId": upload_id}, content=data
+        )
+        return resp.headers["etag"]
+
+    async def complete_multipart_upload(self, key: str, upload_id: str, etags: List[str]):
+        parts = "".join(
+            f"<Part><PartNumber>{n}</PartNumber><ETag>{etag}</ETag></Part>" for n, etag in enumerate(etags, start=1)
+        )
+        await self._request(
+            "POST", key, query={"uploadId": upload_id},
+            headers={"content-type": "application/xml"},
+            content=f"<CompleteMultipartUpload>{parts}</CompleteMultipartUpload>".encode(),
+        )
+
+    async def abort_multipart_upload(self, key: str, upload_id: str):
+        await self._request("DELETE", key, query={"uploadId": upload_id})
+
+
+object_storage = ObjectStorage(
+    endpoint=settings.MINIO_ENDPOINT,
+    access_key=settings.MINIO_ACCESS_KEY,
+    secret_key=settings.MINIO_SECRET_KEY,
+    bucket=settings.MINIO_BUCKET,
+    region=settings.MINIO_REGION,
+    secure=settings.MINIO_SECURE,
+    public_url=settings.MINIO_PUBLIC_URL,
+)
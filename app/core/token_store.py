@@ -0,0 +1,105 @@
+import time
+from collections import OrderedDict
+from redis.exceptions import RedisError
+from app.core.config import get_settings
+from app.core.redis import get_redis, mark_redis_unavailable
+
+settings = get_settings()
+
+TOKEN_OK = "ok"
+TOKEN_REUSED = "reused"
+TOKEN_REVOKED = "revoked"
+
+# Marks a refresh token as used, detecting reuse and revoked sessions in one round-trip.
+# KEYS[1] = used-jti key, KEYS[2] = revoked-family key; ARGV[1] = jti ttl, ARGV[2] = family ttl
+CONSUME_LUA = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 'revoked'
+end
+if redis.call('SET', KEYS[1], '1', 'NX', 'EX', ARGV[1]) then
+    return 'ok'
+end
+redis.call('SET', KEYS[2], '1', 'EX', ARGV[2])
+return 'reused'
+"""
+
+
+class _ExpiringSet:
+    """Bounded in-process set with per-member expiry; the fallback when Redis is unavailable."""
+
+    def __init__(self, max_size: int = 200_000):
+        self.max_size = max_size
+        self._items: "OrderedDict[str, float]" = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        expires_at = self._items.get(key)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            del self._items[key]
+            return False
+        return True
+
+    def add(self, key: str, ttl_seconds: float) -> bool:
+        """Add `key`; returns False if it was already present."""
+        if key in self:
+            return False
+        self._items[key] = time.monotonic() + ttl_seconds
+        if len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+        return True
+
+
+class RefreshTokenStore:
+    """
+    Tracks used refresh tokens (by jti) and revoked sessions (by family id).
+    Only ids are stored, each for no longer than the token could still be valid.
+    """
+
+    def __init__(self):
+        self._used = _ExpiringSet()
+        self._revoked = _ExpiringSet()
+        self._script = None
+
+    @property
+    def _family_ttl(self) -> int:
+        return settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400
+
+    async def consume(self, jti: str, family_id: str, ttl_seconds: int) -> str:
+        """
+        Mark a refresh token as used. Returns TOKEN_OK on first use, TOKEN_REVOKED if its session
+        was revoked, and TOKEN_REUSED (revoking the session) if it was already used.
+        """
+        ttl_seconds = max(1, ttl_seconds)
+        redis = get_redis()
+        if redis is not None:
+            if self._script is None:
+                self._script = redis.register_script(CONSUME_LUA)
+            try:
+                return await self._script(
+                    keys=[f"refresh:used:{jti}", f"refresh:revoked:{family_id}"],
+                    args=[ttl_seconds, self._family_ttl],
+                )
+            except (RedisError, OSError) as e:
+                mark_redis_unavailable(e)
+
+        if family_id in self._revoked:
+            return TOKEN_REVOKED
+        if self._used.add(jti, ttl_seconds):
+            return TOKEN_OK
+        self._revoked.add(family_id, self._family_ttl)
+        return TOKEN_REUSED
+
+    async def revoke_family(self, family_id: str):
+        """Revoke every refresh token of a session (logout)."""
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.set(f"refresh:revoked:{family_id}", "1", ex=self._family_ttl)
+                return
+            except (RedisError, OSError) as e:
+                mark_redis_unavailable(e)
+        self._revoked.add(family_id, self._family_ttl)
+
+
+refresh_token_store = RefreshTokenStore()
@@ -0,0 +1,153 @@
+import re
+import uuid
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional
+from multipart.multipart import MultipartParser, parse_options_header
+from app.core.config import get_settings
+from app.core.storage import object_storage
+
+settings = get_settings()
+
+# Bytes needed to recognise every supported format
+SNIFF_BYTES = 16
+# Allowance for the boundaries and part headers around the file in a multipart/form-data body
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+# Prefix of objects that are never publicly readable; see UPLOAD_PRIVATE_URL_EXPIRE_SECONDS
+PRIVATE_PREFIX = "private/"
+
+EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "application/pdf": ".pdf"}
+
+
+@dataclass(frozen=True)
+class UploadKind:
+    content_types: FrozenSet[str]
+    max_bytes: int
+    # Only users with this role may upload (None: anyone signed in)
+    role: Optional[str] = None
+    # Stored under PRIVATE_PREFIX and referenced by key instead of a public URL
+    private: bool = False
+
+
+UPLOAD_KINDS: Dict[str, UploadKind] = {
+    "avatar": UploadKind(frozenset({"image/jpeg", "image/png", "image/webp"}), settings.UPLOAD_MAX_AVATAR_BYTES),
+    "contract": UploadKind(
+        frozenset({"application/pdf", "image/jpeg", "image/png"}),
+        settings.UPLOAD_MAX_CONTRACT_BYTES,
+        role="technician",
+        private=True,
+    ),
+}
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """Content type from the file's leading magic bytes, whatever the client claimed."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.startswith(b"%PDF-"):
+        return "application/pdf"
+    return None
+
+
+def upload_prefix(kind: str, user_id) -> str:
+    return f"{PRIVATE_PREFIX if UPLOAD_KINDS[kind].private else ''}{kind}s/{user_id}/"
+
+
+def new_upload_key(kind: str, user_id, content_type: str) -> str:
+    """Unguessable object key under the owner's prefix."""
+    return f"{upload_prefix(kind, user_id)}{uuid.uuid4().hex}{EXTENSIONS[content_type]}"
+
+
+def is_upload_key(kind: str, user_id, key: str) -> bool:
+    """Whether `key` is exactly what new_upload_key produces for this kind and owner (no `..`, no nesting)."""
+    extensions = "|".join(re.escape(ext) for ext in EXTENSIONS.values())
+    return re.fullmatch(f"{re.escape(upload_prefix(kind, user_id))}[0-9a-f]{{32}}({extensions})", key) is not None
+
+
+def stored_key(value: Optional[str]) -> Optional[str]:
+    """Object key behind a stored file reference: a private key as is, or one of our public URLs."""
+    if value and value.startswith(PRIVATE_PREFIX):
+        return value
+    return object_storage.key_from_url(value)
+
+
+def download_url(value: Optional[str]) -> Optional[str]:
+    """URL to hand out for a stored file reference: presigned for private keys, anything else as is."""
+    if value and value.startswith(PRIVATE_PREFIX):
+        return object_storage.presigned_get_url(value, settings.UPLOAD_PRIVATE_URL_EXPIRE_SECONDS)
+    return value
+
+
+class MultipartFileReader:
+    """
+    Incremental multipart/form-data parser that keeps only the bytes of one file field.
+    Feed it the request body chunk by chunk and drain `data` as it grows; other fields are
+    skipped and nothing is spooled to disk. Raises ValueError on a malformed body.
+    """
+
+    def __init__(self, content_type_header: str, field: str = "file"):
+        content_type, options = parse_options_header(content_type_header)
+        boundary = options.get(b"boundary")
+        if content_type != b"multipart/form-data" or not boundary:
+            raise ValueError("Expected a multipart/form-data body")
+        self.field = field.encode()
+        self.data = bytearray()
+        self.size = 0  # File bytes received so far, drained or not
+        self.found = self.complete = self.ended = False
+        self._in_file = False
+        self._header_field, self._header_value, self._part_name = b"", b"", None
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_end": self._on_end,
+        })
+
+    def feed(self, chunk: bytes):
+        self._parser.write(chunk)
+
+    def take(self, size: Optional[int] = None) -> bytes:
+        """Remove and return up to `size` buffered file bytes (all of them by default)."""
+        size = len(self.data) if size is None else size
+        taken = bytes(self.data[:size])
+        del self.data[:size]
+        return taken
+
+    def _on_part_begin(self):
+        self._part_name = None
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        if self._header_field.lower() == b"content-disposition":
+            self._part_name = parse_options_header(self._header_value)[1].get(b"name")
+        self._header_field, self._header_value = b"", b""
+
+    def _on_headers_finished(self):
+        # Only the first part with the field's name counts
+        self._in_file = self._part_name == self.field and not self.found
+        self.found = self.found or self._in_file
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self.data += data[start:end]
+            self.size += end - start
+
+    def _on_part_end(self):
+        if self._in_file:
+            self._in_file, self.complete = False, True
+
+    def _on_end(self):
+        self.ended = True
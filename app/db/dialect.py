@@ -0,0 +1,12 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+
+def dialect_insert(db: Session, model):
+    """
+    INSERT construct for the session's dialect, so ON CONFLICT clauses work both on
+    Postgres and on the SQLite database used by tests.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
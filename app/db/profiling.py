@@ -0,0 +1,178 @@
+import logging
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Optional
+from sqlalchemy import event
+from app.core.config import get_settings
+from app.core.context import get_request_context
+
+settings = get_settings()
+logger = logging.getLogger("perabox.sql")
+
+PROFILE_HEADER = b"x-sql-profile"
+
+_WHITESPACE = re.compile(r"\s+")
+# Numbered bind names (%(id_1)s, :id_2) and expanded IN-lists vary per call but not per shape.
+_NUMBERED_PARAM = re.compile(r"(%\(|:)([A-Za-z_]+?)_\d+(\)s)?")
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:\?|%s|%\([^)]*\)s|:\w+)\s*,)+\s*(?:\?|%s|%\([^)]*\)s|:\w+)\s*\)")
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a SQL statement so repeated executions of the same query compare equal."""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _NUMBERED_PARAM.sub(lambda m: f"{m.group(1)}{m.group(2)}{m.group(3) or ''}", shape)
+    return _PLACEHOLDER_LIST.sub("(...)", shape)
+
+
+@dataclass
+class QueryRecord:
+    route: str
+    statement: str
+    parameters: object
+    duration_ms: float
+    plan: Optional[str] = None
+
+
+@dataclass
+class SqlProfile:
+    """Statements executed while serving one profiled request."""
+    forced: bool = False
+    queries: List[QueryRecord] = field(default_factory=list)
+
+    def is_authorized(self, user_role: Optional[str]) -> bool:
+        return self.forced or user_role == "admin"
+
+    @property
+    def total_ms(self) -> float:
+        return sum(q.duration_ms for q in self.queries)
+
+    def slow_queries(self) -> List[QueryRecord]:
+        return [q for q in self.queries if q.duration_ms >= settings.SQL_SLOW_QUERY_MS]
+
+    def n_plus_one(self) -> List[tuple]:
+        """Statement shapes repeated at least SQL_N_PLUS_ONE_THRESHOLD times, most frequent first."""
+        counts = Counter(statement_shape(q.statement) for q in self.queries)
+        return [(shape, n) for shape, n in counts.most_common() if n >= settings.SQL_N_PLUS_ONE_THRESHOLD]
+
+
+def _explain(conn, statement, parameters) -> Optional[str]:
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        prefix = "EXPLAIN "
+    elif dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        return None
+
+    # Raw DBAPI cursor so the EXPLAIN itself is not profiled. On Postgres a failed statement
+    # aborts the whole transaction, so the EXPLAIN runs in a savepoint the request's own
+    # statements don't depend on.
+    savepoint = dialect == "postgresql"
+    cursor = conn.connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT perabox_explain")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            plan = "\n".join(" ".join(str(col) for col in row) for row in cursor.fetchall())
+        except Exception as e:
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT perabox_explain")
+            plan = f"EXPLAIN failed: {e}"
+        if savepoint:
+            cursor.execute("RELEASE SAVEPOINT perabox_explain")
+        return plan
+    except Exception as e:
+        return f"EXPLAIN failed: {e}"
+    finally:
+        cursor.close()
+
+
+def install_profiler(engine):
+    """Attach the per-request SQL profiler to an Engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._perabox_profile_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        ctx = get_request_context()
+        profile = ctx.sql_profile if ctx is not None else None
+        started = getattr(context, "_perabox_profile_started", None)
+        if profile is None or started is None:
+            return
+
+        record = QueryRecord(
+            route=ctx.route,
+            statement=statement,
+            parameters=parameters,
+            duration_ms=(time.perf_counter() - started) * 1000,
+        )
+        is_select = statement.lstrip()[:6].upper() == "SELECT"
+        if (
+            record.duration_ms >= settings.SQL_SLOW_QUERY_MS
+            and is_select
+            and not executemany
+            and profile.is_authorized(ctx.user_role)
+        ):
+            record.plan = _explain(conn, statement, parameters)
+        profile.queries.append(record)
+
+
+def log_profile(ctx, profile: SqlProfile):
+    for q in profile.slow_queries():
+        # Statement shape only: bound parameters can hold emails, tokens and other personal data
+        logger.warning(
+            "Slow query on %s %s (%.1f ms): %s\n%s",
+            ctx.method, q.route, q.duration_ms, statement_shape(q.statement), q.plan or "",
+        )
+    for shape, count in profile.n_plus_one():
+        logger.warning("Possible N+1 on %s %s: %d executions of %s", ctx.method, ctx.route, count, shape)
+    logger.info(
+        "SQL profile %s %s: %d queries, %.1f ms",
+        ctx.method, ctx.route, len(profile.queries), profile.total_ms,
+    )
+
+
+class SqlProfilingMiddleware:
+    """
+    Enables SQL profiling for a request when SQL_PROFILING_ENABLED is set, or when an admin
+    sends `X-SQL-Profile: 1`. Must sit inside RequestContextMiddleware.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        ctx = get_request_context()
+        if scope["type"] != "http" or ctx is None:
+            await self.app(scope, receive, send)
+            return
+
+        requested = any(k == PROFILE_HEADER and v not in (b"", b"0") for k, v in scope["headers"])
+        if not (settings.SQL_PROFILING_ENABLED or requested):
+            await self.app(scope, receive, send)
+            return
+
+        profile = SqlProfile(forced=settings.SQL_PROFILING_ENABLED)
+        ctx.sql_profile = profile
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and profile.is_authorized(ctx.user_role):
+                headers = list(message.get("headers", []))
+                headers.append((b"x-sql-query-count", str(len(profile.queries)).encode()))
+                headers.append((b"x-sql-query-time-ms", f"{profile.total_ms:.1f}".encode()))
+                headers.append((b"x-sql-n-plus-one", str(len(profile.n_plus_one())).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            ctx.sql_profile = None
+            if profile.is_authorized(ctx.user_role):
+                log_profile(ctx, profile)
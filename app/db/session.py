@@ -3,6 +3,8 @@ from sqlalchemy.pool import NullPool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import get_settings
+from app.core.metrics import instrument_engine
+from app.db.profiling import install_profiler
 
 settings = get_settings()
 
@@ -31,6 +33,8 @@ engine = create_engine(
     connect_args=connect_args,
     poolclass=NullPool,
 )
+instrument_engine(engine)
+install_profiler(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -1,6 +1,27 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1 import auth, services, bookings, users, technicians, payments, chat
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from app.api.v1 import (
+    auth, services, bookings, users, technicians, payments, chat, events, articles, testimonials, uploads,
+)
+from app.api.dependencies import get_current_admin
+from app.core.config import get_settings
+from app.core.context import RequestContextMiddleware
+from app.core.events import broker
+from app.core.health import readiness, run_network_diagnostic
+from app.core.http import close_http_client
+from app.core.images import shutdown_image_pool, start_image_pool
+from app.core.jobs import job_runner
+from app.core.jwt_keys import keyring
+from app.core.locations import location_store
+from app.core.logging_config import setup_logging
+from app.core.redis import close_redis
+from app.core.metrics import MetricsMiddleware, metrics_endpoint
+from app.db.profiling import SqlProfilingMiddleware
+from app.models.models import User
+
+setup_logging()
 
 app = FastAPI(
     title="PERABOX API",
@@ -24,6 +45,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost last: RequestContextMiddleware creates the context the others read.
+app.add_middleware(SqlProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestContextMiddleware, deadline_seconds=get_settings().REQUEST_DEADLINE_SECONDS)
 
 
 # Include routers
@@ -34,6 +59,11 @@ app.include_router(users.router, prefix="/api/v1")
 app.include_router(technicians.router, prefix="/api/v1")
 app.include_router(payments.router, prefix="/api/v1")
 app.include_router(chat.router, prefix="/api/v1")
+app.include_router(events.router, prefix="/api/v1")
+app.include_router(articles.router, prefix="/api/v1")
+app.include_router(testimonials.router, prefix="/api/v1")
+app.include_router(uploads.router, prefix="/api/v1")
+app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
 
 
 @app.get("/")
@@ -42,73 +72,92 @@ async def root():
     return {
         "message": "Welcome to PERABOX API",
         "docs": "/docs",
-        "health": "/health/db",
+        "health": "/health/ready",
     }
 
 
-@app.get("/health/db")
-async def health_db():
-    """Health check for database validation."""
-    import socket
-    from app.db.session import engine, SessionLocal
-    from sqlalchemy import text
-    
-    # Get hostname from engine URL
-    real_url = str(engine.url)
-    hostname = "unknown"
-    if "@" in real_url:
-        hostname = real_url.split("@")[1].split(":")[0]
-
-    probe_results = {
-        "hostname": hostname,
-        "dns_a": [],
-        "dns_aaaa": [],
-        "tcp_5432": "untested",
-        "tcp_6543": "untested",
-        "engine_url_masked": real_url.replace(real_url.split("@")[0].split(":")[1], "***") if ":" in real_url and "@" in real_url else real_url
-    }
+@app.get("/.well-known/jwks.json", include_in_schema=False)
+async def jwks():
+    """Public keys for verifying access tokens (empty when tokens are HMAC-signed)."""
+    return {"keys": keyring.public_jwks}
+
+
+@app.on_event("startup")
+async def start_readiness_checks():
+    readiness.start()
+
+
+@app.on_event("shutdown")
+async def stop_readiness_checks():
+    await readiness.stop()
+
+
+@app.on_event("startup")
+async def start_event_fanout():
+    broker.start()
+
+
+@app.on_event("startup")
+async def start_job_runner():
+    job_runner.start()
+
+
+@app.on_event("shutdown")
+async def stop_job_runner():
+    await job_runner.stop()
+
+
+@app.on_event("startup")
+async def start_location_flush():
+    location_store.start()
+
 
-    # 1. DNS Probe
-    try:
-        ais = socket.getaddrinfo(hostname, 0, 0, 0, 0)
-        for result in ais:
-            family, _, _, _, sockaddr = result
-            ip = sockaddr[0]
-            if family == socket.AF_INET:
-                probe_results["dns_a"].append(ip)
-            elif family == socket.AF_INET6:
-                probe_results["dns_aaaa"].append(ip)
-    except Exception as e:
-        probe_results["dns_error"] = str(e)
-
-    # 2. TCP Probe
-    def check_port(host, port):
-        try:
-            sock = socket.create_connection((host, port), timeout=3)
-            sock.close()
-            return "open"
-        except Exception as e:
-            return f"closed: {e}"
-
-    probe_results["tcp_5432"] = check_port(hostname, 5432)
-    probe_results["tcp_6543"] = check_port(hostname, 6543)
-
-    # 3. DB Connect Probe
-    try:
-        db = SessionLocal()
-        db.execute(text("SELECT 1"))
-        db.close()
-        return {
-            "status": "ok", 
-            "message": "Database connection successful",
-            "probe": probe_results
-        }
-    except Exception as e:
-        # Get underlying error
-        orig_error = getattr(e, "orig", str(e))
-        return {
-            "status": "error",
-            "message": str(e),
-            "orig_error": str(orig_error),
-            "probe": probe_results
-        }
+@app.on_event("shutdown")
+async def stop_location_flush():
+    await location_store.stop()
+
+
+@app.on_event("shutdown")
+async def stop_event_fanout():
+    await broker.stop()
+
+
+@app.on_event("startup")
+async def start_image_workers():
+    start_image_pool()
+
+
+@app.on_event("shutdown")
+async def stop_image_workers():
+    shutdown_image_pool()
+
+
+@app.on_event("shutdown")
+async def close_redis_client():
+    await close_redis()
+
+
+@app.on_event("shutdown")
+async def close_shared_http_client():
+    await close_http_client()
+
+
+@app.get("/health/live")
+async def health_live():
+    """Liveness probe. Never touches the database."""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness probe. Served from the cached background database check."""
+    result = await readiness.get()
+    if result["status"] != "ok":
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=result)
+    return result
+
+
+@app.get("/health/db")
+async def health_db(current_admin: User = Depends(get_current_admin)):
+    """Deep DNS/TCP/database diagnostic. Admin only."""
+    return await run_in_threadpool(run_network_diagnostic)
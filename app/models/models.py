@@ -1,4 +1,6 @@
-from sqlalchemy import Column, String, Boolean, Integer, Numeric, DateTime, Date, Time, Text, ForeignKey, CheckConstraint
+from sqlalchemy import (
+    Column, String, Boolean, Integer, Numeric, DateTime, Date, Time, Text, ForeignKey, CheckConstraint, Index, text,
+)
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -16,6 +18,8 @@ class User(Base):
     phone = Column(String(20), nullable=False)
     role = Column(String(20), nullable=False, index=True)
     avatar_url = Column(Text)
+    # Thumbnail URLs by size and format, e.g. {"160": {"webp": ..., "jpeg": ...}}; None until rendered
+    avatar_variants = Column(JSONB)
     is_active = Column(Boolean, default=True)
     is_verified = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -79,6 +83,8 @@ class Technician(Base):
     is_available = Column(Boolean, default=True, index=True)
     latitude = Column(Numeric(10, 8))
     longitude = Column(Numeric(11, 8))
+    # When latitude/longitude were last reported (see app/core/locations.py)
+    location_updated_at = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
@@ -89,7 +95,7 @@ class Technician(Base):
     date_of_birth = Column(Date)
     parent_name = Column(String(255))
     has_signed_contract = Column(Boolean, default=False)
-    contract_url = Column(Text)
+    contract_url = Column(Text)  # Private object key of an uploaded contract, or a link set by an admin
     bio = Column(Text)
     
     # Relationships
@@ -114,6 +120,8 @@ class Booking(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     completed_at = Column(DateTime(timezone=True))
+    # Incremented on every status/assignment change (optimistic concurrency, see app.core.booking_state)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     # Relationships
     customer = relationship("User", foreign_keys=[customer_id], back_populates="bookings")
@@ -125,6 +133,11 @@ class Booking(Base):
     __table_args__ = (
         CheckConstraint("status IN ('pending', 'confirmed', 'in_progress', 'completed', 'cancelled')", name="check_booking_status"),
     )
+    
+    @property
+    def payments(self):
+        """The one-to-one payment as a list, as exposed by BookingResponse.payments."""
+        return [self.payment] if self.payment is not None else []
 
 
 class Payment(Base):
@@ -167,6 +180,11 @@ class Rating(Base):
     )
 
 
+# Indonesian full-text document of an article. Search queries must use this exact
+# expression for Postgres to use the GIN index below.
+ARTICLE_SEARCH_DOCUMENT = "to_tsvector('indonesian', title || ' ' || coalesce(excerpt, '') || ' ' || content)"
+
+
 class Article(Base):
     __tablename__ = "articles"
     
@@ -183,6 +201,12 @@ class Article(Base):
     
     # Relationships
     author = relationship("User", back_populates="articles")
+    
+    __table_args__ = (
+        # Keyset pagination of the article list (newest first)
+        Index("ix_articles_published_at_id", "published_at", "id"),
+        Index("ix_articles_search", text(ARTICLE_SEARCH_DOCUMENT), postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
 
 
 class Testimonial(Base):
@@ -198,3 +222,24 @@ class Testimonial(Base):
     __table_args__ = (
         CheckConstraint("rating >= 1 AND rating <= 5", name="check_testimonial_rating"),
     )
+
+
+class OutboxJob(Base):
+    """Side effect to run after the transaction that wrote it commits (see app.core.jobs)."""
+    __tablename__ = "outbox_jobs"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind = Column(String(100), nullable=False)
+    payload = Column(JSONB, nullable=False, default={})
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    # Earliest time to (re)try; while processing, when the worker's lease expires
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        CheckConstraint("status IN ('pending', 'processing', 'done', 'dead')", name="check_outbox_job_status"),
+        Index("ix_outbox_jobs_status_run_after", "status", "run_after"),
+    )
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime, date, time
 from decimal import Decimal
 import uuid
@@ -32,6 +32,8 @@ class UserResponse(UserBase):
     id: uuid.UUID
     role: str
     avatar_url: Optional[str]
+    # Thumbnail URLs by size and format ({"160": {"webp": ..., "jpeg": ...}}), once rendered
+    avatar_variants: Optional[Dict[str, Dict[str, str]]] = None
     is_active: bool
     is_verified: bool
     created_at: datetime
@@ -47,6 +49,10 @@ class TokenResponse(BaseModel):
     user: UserResponse
 
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+
 # Service schemas
 class ServiceCategoryResponse(BaseModel):
     id: uuid.UUID
@@ -115,6 +121,16 @@ class TechnicianResponse(BaseModel):
         from_attributes = True
 
 
+class LocationPing(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+
+
+class LocationPingResult(BaseModel):
+    # False when the position matches the last one reported (nothing to write)
+    moved: bool
+
+
 class TechnicianUpdate(BaseModel):
     is_available: Optional[bool] = None
     address: Optional[str] = None
@@ -162,6 +178,7 @@ class BookingResponse(BaseModel):
     notes: Optional[str]
     total_price: Decimal
     payments: List[PaymentResponse] = []
+    version: int
     created_at: datetime
     updated_at: datetime
     
@@ -178,6 +195,31 @@ class BookingDetailResponse(BookingResponse):
         from_attributes = True
 
 
+# Bulk booking operations (admin)
+BULK_BOOKING_MAX_IDS = 1000
+
+
+class BulkBookingStatusRequest(BaseModel):
+    booking_ids: List[uuid.UUID] = Field(..., min_length=1, max_length=BULK_BOOKING_MAX_IDS)
+    status: str
+
+
+class BulkAssignTechnicianRequest(BaseModel):
+    booking_ids: List[uuid.UUID] = Field(..., min_length=1, max_length=BULK_BOOKING_MAX_IDS)
+    technician_id: uuid.UUID
+
+
+class BulkBookingOutcome(BaseModel):
+    booking_id: uuid.UUID
+    outcome: str  # updated | not_found | invalid_transition
+    status: Optional[str] = None
+
+
+class BulkBookingResult(BaseModel):
+    updated: int
+    results: List[BulkBookingOutcome]
+
+
 # Rating schemas
 class RatingCreate(BaseModel):
     booking_id: uuid.UUID
@@ -219,7 +261,37 @@ class ArticleDetailResponse(ArticleResponse):
         from_attributes = True
 
 
+class ArticleListResponse(BaseModel):
+    items: List[ArticleResponse]
+    # Pass as `cursor` to get the next page; None on the last page
+    next_cursor: Optional[str] = None
+
+
+class ArticleCreate(BaseModel):
+    title: str = Field(..., max_length=255)
+    slug: str = Field(..., max_length=255, pattern=r"^[a-z0-9]+(?:-[a-z0-9]+)*$")
+    content: str
+    excerpt: Optional[str] = None
+    featured_image: Optional[str] = None
+    # Unpublished (draft) while None or in the future
+    published_at: Optional[datetime] = None
+
+
+class ArticleUpdate(BaseModel):
+    title: Optional[str] = Field(None, max_length=255)
+    slug: Optional[str] = Field(None, max_length=255, pattern=r"^[a-z0-9]+(?:-[a-z0-9]+)*$")
+    content: Optional[str] = None
+    excerpt: Optional[str] = None
+    featured_image: Optional[str] = None
+    published_at: Optional[datetime] = None
+
+
 # Testimonial schemas
+class TestimonialCreate(BaseModel):
+    content: str = Field(..., min_length=10, max_length=2000)
+    rating: int = Field(..., ge=1, le=5)
+
+
 class TestimonialResponse(BaseModel):
     id: uuid.UUID
     customer_id: uuid.UUID
@@ -229,6 +301,53 @@ class TestimonialResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class TestimonialSummary(BaseModel):
+    count: int
+    average: Optional[float]
+    # rating (1-5) -> number of testimonials
+    distribution: Dict[int, int]
+
+
+class FeaturedTestimonialsResponse(BaseModel):
+    featured: List[TestimonialResponse]
+    summary: TestimonialSummary
+
+
+# Upload schemas
+class UploadTicketRequest(BaseModel):
+    kind: str = Field(..., pattern="^(avatar|contract)$")
+    content_type: str
+    size: int = Field(..., gt=0)
+
+
+class UploadTicket(BaseModel):
+    key: str
+    # PUT the file here with exactly these headers, then call /uploads/complete
+    url: str
+    method: str = "PUT"
+    headers: Dict[str, str]
+    expires_in: int
+
+
+class UploadCompleteRequest(BaseModel):
+    key: str = Field(..., max_length=255)
+
+
+class UploadResult(BaseModel):
+    key: str
+    # Public URL, or a short-lived presigned one for private kinds (contracts)
+    url: str
+    content_type: str
+    size: int
+
+
+class FileDownload(BaseModel):
+    url: str
+    expires_in: int
+
+
 # Payment Response extras
 class QRISResponse(BaseModel):
     payment_id: uuid.UUID
@@ -0,0 +1,71 @@
+"""
+Compare a locust `*_stats.csv` against the recorded load baseline.
+
+    python -m loadtest.check_regression loadtest/results/run_stats.csv [--threshold 0.2]
+    python -m loadtest.check_regression loadtest/results/run_stats.csv --save-baseline
+
+Fails (exit 1) when an endpoint's p95 latency or failure ratio exceeds the baseline by more
+than the threshold. Baselines are only meaningful for the same hardware, dataset and user count.
+"""
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+
+def read_stats(path: str) -> dict:
+    stats = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            if row["Name"] == "Aggregated":
+                continue
+            requests = int(row["Request Count"]) or 1
+            stats[f'{row["Type"]} {row["Name"]}'] = {
+                "p95_ms": float(row["95%"]),
+                "failure_ratio": int(row["Failure Count"]) / requests,
+                "rps": float(row["Requests/s"]),
+            }
+    return stats
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    failures = []
+    for name, base in baseline.items():
+        cur = current.get(name)
+        if cur is None:
+            failures.append(f"{name}: missing from run")
+            continue
+        if cur["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            failures.append(f'{name}: p95 {cur["p95_ms"]:.0f}ms > baseline {base["p95_ms"]:.0f}ms')
+        if cur["failure_ratio"] > base["failure_ratio"] + 0.01:
+            failures.append(f'{name}: failure ratio {cur["failure_ratio"]:.2%} > baseline {base["failure_ratio"]:.2%}')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("stats_csv")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p95 regression (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    current = read_stats(args.stats_csv)
+    if args.save_baseline:
+        BASELINE_PATH.write_text(json.dumps(current, indent=2, sort_keys=True))
+        print(f"Saved baseline for {len(current)} endpoints to {BASELINE_PATH}")
+        return
+
+    if not BASELINE_PATH.exists():
+        sys.exit(f"No baseline at {BASELINE_PATH}; record one with --save-baseline")
+
+    failures = compare(current, json.loads(BASELINE_PATH.read_text()), args.threshold)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Local stand-in for the Midtrans Core/Snap APIs, the Gemini REST API and the S3 subset of
+MinIO used for uploads, for load tests.
+
+    uvicorn loadtest.fake_upstreams:app --port 8100
+
+Point the API at it with MIDTRANS_API_BASE_URL=http://localhost:8100,
+GEMINI_API_ENDPOINT=http://localhost:8100 and MINIO_ENDPOINT=localhost:8100. Signatures
+are not checked. FAKE_UPSTREAM_LATENCY_MS adds a fixed delay to every call to approximate
+real provider latency (default 50).
+"""
+import asyncio
+import hashlib
+import os
+import re
+import uuid
+from fastapi import FastAPI, Request, Response
+
+LATENCY_SECONDS = float(os.getenv("FAKE_UPSTREAM_LATENCY_MS", "50")) / 1000
+
+app = FastAPI(title="Fake Midtrans/Gemini")
+
+# order_id -> transaction_status, so /status reflects earlier charges
+transactions = {}
+
+
+@app.middleware("http")
+async def simulated_latency(request: Request, call_next):
+    await asyncio.sleep(LATENCY_SECONDS)
+    return await call_next(request)
+
+
+# Midtrans Core API
+@app.post("/v2/charge")
+async def midtrans_charge(body: dict):
+    order_id = body["transaction_details"]["order_id"]
+    transactions[order_id] = "pending"
+    return {
+        "status_code": "201",
+        "status_message": "QRIS transaction is created",
+        "transaction_id": str(uuid.uuid4()),
+        "order_id": order_id,
+        "gross_amount": str(body["transaction_details"]["gross_amount"]),
+        "payment_type": "qris",
+        "transaction_status": "pending",
+        "qr_string": f"00020101021126670014ID.CO.QRIS.WWW{order_id}",
+        "actions": [{"name": "generate-qr-code", "method": "GET", "url": f"http://fake/qr/{order_id}"}],
+    }
+
+
+@app.get("/v2/{order_id}/status")
+async def midtrans_status(order_id: str):
+    return {
+        "status_code": "200",
+        "order_id": order_id,
+        "transaction_status": transactions.get(order_id, "settlement"),
+        "fraud_status": "accept",
+    }
+
+
+# Midtrans Snap
+@app.post("/snap/v1/transactions")
+async def snap_create_transaction(body: dict):
+    token = str(uuid.uuid4())
+    return {"token": token, "redirect_url": f"http://fake/snap/v2/vtweb/{token}"}
+
+
+# Gemini REST (v1beta)
+@app.get("/v1beta/models")
+async def gemini_list_models():
+    return {"models": [{
+        "name": "models/gemini-1.5-flash",
+        "supportedGenerationMethods": ["generateContent", "countTokens"],
+    }]}
+
+
+@app.post("/v1beta/models/{model}:generateContent")
+async def gemini_generate_content(model: str, body: dict):
+    return {
+        "candidates": [{
+            "content": {"role": "model", "parts": [{"text": "Halo! Saya Pera-Bot. Ada yang bisa saya bantu? 🏠"}]},
+            "finishReason": "STOP",
+            "index": 0,
+        }],
+        "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 12, "totalTokenCount": 22},
+    }
+
+
+# S3 / MinIO (path-style). Registered last: the catch-all path only gets what the routes above don't match.
+# (bucket, key) -> (content_type, body)
+objects = {}
+# upload_id -> (bucket, key, content_type, {part_number: body})
+multipart_uploads = {}
+
+
+@app.put("/{bucket}/{key:path}")
+async def s3_put(bucket: str, key: str, request: Request):
+    body = await request.body()
+    if "uploadId" in request.query_params:
+        parts = multipart_uploads[request.query_params["uploadId"]][3]
+        parts[int(request.query_params["partNumber"])] = body
+    else:
+        objects[(bucket, key)] = (request.headers.get("content-type", "application/octet-stream"), body)
+    return Response(headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+
+@app.post("/{bucket}/{key:path}")
+async def s3_multipart(bucket: str, key: str, request: Request):
+    if "uploads" in request.query_params:
+        upload_id = uuid.uuid4().hex
+        multipart_uploads[upload_id] = (bucket, key, request.headers.get("content-type", ""), {})
+        return Response(
+            f"<InitiateMultipartUploadResult><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>",
+            media_type="application/xml",
+        )
+    _, _, content_type, parts = multipart_uploads.pop(request.query_params["uploadId"])
+    numbers = [int(n) for n in re.findall(r"<PartNumber>(\d+)</PartNumber>", (await request.body()).decode())]
+    objects[(bucket, key)] = (content_type, b"".join(parts[n] for n in numbers))
+    return Response("<CompleteMultipartUploadResult/>", media_type="application/xml")
+
+
+@app.api_route("/{bucket}/{key:path}", methods=["GET", "HEAD"])
+async def s3_get(bucket: str, key: str, request: Request):
+    if (bucket, key) not in objects:
+        return Response(status_code=404)
+    content_type, body = objects[(bucket, key)]
+    match = re.match(r"bytes=(\d+)-(\d+)", request.headers.get("range", ""))
+    if match:
+        body = body[int(match.group(1)):int(match.group(2)) + 1]
+    if request.method == "HEAD":
+        return Response(headers={"Content-Length": str(len(body)), "Content-Type": content_type})
+    return Response(body, status_code=206 if match else 200, media_type=content_type)
+
+
+@app.delete("/{bucket}/{key:path}")
+async def s3_delete(bucket: str, key: str, request: Request):
+    if "uploadId" in request.query_params:
+        multipart_uploads.pop(request.query_params["uploadId"], None)
+    else:
+        objects.pop((bucket, key), None)
+    return Response(status_code=204)
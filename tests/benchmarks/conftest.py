@@ -0,0 +1,9 @@
+import pytest
+from app.core import security
+
+
+@pytest.fixture
+def no_verify_cache(monkeypatch):
+    """Measure token verification itself rather than a hit in the verified-token cache."""
+    monkeypatch.setattr(security.settings, "TOKEN_VERIFY_CACHE_SIZE", 0)
+    security._verified_tokens.clear()
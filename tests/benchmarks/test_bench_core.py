@@ -0,0 +1,69 @@
+"""
+Micro-benchmarks for per-request CPU costs (tokens, password hashing, serialization).
+
+Skipped in the default test run (--benchmark-skip in setup.cfg). Run them and compare against
+the recorded baseline; fails if any mean regresses by more than 25%:
+
+    pytest tests/benchmarks --benchmark-only \
+        --benchmark-storage=tests/benchmarks/baselines \
+        --benchmark-compare --benchmark-compare-fail=mean:25%
+
+Re-record the baseline (on the reference machine) with --benchmark-save=baseline.
+"""
+import uuid
+from datetime import datetime, date, time
+from decimal import Decimal
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from app.core.security import create_access_token, decode_token, verify_password, get_password_hash
+from app.models.models import Booking, Payment, Service, User
+from app.schemas.schemas import BookingDetailResponse
+
+PASSWORD = "Test123!"
+PASSWORD_HASH = get_password_hash(PASSWORD)
+
+
+@pytest.fixture
+def booking_graph():
+    now = datetime(2026, 2, 1, 10, 0)
+    customer = User(
+        id=uuid.uuid4(), email="bench@example.com", password_hash=PASSWORD_HASH, full_name="Bench Customer",
+        phone="081234567890", role="customer", is_active=True, is_verified=True, created_at=now,
+    )
+    service = Service(
+        id=uuid.uuid4(), category_id=uuid.uuid4(), name="Cuci AC", slug="cuci-ac", description="AC cleaning",
+        base_price=Decimal("80000.00"), duration_minutes=60,
+    )
+    booking = Booking(
+        id=uuid.uuid4(), customer_id=customer.id, service_id=service.id, scheduled_date=date(2026, 2, 15),
+        scheduled_time=time(10, 0), status="pending", address="Jl. Test No. 123, Jakarta",
+        total_price=Decimal("80000.00"), version=1, created_at=now, updated_at=now, customer=customer, service=service,
+    )
+    booking.payment = Payment(
+        id=uuid.uuid4(), booking_id=booking.id, amount=booking.total_price, status="pending", created_at=now,
+    )
+    return booking
+
+
+def test_bench_create_access_token(benchmark):
+    token = benchmark(create_access_token, {"sub": str(uuid.uuid4())})
+    assert token
+
+
+def test_bench_decode_token(benchmark, no_verify_cache):
+    token = create_access_token({"sub": str(uuid.uuid4())})
+    payload = benchmark(decode_token, token)
+    assert payload["type"] == "access"
+
+
+def test_bench_verify_password(benchmark):
+    assert benchmark.pedantic(verify_password, args=(PASSWORD, PASSWORD_HASH), rounds=5, iterations=1)
+
+
+def test_bench_booking_detail_serialization(benchmark, booking_graph):
+    def serialize():
+        return BookingDetailResponse.from_orm(booking_graph).model_dump_json()
+
+    assert benchmark(serialize)
@@ -0,0 +1,56 @@
+"""
+Token verification throughput: prepared/cached keys vs. parsing the key on every call.
+The OPS column is tokens verified per second. See test_bench_core.py for how to run and compare.
+"""
+import uuid
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwt
+from app.core import jwt_keys
+from app.core.security import create_access_token, decode_token
+
+
+@pytest.fixture
+def rs256_keyring(tmp_path, monkeypatch):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    key_path = tmp_path / "jwt_private.pem"
+    key_path.write_text(pem)
+    monkeypatch.setattr(jwt_keys.settings, "ALGORITHM", "RS256")
+    monkeypatch.setattr(jwt_keys.settings, "JWT_PRIVATE_KEY_PATH", str(key_path))
+    monkeypatch.setattr(jwt_keys.settings, "JWT_KEY_ID", "bench-1")
+    keyring = jwt_keys.KeyRing()
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    return keyring, public_pem
+
+
+def test_bench_hs256_verify_prepared_key(benchmark, no_verify_cache):
+    token = create_access_token({"sub": str(uuid.uuid4()), "role": "customer"})
+    assert benchmark(decode_token, token)["role"] == "customer"
+
+
+def test_bench_hs256_verify_cached_token(benchmark):
+    token = create_access_token({"sub": str(uuid.uuid4()), "role": "customer"})
+    decode_token(token)
+    assert benchmark(decode_token, token)["role"] == "customer"
+
+
+def test_bench_rs256_verify_prepared_key(benchmark, rs256_keyring):
+    keyring, _ = rs256_keyring
+    token = keyring.sign({"sub": str(uuid.uuid4()), "exp": 4102444800, "type": "access"})
+    assert benchmark(keyring.verify, token)["type"] == "access"
+
+
+def test_bench_rs256_verify_pem_each_call(benchmark, rs256_keyring):
+    """Reference: what verification costs when the PEM is re-parsed per call."""
+    keyring, public_pem = rs256_keyring
+    token = keyring.sign({"sub": str(uuid.uuid4()), "exp": 4102444800, "type": "access"})
+    assert benchmark(jwt.decode, token, public_pem, algorithms=["RS256"])["type"] == "access"
@@ -0,0 +1,229 @@
+import os
+
+# Auth rate limits would trip on fixtures logging in repeatedly; Redis isn't available in tests.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("REDIS_ENABLED", "false")
+
+from contextlib import contextmanager
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from app.api.v1 import chat
+from app.core import chat_sessions as chat_sessions_module
+from app.db.session import Base, get_db
+from app.core.security import get_password_hash
+from app.models.models import Booking, User, Service, ServiceCategory
+from datetime import date, time, timedelta
+import uuid
+
+# Test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+
+
+@pytest.fixture(scope="session")
+def engine():
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def captured_sql(engine):
+    """Context manager collecting every SQL statement the test database runs inside it."""
+    @contextmanager
+    def capture():
+        statements = []
+
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+    return capture
+
+
+@pytest.fixture(scope="session")
+def TestingSessionLocal(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="session")
+def client(TestingSessionLocal):
+    """API client whose requests use the test database."""
+    def override_get_db():
+        try:
+            db = TestingSessionLocal()
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.fixture
+def test_db(engine):
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def test_customer(test_db, TestingSessionLocal):
+    db = TestingSessionLocal()
+    user = User(
+        id=uuid.uuid4(),
+        email="testcustomer@example.com",
+        password_hash=get_password_hash("Test123!"),
+        full_name="Test Customer",
+        phone="081234567890",
+        role="customer",
+        is_active=True,
+        is_verified=True,
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    db.close()
+    return user
+
+
+@pytest.fixture
+def test_service(test_db, TestingSessionLocal):
+    db = TestingSessionLocal()
+    
+    # Create category
+    category = ServiceCategory(
+        id=uuid.uuid4(),
+        name="Test Category",
+        slug="test-category",
+        is_active=True,
+    )
+    db.add(category)
+    db.commit()
+    
+    # Create service
+    service = Service(
+        id=uuid.uuid4(),
+        category_id=category.id,
+        name="Test Service",
+        slug="test-service",
+        description="Test service description",
+        base_price=100000,
+        duration_minutes=60,
+        is_active=True,
+    )
+    db.add(service)
+    db.commit()
+    db.refresh(service)
+    db.close()
+    return service
+
+
+@pytest.fixture
+def auth_token(test_customer, client):
+    """Get authentication token for test customer."""
+    response = client.post(
+        "/api/v1/auth/login",
+        json={
+            "email": "testcustomer@example.com",
+            "password": "Test123!"
+        }
+    )
+    return response.json()["access_token"]
+
+
+@pytest.fixture
+def admin_token(test_db, client, TestingSessionLocal):
+    """Get authentication token for a test admin."""
+    db = TestingSessionLocal()
+    db.add(User(
+        id=uuid.uuid4(),
+        email="testadmin@example.com",
+        password_hash=get_password_hash("Test123!"),
+        full_name="Test Admin",
+        phone="081234567891",
+        role="admin",
+        is_active=True,
+        is_verified=True,
+    ))
+    db.commit()
+    db.close()
+    response = client.post(
+        "/api/v1/auth/login",
+        json={
+            "email": "testadmin@example.com",
+            "password": "Test123!"
+        }
+    )
+    return response.json()["access_token"]
+
+
+@pytest.fixture
+def create_bookings(TestingSessionLocal):
+    """Factory inserting one booking per status for a customer and service; returns their ids."""
+    def create(customer, service, statuses):
+        db = TestingSessionLocal()
+        bookings = [
+            Booking(
+                id=uuid.uuid4(),
+                customer_id=customer.id,
+                service_id=service.id,
+                scheduled_date=date.today() + timedelta(days=7),
+                scheduled_time=time(10, 0),
+                address="Jl. Test No. 123, Jakarta",
+                total_price=100000,
+                status=booking_status,
+            )
+            for booking_status in statuses
+        ]
+        db.add_all(bookings)
+        db.commit()
+        ids = [booking.id for booking in bookings]
+        db.close()
+        return ids
+
+    return create
+
+
+class FakeModel:
+    """Records what the endpoint sends to Gemini."""
+    started_with = []
+    summarized = []
+
+    def __init__(self, **kwargs):
+        pass
+
+    def start_chat(self, history):
+        FakeModel.started_with.append(history)
+        return self
+
+    def send_message(self, message, **kwargs):
+        return type("Reply", (), {"text": f"reply to {message}"})()
+
+    def generate_content(self, prompt, **kwargs):
+        FakeModel.summarized.append(prompt)
+        return type("Reply", (), {"text": "customer asked about AC cleaning"})()
+
+
+async def fake_model_name():
+    return "models/fake"
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch):
+    """Route chat through FakeModel (returned, for inspecting what was sent) with no Redis or local answers."""
+    FakeModel.started_with, FakeModel.summarized = [], []
+    monkeypatch.setattr(chat, "configure_genai", lambda: "fake-key")
+    monkeypatch.setattr(chat, "resolve_model_name", fake_model_name)
+    monkeypatch.setattr(chat.genai, "GenerativeModel", FakeModel)
+    monkeypatch.setattr(chat_sessions_module, "get_redis", lambda: None)
+    monkeypatch.setattr(chat.settings, "CHAT_LOCAL_INTENTS_ENABLED", False)
+    monkeypatch.setattr(chat.settings, "CHAT_RESPONSE_CACHE_ENABLED", False)
+    return FakeModel
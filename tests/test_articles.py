@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.api.v1.articles import ARTICLE_CHANGED_TOPIC, article_page_cache
+from app.core.events import broker
+from app.models.models import Article
+
+
+@pytest.fixture
+def create_articles(test_db, TestingSessionLocal):
+    def create(count, **overrides):
+        db = TestingSessionLocal()
+        now = datetime.now(timezone.utc)
+        articles = [
+            Article(title=f"Tips AC {i}", slug=f"tips-ac-{i}", content=f"Isi artikel {i} tentang freon dan filter.",
+                    excerpt=f"Ringkasan {i}", published_at=now - timedelta(days=i + 1), **overrides)
+            for i in range(count)
+        ]
+        db.add_all(articles)
+        db.commit()
+        db.close()
+        article_page_cache.clear()
+    return create
+
+
+def test_list_articles_keyset_pagination(test_db, client, TestingSessionLocal, create_articles):
+    """Test that pages follow next_cursor newest-first and skip drafts and scheduled articles."""
+    create_articles(5)
+    db = TestingSessionLocal()
+    db.add_all([
+        Article(title="Draft", slug="draft", content="draft"),
+        Article(title="Scheduled", slug="scheduled", content="later",
+                published_at=datetime.now(timezone.utc) + timedelta(days=1)),
+    ])
+    db.commit()
+    db.close()
+
+    slugs, cursor = [], None
+    for _ in range(3):
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/v1/articles", params=params).json()
+        slugs += [item["slug"] for item in page["items"]]
+        cursor = page["next_cursor"]
+    assert slugs == [f"tips-ac-{i}" for i in range(5)]
+    assert cursor is None
+
+
+def test_list_articles_does_not_load_content(test_db, client, captured_sql, create_articles):
+    """Test that list views leave the content column out of the query."""
+    create_articles(2)
+    with captured_sql() as statements:
+        resp = client.get("/api/v1/articles")
+
+    assert resp.status_code == 200
+    assert "content" not in resp.json()["items"][0]
+    assert not any("articles.content" in s for s in statements)
+
+
+def test_list_articles_rejects_bad_cursor(test_db, client):
+    """Test that a malformed cursor is a client error."""
+    assert client.get("/api/v1/articles", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_search_articles(test_db, client, TestingSessionLocal, create_articles):
+    """Test that search matches article text and ignores drafts."""
+    create_articles(3)
+    db = TestingSessionLocal()
+    db.add(Article(title="Draft freon", slug="draft-freon", content="freon"))
+    db.commit()
+    db.close()
+
+    resp = client.get("/api/v1/articles/search", params={"q": "artikel 1"})
+    assert [a["slug"] for a in resp.json()] == ["tips-ac-1"]
+    assert all(a["slug"] != "draft-freon" for a in client.get("/api/v1/articles/search", params={"q": "freon"}).json())
+
+
+def test_article_detail_cached_until_updated(test_db, admin_token, client, TestingSessionLocal, create_articles):
+    """Test that rendered detail pages are served from cache and dropped when the article is edited."""
+    create_articles(1)
+    assert client.get("/api/v1/articles/tips-ac-0").json()["content"].startswith("Isi artikel 0")
+
+    # Changed behind the API's back: the cached page is still served
+    db = TestingSessionLocal()
+    article = db.query(Article).filter(Article.slug == "tips-ac-0").first()
+    article.title = "Changed directly"
+    db.commit()
+    article_id = str(article.id)
+    db.close()
+    assert client.get("/api/v1/articles/tips-ac-0").json()["title"] == "Tips AC 0"
+
+    resp = client.patch(
+        f"/api/v1/articles/{article_id}",
+        json={"title": "Cara Merawat AC", "slug": "cara-merawat-ac"},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert resp.status_code == 200
+    assert client.get("/api/v1/articles/tips-ac-0").status_code == 404
+    assert client.get("/api/v1/articles/cara-merawat-ac").json()["title"] == "Cara Merawat AC"
+
+
+def test_edit_on_another_worker_drops_cached_page(test_db, client, TestingSessionLocal, create_articles):
+    """Test that an article change announced over the event channel evicts this worker's cached page."""
+    create_articles(1)
+    client.get("/api/v1/articles/tips-ac-0")
+    db = TestingSessionLocal()
+    db.query(Article).filter(Article.slug == "tips-ac-0").update({"published_at": None})
+    db.commit()
+    db.close()
+
+    # What the Redis listener does with another worker's message
+    broker._deliver([ARTICLE_CHANGED_TOPIC], {"type": "articles.changed", "slugs": ["tips-ac-0"]})
+
+    assert client.get("/api/v1/articles/tips-ac-0").status_code == 404
+
+
+def test_create_article_requires_admin(test_db, auth_token, admin_token, client):
+    """Test that only admins can publish articles and slugs stay unique."""
+    published_at = datetime.now(timezone.utc).isoformat()
+    article = {"title": "Baru", "slug": "baru", "content": "Isi", "published_at": published_at}
+    customer = {"Authorization": f"Bearer {auth_token}"}
+    assert client.post("/api/v1/articles", json=article, headers=customer).status_code == 403
+
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    assert client.post("/api/v1/articles", json=article, headers=admin).status_code == 201
+    assert client.post("/api/v1/articles", json=article, headers=admin).status_code == 400
+    assert client.get("/api/v1/articles/baru").status_code == 200
@@ -0,0 +1,74 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from starlette.requests import Request
+from app.api.v1 import auth
+from app.api.v1.auth import register
+from app.core.security import decode_token
+from app.models.models import User, Technician
+from app.schemas.schemas import UserCreate
+
+
+def register_payload(email, role="customer"):
+    return {
+        "email": email,
+        "password": "Test123!",
+        "full_name": "Test User",
+        "phone": "081234567890",
+        "role": role,
+    }
+
+
+def test_register_technician_single_transaction(test_db, client, TestingSessionLocal, captured_sql):
+    """Test that registering a technician creates user and profile in one commit."""
+    with captured_sql() as statements:
+        response = client.post("/api/v1/auth/register", json=register_payload("tech@example.com", "technician"))
+
+    assert response.status_code == 201
+    # Email lookup, then user and technician profile
+    assert [s.split()[0].upper() for s in statements] == ["SELECT", "INSERT", "INSERT"]
+
+    db = TestingSessionLocal()
+    user = db.query(User).filter(User.email == "tech@example.com").one()
+    technician = db.query(Technician).filter(Technician.user_id == user.id).one()
+    claims = decode_token(response.json()["access_token"])
+    assert claims["technician_id"] == str(technician.id)
+    db.close()
+
+
+def test_register_duplicate_email(test_db, client, monkeypatch):
+    """Test that a taken email is rejected with 400 before any password is hashed."""
+    assert client.post("/api/v1/auth/register", json=register_payload("dup@example.com")).status_code == 201
+    hashed = []
+    monkeypatch.setattr(auth, "get_password_hash", lambda password: hashed.append(password))
+
+    response = client.post("/api/v1/auth/register", json=register_payload("dup@example.com"))
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email already registered"
+    assert hashed == []
+
+
+def test_register_duplicate_email_storm(test_db, client, TestingSessionLocal):
+    """Test that concurrent registrations of one email yield one 201 and only 400s, never a 500."""
+
+    def register_once(_):
+        db = TestingSessionLocal()
+        request = Request({"type": "http", "headers": [], "client": ("203.0.113.10", 0)})
+        try:
+            asyncio.run(register(UserCreate(**register_payload("storm@example.com")), request, db))
+            return 201
+        except HTTPException as e:
+            return e.status_code
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(register_once, range(16)))
+
+    assert results.count(201) == 1
+    assert results.count(400) == 15
+
+    db = TestingSessionLocal()
+    assert db.query(User).filter(User.email == "storm@example.com").count() == 1
+    db.close()
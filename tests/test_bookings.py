@@ -1,107 +1,11 @@
-import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.main import app
-from app.db.session import Base, get_db
-from app.core.security import get_password_hash
-from app.models.models import User, Service, ServiceCategory
 import uuid
+from datetime import date, timedelta
+from app.api.v1.bookings import service_price_cache
+from app.core.booking_state import compare_and_set_booking, status_values
+from app.models.models import Booking, Technician, User
 
-# Test database
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base.metadata.create_all(bind=engine)
-
-
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
-
-
-app.dependency_overrides[get_db] = override_get_db
-
-client = TestClient(app)
-
-
-@pytest.fixture
-def test_db():
-    Base.metadata.create_all(bind=engine)
-    yield
-    Base.metadata.drop_all(bind=engine)
-
-
-@pytest.fixture
-def test_customer(test_db):
-    db = TestingSessionLocal()
-    user = User(
-        id=uuid.uuid4(),
-        email="testcustomer@example.com",
-        password_hash=get_password_hash("Test123!"),
-        full_name="Test Customer",
-        phone="081234567890",
-        role="customer",
-        is_active=True,
-        is_verified=True,
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    db.close()
-    return user
-
-
-@pytest.fixture
-def test_service(test_db):
-    db = TestingSessionLocal()
-    
-    # Create category
-    category = ServiceCategory(
-        id=uuid.uuid4(),
-        name="Test Category",
-        slug="test-category",
-        is_active=True,
-    )
-    db.add(category)
-    db.commit()
-    
-    # Create service
-    service = Service(
-        id=uuid.uuid4(),
-        category_id=category.id,
-        name="Test Service",
-        slug="test-service",
-        description="Test service description",
-        base_price=100000,
-        duration_minutes=60,
-        is_active=True,
-    )
-    db.add(service)
-    db.commit()
-    db.refresh(service)
-    db.close()
-    return service
-
-
-@pytest.fixture
-def auth_token(test_customer):
-    """Get authentication token for test customer."""
-    response = client.post(
-        "/api/v1/auth/login",
-        json={
-            "email": "testcustomer@example.com",
-            "password": "Test123!"
-        }
-    )
-    return response.json()["access_token"]
-
-
-def test_create_booking_authenticated(test_customer, test_service, auth_token):
+def test_create_booking_authenticated(test_customer, test_service, auth_token, client):
     """Test creating a booking with valid authentication."""
     booking_data = {
         "service_id": str(test_service.id),
@@ -125,7 +29,7 @@ def test_create_booking_authenticated(test_customer, test_service, auth_token):
     assert data["total_price"] == "100000.00"
 
 
-def test_create_booking_unauthenticated(test_service):
+def test_create_booking_unauthenticated(test_service, client):
     """Test creating a booking without authentication."""
     booking_data = {
         "service_id": str(test_service.id),
@@ -138,7 +42,7 @@ def test_create_booking_unauthenticated(test_service):
     assert response.status_code == 403  # No auth header
 
 
-def test_create_booking_invalid_service(auth_token):
+def test_create_booking_invalid_service(auth_token, client):
     """Test creating a booking with invalid service ID."""
     booking_data = {
         "service_id": str(uuid.uuid4()),  # Non-existent service
@@ -157,7 +61,7 @@ def test_create_booking_invalid_service(auth_token):
     assert "not found" in response.json()["detail"].lower()
 
 
-def test_create_booking_past_date(test_service, auth_token):
+def test_create_booking_past_date(test_service, auth_token, client):
     """Test creating a booking with past date."""
     booking_data = {
         "service_id": str(test_service.id),
@@ -173,3 +77,155 @@ def test_create_booking_past_date(test_service, auth_token):
     )
     
     assert response.status_code == 422  # Validation error
+
+
+def test_create_booking_statement_count(test_service, auth_token, client, captured_sql):
+    """Test that creating a booking costs two INSERTs plus the user lookup, and the service lookup only once."""
+    service_price_cache.clear()
+    booking_data = {
+        "service_id": str(test_service.id),
+        "scheduled_date": (date.today() + timedelta(days=7)).isoformat(),
+        "scheduled_time": "10:00",
+        "address": "Jl. Test No. 123, Jakarta",
+    }
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    with captured_sql() as first_statements:
+        first = client.post("/api/v1/bookings", json=booking_data, headers=headers)
+    with captured_sql() as second_statements:
+        second = client.post("/api/v1/bookings", json=booking_data, headers=headers)
+
+    def verbs(statements):
+        return [s.split()[0].upper() for s in statements]
+
+    assert first.status_code == 201
+    assert second.status_code == 201
+    assert verbs(first_statements) == ["SELECT", "SELECT", "INSERT", "INSERT"]
+    assert verbs(second_statements) == ["SELECT", "INSERT", "INSERT"]
+    assert len(second.json()["payments"]) == 1
+    assert second.json()["payments"][0]["amount"] == "100000.00"
+
+
+def test_bulk_update_booking_status(test_customer, test_service, admin_token, client, create_bookings):
+    """Test that bulk status updates report per-id outcomes and skip closed bookings."""
+    pending_id, confirmed_id, completed_id = create_bookings(
+        test_customer, test_service, ["pending", "confirmed", "completed"]
+    )
+    missing_id = uuid.uuid4()
+
+    response = client.patch(
+        "/api/v1/bookings/bulk/status",
+        json={
+            "booking_ids": [str(pending_id), str(confirmed_id), str(completed_id), str(missing_id), str(pending_id)],
+            "status": "cancelled",
+        },
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["updated"] == 2
+    assert [(r["booking_id"], r["outcome"], r["status"]) for r in data["results"]] == [
+        (str(pending_id), "updated", "cancelled"),
+        (str(confirmed_id), "updated", "cancelled"),
+        (str(completed_id), "invalid_transition", "completed"),
+        (str(missing_id), "not_found", None),
+    ]
+
+
+def test_bulk_update_booking_status_requires_admin(test_customer, test_service, auth_token, client, create_bookings):
+    """Test that customers cannot use bulk status updates."""
+    (booking_id,) = create_bookings(test_customer, test_service, ["pending"])
+    response = client.patch(
+        "/api/v1/bookings/bulk/status",
+        json={"booking_ids": [str(booking_id)], "status": "cancelled"},
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert response.status_code == 403
+
+
+def test_bulk_assign_technician(test_customer, test_service, admin_token, client, TestingSessionLocal, create_bookings):
+    """Test that bulk assignment confirms assignable bookings only."""
+    pending_id, in_progress_id = create_bookings(test_customer, test_service, ["pending", "in_progress"])
+    db = TestingSessionLocal()
+    tech_user = User(
+        id=uuid.uuid4(),
+        email="tech@example.com",
+        password_hash="!",
+        full_name="Test Technician",
+        phone="081234567892",
+        role="technician",
+    )
+    technician = Technician(id=uuid.uuid4(), user_id=tech_user.id)
+    db.add_all([tech_user, technician])
+    db.commit()
+    technician_id = technician.id
+    db.close()
+
+    response = client.patch(
+        "/api/v1/bookings/bulk/assign",
+        json={"booking_ids": [str(pending_id), str(in_progress_id)], "technician_id": str(technician_id)},
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["updated"] == 1
+    assert [r["outcome"] for r in data["results"]] == ["updated", "invalid_transition"]
+
+    db = TestingSessionLocal()
+    assert db.get(Booking, pending_id).technician_id == technician_id
+    assert db.get(Booking, in_progress_id).technician_id is None
+    db.close()
+
+
+def test_update_booking_status_follows_transition_table(
+    test_customer, test_service, admin_token, client, create_bookings
+):
+    """Test that allowed transitions bump the version and disallowed ones return 409."""
+    pending_id, completed_id = create_bookings(test_customer, test_service, ["pending", "completed"])
+    headers = {"Authorization": f"Bearer {admin_token}"}
+
+    response = client.patch(f"/api/v1/bookings/{pending_id}/status?new_status=confirmed", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["status"] == "confirmed"
+    assert response.json()["version"] == 2
+
+    response = client.patch(f"/api/v1/bookings/{completed_id}/status?new_status=pending", headers=headers)
+    assert response.status_code == 409
+
+
+def test_update_booking_status_stale_version(
+    test_customer, test_service, admin_token, client, TestingSessionLocal, create_bookings
+):
+    """Test that a write based on an outdated version returns 409 and changes nothing."""
+    (booking_id,) = create_bookings(test_customer, test_service, ["pending"])
+    headers = {"Authorization": f"Bearer {admin_token}"}
+
+    response = client.patch(
+        f"/api/v1/bookings/{booking_id}/status?new_status=confirmed&expected_version=1", headers=headers
+    )
+    assert response.status_code == 200
+    response = client.patch(
+        f"/api/v1/bookings/{booking_id}/status?new_status=cancelled&expected_version=1", headers=headers
+    )
+    assert response.status_code == 409
+
+    db = TestingSessionLocal()
+    assert db.get(Booking, booking_id).status == "confirmed"
+    db.close()
+
+
+def test_compare_and_set_booking_single_winner(test_customer, test_service, TestingSessionLocal, create_bookings):
+    """Test that of two writers expecting the same status, only the first applies."""
+    (booking_id,) = create_bookings(test_customer, test_service, ["pending"])
+    first, second = TestingSessionLocal(), TestingSessionLocal()
+
+    assert compare_and_set_booking(first, booking_id, ["pending"], status_values("confirmed")) is not None
+    first.commit()
+    assert compare_and_set_booking(second, booking_id, ["pending"], status_values("cancelled")) is None
+    second.rollback()
+
+    booking = first.get(Booking, booking_id)
+    assert (booking.status, booking.version) == ("confirmed", 2)
+    first.close()
+    second.close()
@@ -0,0 +1,65 @@
+from app.api.v1 import chat
+from app.core.chat_cache import ChatResponseCache
+
+
+def make_cache(**kwargs):
+    return ChatResponseCache(**{"max_entries": 100, "ttl_seconds": 60, "similarity_threshold": 0.8, **kwargs})
+
+
+def test_exact_match_ignores_case_and_punctuation():
+    """Test that prompts differing only in case, punctuation and spacing share an entry."""
+    cache = make_cache()
+    cache.set("Berapa harga cuci AC?", "Rp 75.000")
+    assert cache.get("berapa  harga cuci ac") == ("Rp 75.000", "exact")
+
+
+def test_similar_prompt_matches_above_threshold():
+    """Test that near-identical prompts hit, and different questions miss."""
+    cache = make_cache()
+    cache.set("apakah teknisi perabox sudah bersertifikat", "Ya, semua teknisi kami bersertifikat.")
+    assert cache.get("apakah teknisi perabox sudah bersertifikat ya")[1] == "similar"
+    assert cache.get("apakah teknisi perabox bisa datang hari minggu") == (None, "miss")
+
+
+def test_prompts_with_different_numbers_never_match():
+    """Test that '1 pk' and '2 pk' questions are cached separately."""
+    cache = make_cache(similarity_threshold=0.5)
+    cache.set("pasang ac 1 pk berapa lama", "sekitar 2 jam")
+    assert cache.get("pasang ac 2 pk berapa lama") == (None, "miss")
+
+
+def test_expiry_eviction_and_catalog_change():
+    """Test TTL expiry, the entry bound and invalidation when the catalog changes."""
+    cache = make_cache(ttl_seconds=-1)
+    cache.set("halo", "hai")
+    assert cache.get("halo") == (None, "miss")
+
+    cache = make_cache(max_entries=2)
+    for prompt in ("satu", "dua", "tiga"):
+        cache.set(prompt, prompt)
+    assert len(cache) == 2 and cache.get("satu") == (None, "miss")
+
+    cache.sync_catalog(1)
+    cache.set("dua", "dua")
+    cache.sync_catalog(1)
+    assert len(cache) == 1
+    cache.sync_catalog(2)
+    assert len(cache) == 0
+
+
+def test_repeat_first_turn_served_from_cache(monkeypatch, client, fake_gemini):
+    """Test that a repeated first-turn question doesn't reach Gemini, but follow-up turns do."""
+    monkeypatch.setattr(chat.settings, "CHAT_RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(chat, "chat_response_cache", make_cache())
+
+    first = client.post("/api/v1/chat/message", json={"message": "Apakah ada garansi servis?"})
+    second = client.post("/api/v1/chat/message", json={"message": "apakah ada garansi servis"})
+    follow_up = client.post(
+        "/api/v1/chat/message",
+        json={"message": "apakah ada garansi servis", "session_id": second.json()["session_id"]},
+    )
+
+    assert second.json()["response"] == first.json()["response"]
+    assert second.json()["session_id"] != first.json()["session_id"]
+    assert follow_up.status_code == 200
+    assert len(fake_gemini.started_with) == 2
@@ -0,0 +1,68 @@
+from decimal import Decimal
+from types import SimpleNamespace
+from app.api.v1 import chat
+from app.core import chat_sessions as chat_sessions_module
+from app.core.chat_intents import ServiceCatalogIndex, match_intent
+
+
+def make_index():
+    index = ServiceCatalogIndex(refresh_seconds=60)
+    index.build([
+        SimpleNamespace(name="AC Maintenance", slug="ac-maintenance", description="Cuci AC lengkap.",
+                        base_price=Decimal("150000.00"), duration_minutes=90),
+        SimpleNamespace(name="AC Repair", slug="ac-repair", description="Perbaikan AC.",
+                        base_price=Decimal("250000.00"), duration_minutes=120),
+        SimpleNamespace(name="Light Installation", slug="light-installation", description="Pasang lampu.",
+                        base_price=Decimal("75000.00"), duration_minutes=60),
+    ])
+    return index
+
+
+def test_greeting_answered_locally():
+    """Test that short greetings don't need the LLM."""
+    assert match_intent("Halo kak!", make_index()).intent == "greeting"
+    assert match_intent("hello", make_index()).answer.startswith("Hi")
+
+
+def test_price_question_uses_catalog_price():
+    """Test that price questions are answered with the matching service's live price."""
+    match = match_intent("berapa harga cuci AC?", make_index())
+    assert match.intent == "price"
+    assert "AC Maintenance" in match.answer
+    assert "Rp 150.000" in match.answer
+
+    match = match_intent("harga pasang lampu", make_index())
+    assert "Rp 75.000" in match.answer
+
+
+def test_ambiguous_price_question_lists_catalog():
+    """Test that a price question matching several services lists them all."""
+    match = match_intent("harga AC berapa?", make_index())
+    assert match.intent == "price_list"
+    assert "AC Maintenance" in match.answer and "AC Repair" in match.answer
+
+
+def test_how_to_book_answered_locally():
+    """Test that booking instructions are answered locally."""
+    assert match_intent("gimana cara pesan?", make_index()).intent == "how_to_book"
+
+
+def test_open_ended_questions_escalate():
+    """Test that messages with details the index doesn't understand go to the LLM."""
+    index = make_index()
+    assert match_intent("AC saya bunyi keras dan airnya menetes, kenapa ya?", index) is None
+    assert match_intent("berapa harga AC di Bandung?", index) is None
+    assert match_intent("", index) is None
+
+
+def test_chat_endpoint_answers_locally_without_gemini(test_service, monkeypatch, client):
+    """Test that the endpoint serves catalog answers without calling Gemini."""
+    monkeypatch.setattr(chat_sessions_module, "get_redis", lambda: None)
+    monkeypatch.setattr(chat, "configure_genai", lambda: (_ for _ in ()).throw(AssertionError("LLM called")))
+    chat.catalog_index.invalidate()
+
+    response = client.post("/api/v1/chat/message", json={"message": "berapa harga test service?"})
+
+    assert response.status_code == 200
+    assert "Rp 100.000" in response.json()["response"]
+    assert response.json()["session_id"]
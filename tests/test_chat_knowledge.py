@@ -0,0 +1,91 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from app.core.chat_knowledge import KnowledgeIndex, knowledge_index, split_passages
+from app.models.models import Article, Service, ServiceCategory
+
+
+def seed_catalog(db):
+    category = ServiceCategory(id=uuid.uuid4(), name="Air Conditioning", slug="air-conditioning",
+                               description="Layanan perawatan dan perbaikan AC", is_active=True)
+    db.add(category)
+    db.flush()
+    services = {
+        name: Service(id=uuid.uuid4(), category_id=category.id, name=name, slug=name.lower().replace(" ", "-"),
+                      description=f"Layanan {name}", base_price=price, duration_minutes=60, is_active=True)
+        for name, price in [("AC Cleaning", 80000), ("AC Installation", 300000), ("Freon Refill", 200000)]
+    }
+    db.add_all(services.values())
+    now = datetime.now(timezone.utc)
+    db.add_all([
+        Article(title="Kenapa AC Tidak Dingin", slug="ac-tidak-dingin", published_at=now - timedelta(days=1),
+                content="AC tidak dingin biasanya karena freon habis atau filter kotor.\nCuci AC tiap 3 bulan."),
+        Article(title="Draft Promo Freon", slug="draft-promo", published_at=None, content="Diskon freon rahasia."),
+    ])
+    db.commit()
+    return services
+
+
+def test_split_passages_respects_word_limit():
+    """Test that long articles are chunked into small paragraph-aligned passages."""
+    text = "satu dua tiga\nempat lima\n" + " ".join(["kata"] * 25)
+    chunks = split_passages(text, max_words=10)
+    assert chunks[0] == "satu dua tiga empat lima"
+    assert all(len(chunk.split()) <= 10 for chunk in chunks)
+    assert sum(len(chunk.split()) for chunk in chunks) == 30
+
+
+def test_retrieval_ranks_live_catalog_and_published_articles(test_db, TestingSessionLocal):
+    """Test that questions retrieve the matching service with its current price and skip drafts."""
+    db = TestingSessionLocal()
+    seed_catalog(db)
+    index = KnowledgeIndex(refresh_seconds=60, passage_words=80)
+    index.refresh(db)
+    db.close()
+
+    top = index.search("berapa harga cuci AC?", k=2)
+    assert top[0].title == "AC Cleaning"
+    assert "Rp 80.000" in top[0].text
+
+    assert index.search("kenapa AC tidak dingin", k=1)[0].source == "article"
+    assert not any("rahasia" in p.text for p in index.search("promo freon", k=10))
+
+
+def test_refresh_reindexes_only_changes(test_db, TestingSessionLocal):
+    """Test incremental refresh: repricing updates the passage, deactivation removes it."""
+    db = TestingSessionLocal()
+    services = seed_catalog(db)
+    index = KnowledgeIndex(refresh_seconds=60, passage_words=80)
+    index.refresh(db)
+    version = index.version
+
+    index.refresh(db)
+    assert index.version == version
+
+    cleaning = db.get(Service, services["AC Cleaning"].id)
+    cleaning.base_price = 95000
+    cleaning.updated_at = datetime.now(timezone.utc) + timedelta(seconds=1)
+    db.get(Service, services["Freon Refill"].id).is_active = False
+    db.commit()
+    index.refresh(db)
+    db.close()
+
+    assert index.version > version
+    assert "Rp 95.000" in index.search("harga cleaning", k=1)[0].text
+    assert all(p.title != "Freon Refill" for p in index.search("freon refill", k=10))
+
+
+def test_chat_prompt_includes_retrieved_catalog_snippets(
+    test_db, monkeypatch, client, TestingSessionLocal, fake_gemini
+):
+    """Test that the system prompt carries the relevant live price instead of a hardcoded list."""
+    db = TestingSessionLocal()
+    seed_catalog(db)
+    db.close()
+    knowledge_index.invalidate()
+
+    resp = client.post("/api/v1/chat/message", json={"message": "AC saya perlu dicuci, kapan bisa datang?"})
+
+    assert resp.status_code == 200
+    system_prompt = fake_gemini.started_with[-1][0]["parts"][0]
+    assert "AC Cleaning" in system_prompt and "Rp 80.000" in system_prompt
+    assert "Rp 75,000" not in system_prompt
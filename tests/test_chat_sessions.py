@@ -0,0 +1,67 @@
+import asyncio
+from app.api.v1 import chat
+from app.core import chat_sessions as chat_sessions_module
+from app.core.chat_sessions import ChatSession, ChatSessionStore
+
+
+def test_evict_over_budget_removes_oldest_pairs():
+    """Test that history is trimmed oldest-first in user/model pairs, keeping the latest pair."""
+    session = ChatSession()
+    for i in range(4):
+        session.add_turn("user", "q" * 400)
+        session.add_turn("model", "a" * 400)
+
+    evicted = session.evict_over_budget(budget_tokens=250)
+
+    assert len(evicted) == 6
+    assert [t["role"] for t in session.turns] == ["user", "model"]
+
+
+def test_store_round_trip_without_redis(monkeypatch):
+    """Test that sessions are kept in memory when Redis is unavailable."""
+    monkeypatch.setattr(chat_sessions_module, "get_redis", lambda: None)
+    store = ChatSessionStore()
+    session = ChatSession(summary="s")
+    session.add_turn("user", "halo")
+
+    async def scenario():
+        await store.save(session)
+        return await store.get(session.id), await store.get("missing")
+
+    loaded, missing = asyncio.run(scenario())
+    assert loaded.turns == [{"role": "user", "content": "halo"}]
+    assert missing is None
+
+
+def test_chat_keeps_history_server_side(monkeypatch, client, fake_gemini):
+    """Test that follow-up turns only send the session id and the server replays the history."""
+    first = client.post("/api/v1/chat/message", json={"message": "halo"})
+    session_id = first.json()["session_id"]
+    second = client.post("/api/v1/chat/message", json={"message": "harga cuci AC?", "session_id": session_id})
+
+    assert second.status_code == 200
+    assert second.json()["session_id"] == session_id
+    replayed = [turn["parts"][0] for turn in fake_gemini.started_with[-1][2:]]
+    assert replayed == ["halo", "reply to halo"]
+
+
+def test_chat_summarizes_history_over_budget(monkeypatch, client, fake_gemini):
+    """Test that turns beyond the token budget are folded into the summary in the system prompt."""
+    monkeypatch.setattr(chat.settings, "CHAT_HISTORY_TOKEN_BUDGET", 50)
+
+    session_id = None
+    for i in range(3):
+        message = f"pertanyaan {i} " + "x" * 150
+        resp = client.post("/api/v1/chat/message", json={"message": message, "session_id": session_id})
+        session_id = resp.json()["session_id"]
+
+    assert len(fake_gemini.summarized) == 1
+    last_history = fake_gemini.started_with[-1]
+    assert "customer asked about AC cleaning" in last_history[0]["parts"][0]
+    assert len(last_history) == 4  # system prompt pair + the most recent pair
+
+
+def test_chat_rejects_oversized_message(client):
+    """Test that messages over the size limit are rejected before reaching the model."""
+    resp = client.post("/api/v1/chat/message", json={"message": "x" * (chat.settings.CHAT_MAX_MESSAGE_CHARS + 1)})
+    assert resp.status_code == 422
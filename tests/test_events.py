@@ -0,0 +1,62 @@
+import asyncio
+from app.core import events
+from app.core.events import EventBroker
+from app.api.v1.events import event_topics
+
+
+def test_broker_delivers_to_topic_subscribers(monkeypatch):
+    """Test that events reach each subscribed queue once and slow consumers drop the oldest."""
+    monkeypatch.setattr(events, "get_redis", lambda: None)
+    broker = EventBroker(queue_size=2)
+
+    async def scenario():
+        async with broker.subscribe(["user:1", "bookings"]) as both, broker.subscribe(["user:2"]) as other:
+            for i in range(3):
+                await broker.publish(["user:1", "bookings"], {"type": "booking.status", "n": i})
+            assert [both.get_nowait()["n"], both.get_nowait()["n"]] == [1, 2]
+            assert other.empty()
+        assert broker._subscribers == {}
+
+    asyncio.run(scenario())
+
+
+def test_event_topics_by_role():
+    """Test that customers, technicians and admins listen on their own topics."""
+    assert event_topics({"sub": "u1", "role": "customer"}) == ["user:u1"]
+    assert event_topics({"sub": "u2", "role": "technician", "technician_id": "t1"}) == ["user:u2", "technician:t1"]
+    assert event_topics({"sub": "u3", "role": "admin"}) == ["user:u3", "bookings"]
+
+
+def test_stream_requires_token(client):
+    """Test that the event stream rejects unauthenticated clients."""
+    assert client.get("/api/v1/events").status_code == 401
+    assert client.get("/api/v1/events?access_token=invalid").status_code == 401
+
+
+def test_status_change_publishes_event(test_customer, test_service, admin_token, monkeypatch, client, create_bookings):
+    """Test that a booking status change is pushed to the customer and admins after commit."""
+    published = []
+
+    async def record(topics, event):
+        published.append((topics, event))
+
+    monkeypatch.setattr(events.broker, "publish", record)
+    (booking_id,) = create_bookings(test_customer, test_service, ["pending"])
+
+    response = client.patch(
+        f"/api/v1/bookings/{booking_id}/status?new_status=confirmed",
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+
+    assert response.status_code == 200
+    assert published == [(
+        ["bookings", f"user:{test_customer.id}"],
+        {
+            "type": "booking.status",
+            "booking_id": str(booking_id),
+            "customer_id": str(test_customer.id),
+            "technician_id": None,
+            "status": "confirmed",
+            "version": 2,
+        },
+    )]
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.core import jobs
+from app.core.jobs import JobRunner, enqueue_job, job_handler, run_async
+from app.core.resilience import midtrans_guard
+from app.models.models import OutboxJob, Payment, ServiceCategory
+
+
+@pytest.fixture
+def runner(TestingSessionLocal):
+    return JobRunner(session_factory=TestingSessionLocal)
+
+
+@job_handler("tests.create_category")
+def create_category(db, payload):
+    db.add(ServiceCategory(name=payload["name"], slug=payload["name"]))
+
+
+@job_handler("tests.fail")
+def fail(db, payload):
+    raise RuntimeError("upstream unavailable")
+
+
+slow_cancelled = threading.Event()
+
+
+async def slow_upstream():
+    try:
+        await asyncio.sleep(10)
+    except asyncio.CancelledError:
+        slow_cancelled.set()
+        raise
+
+
+@job_handler("tests.slow_upstream")
+def call_slow_upstream(db, payload):
+    run_async(slow_upstream())
+
+
+@pytest.fixture
+def enqueue(TestingSessionLocal):
+    def add(kind, payload):
+        db = TestingSessionLocal()
+        enqueue_job(db, kind, payload)
+        db.commit()
+        db.close()
+    return add
+
+
+def test_enqueued_job_is_dropped_on_rollback(test_db, TestingSessionLocal, runner):
+    """Test that a job only exists if the transaction that enqueued it commits."""
+    db = TestingSessionLocal()
+    enqueue_job(db, "tests.create_category", {"name": "never"})
+    db.rollback()
+    db.close()
+    assert runner.claim() is None
+
+
+def test_job_runs_and_commits_with_handler_writes(test_db, TestingSessionLocal, runner, enqueue):
+    """Test that a handler's writes commit together with the job being marked done."""
+    enqueue("tests.create_category", {"name": "from-job"})
+
+    job = runner.claim()
+    assert (job.kind, job.attempts) == ("tests.create_category", 1)
+    assert runner.claim() is None  # leased
+    assert runner.run(job) == "done"
+
+    db = TestingSessionLocal()
+    assert db.query(ServiceCategory).filter(ServiceCategory.slug == "from-job").count() == 1
+    assert db.query(OutboxJob).one().status == "done"
+    db.close()
+
+
+def test_failed_job_retries_with_backoff_then_dead_letters(test_db, monkeypatch, TestingSessionLocal, runner, enqueue):
+    """Test that failures are rescheduled, and dead-lettered after the last attempt."""
+    monkeypatch.setattr(jobs.settings, "JOB_MAX_ATTEMPTS", 2)
+    enqueue("tests.fail", {})
+
+    assert runner.run(runner.claim()) == "retry"
+    assert runner.claim() is None  # backing off
+
+    db = TestingSessionLocal()
+    db.query(OutboxJob).update({"run_after": jobs.utcnow()})
+    db.commit()
+    db.close()
+    assert runner.run(runner.claim()) == "dead"
+
+    db = TestingSessionLocal()
+    job = db.query(OutboxJob).one()
+    assert (job.status, job.attempts) == ("dead", 2)
+    assert "upstream unavailable" in job.last_error
+    db.close()
+
+
+def test_cancelling_booking_expires_payment_in_background(
+    test_customer, test_service, auth_token, client, TestingSessionLocal, create_bookings, runner
+):
+    """Test that cancellation enqueues the payment expiry instead of running it inline."""
+    (booking_id,) = create_bookings(test_customer, test_service, ["pending"])
+    db = TestingSessionLocal()
+    db.add(Payment(booking_id=booking_id, amount=100000, status="pending"))
+    db.commit()
+    db.close()
+
+    response = client.patch(
+        f"/api/v1/bookings/{booking_id}/status?new_status=cancelled",
+        headers={"Authorization": f"Bearer {auth_token}"}
+    )
+    assert response.status_code == 200
+
+    job = runner.claim()
+    assert job.kind == "payments.expire_transaction"
+    assert runner.run(job) == "done"
+
+    db = TestingSessionLocal()
+    assert db.query(Payment).filter(Payment.booking_id == booking_id).one().status == "failed"
+    db.close()
+
+
+def test_payment_expiry_goes_through_the_midtrans_guard(
+    test_customer, test_service, monkeypatch, TestingSessionLocal, create_bookings, runner, enqueue
+):
+    """Test that the expiry job respects the Midtrans circuit and is retried while it is open."""
+    (booking_id,) = create_bookings(test_customer, test_service, ["cancelled"])
+    db = TestingSessionLocal()
+    db.add(Payment(booking_id=booking_id, amount=100000, status="pending", transaction_id="midtrans-1"))
+    db.commit()
+    db.close()
+    monkeypatch.setattr(midtrans_guard.breaker, "state", "open")
+    monkeypatch.setattr(midtrans_guard.breaker, "_opened_at", time.monotonic())
+    enqueue("payments.expire_transaction", {"booking_id": str(booking_id)})
+
+    assert runner.run(runner.claim()) == "retry"
+
+    db = TestingSessionLocal()
+    assert db.query(Payment).filter(Payment.booking_id == booking_id).one().status == "pending"
+    assert "circuit_open" in db.query(OutboxJob).one().last_error
+    db.close()
+
+
+def test_coroutine_outlasting_the_lease_is_cancelled(test_db, monkeypatch, runner, enqueue):
+    """Test that a handler's coroutine on the app loop is cancelled, not left running, when it times out."""
+    monkeypatch.setattr(jobs.settings, "JOB_LEASE_SECONDS", 0.1)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    runner._loop = loop
+    enqueue("tests.slow_upstream", {})
+    try:
+        assert runner.run(runner.claim()) == "retry"
+        assert slow_cancelled.wait(timeout=2)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def test_async_handlers_are_refused():
+    """Test that coroutine handlers can't be registered: they would share the worker thread's Session."""
+    with pytest.raises(TypeError):
+        @job_handler("tests.async")
+        async def handler(db, payload):
+            pass
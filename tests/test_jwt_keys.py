@@ -0,0 +1,79 @@
+import json
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from jose import JWTError
+from app.core import jwt_keys
+
+CLAIMS = {"sub": "user-1", "exp": 4102444800, "type": "access"}
+
+
+def write_ec_key(path):
+    key = ec.generate_private_key(ec.SECP256R1())
+    path.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ))
+
+
+@pytest.fixture
+def es256(monkeypatch):
+    monkeypatch.setattr(jwt_keys.settings, "ALGORITHM", "ES256")
+    monkeypatch.setattr(jwt_keys.settings, "JWT_JWKS_PATH", None)
+
+
+def test_rotated_key_still_verifies_via_jwks(tmp_path, monkeypatch, es256):
+    """Test that tokens signed by the previous key verify after rotation while its JWK is published."""
+    old_key, new_key = tmp_path / "old.pem", tmp_path / "new.pem"
+    write_ec_key(old_key)
+    write_ec_key(new_key)
+
+    monkeypatch.setattr(jwt_keys.settings, "JWT_PRIVATE_KEY_PATH", str(old_key))
+    monkeypatch.setattr(jwt_keys.settings, "JWT_KEY_ID", "2026-01")
+    old_ring = jwt_keys.KeyRing()
+    old_token = old_ring.sign(CLAIMS)
+
+    jwks_path = tmp_path / "jwks.json"
+    jwks_path.write_text(json.dumps({"keys": old_ring.public_jwks}))
+    monkeypatch.setattr(jwt_keys.settings, "JWT_PRIVATE_KEY_PATH", str(new_key))
+    monkeypatch.setattr(jwt_keys.settings, "JWT_KEY_ID", "2026-02")
+    monkeypatch.setattr(jwt_keys.settings, "JWT_JWKS_PATH", str(jwks_path))
+    new_ring = jwt_keys.KeyRing()
+
+    assert new_ring.verify(old_token)["sub"] == "user-1"
+    assert new_ring.verify(new_ring.sign(CLAIMS))["sub"] == "user-1"
+    assert {k["kid"] for k in new_ring.public_jwks} == {"2026-01", "2026-02"}
+    assert all("d" not in k for k in new_ring.public_jwks)
+
+
+def test_unknown_kid_is_rejected(tmp_path, monkeypatch, es256):
+    """Test that tokens from a key outside the JWKS fail verification."""
+    key_a, key_b = tmp_path / "a.pem", tmp_path / "b.pem"
+    write_ec_key(key_a)
+    write_ec_key(key_b)
+
+    monkeypatch.setattr(jwt_keys.settings, "JWT_PRIVATE_KEY_PATH", str(key_a))
+    monkeypatch.setattr(jwt_keys.settings, "JWT_KEY_ID", "a")
+    token = jwt_keys.KeyRing().sign(CLAIMS)
+
+    monkeypatch.setattr(jwt_keys.settings, "JWT_PRIVATE_KEY_PATH", str(key_b))
+    monkeypatch.setattr(jwt_keys.settings, "JWT_KEY_ID", "b")
+    with pytest.raises(JWTError):
+        jwt_keys.KeyRing().verify(token)
+
+
+def test_half_written_jwks_keeps_previous_keys(tmp_path, monkeypatch, es256):
+    """Test that a reload hitting an invalid JWKS file keeps the loaded keys instead of failing requests."""
+    key = tmp_path / "key.pem"
+    write_ec_key(key)
+    jwks_path = tmp_path / "jwks.json"
+    jwks_path.write_text(json.dumps({"keys": []}))
+    monkeypatch.setattr(jwt_keys.settings, "JWT_PRIVATE_KEY_PATH", str(key))
+    monkeypatch.setattr(jwt_keys.settings, "JWT_KEY_ID", "a")
+    monkeypatch.setattr(jwt_keys.settings, "JWT_JWKS_PATH", str(jwks_path))
+    ring = jwt_keys.KeyRing()
+    token = ring.sign(CLAIMS)
+
+    jwks_path.write_text('{"keys": [')
+    ring._mtimes, ring._checked_at = (), 0.0
+
+    assert ring.verify(token)["sub"] == "user-1"
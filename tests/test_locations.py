@@ -0,0 +1,92 @@
+import asyncio
+import uuid
+from decimal import Decimal
+import pytest
+from app.core.locations import location_store
+from app.core.security import get_password_hash
+from app.models.models import Technician, User
+
+
+@pytest.fixture
+def store(test_db, monkeypatch, TestingSessionLocal):
+    """The app's location store, writing to the test database and starting empty."""
+    monkeypatch.setattr(location_store, "session_factory", TestingSessionLocal)
+    monkeypatch.setattr(location_store, "_latest", {})
+    monkeypatch.setattr(location_store, "_dirty", set())
+    return location_store
+
+
+@pytest.fixture
+def technician_token(client, TestingSessionLocal):
+    """Factory creating a technician and returning their access token."""
+    def create(email):
+        db = TestingSessionLocal()
+        user = User(id=uuid.uuid4(), email=email, password_hash=get_password_hash("Test123!"),
+                    full_name="Teknisi", phone="081200000000", role="technician", is_active=True, is_verified=True)
+        db.add_all([user, Technician(user_id=user.id)])
+        db.commit()
+        db.close()
+        return client.post("/api/v1/auth/login", json={"email": email, "password": "Test123!"}).json()["access_token"]
+    return create
+
+
+@pytest.fixture
+def ping(client):
+    def send(token, latitude, longitude):
+        return client.post("/api/v1/technicians/me/location", json={"latitude": latitude, "longitude": longitude},
+                           headers={"Authorization": f"Bearer {token}"})
+    return send
+
+
+@pytest.fixture
+def positions(TestingSessionLocal):
+    """Stored (latitude, longitude) by technician email."""
+    def read():
+        db = TestingSessionLocal()
+        rows = {t.user.email: (t.latitude, t.longitude) for t in db.query(Technician).all()}
+        db.close()
+        return rows
+    return read
+
+
+def test_pings_are_deduplicated_and_flushed_in_one_batch(store, captured_sql, technician_token, ping, positions):
+    """Test that unmoved pings are dropped and moved technicians are written by one batched UPDATE."""
+    budi, sari = technician_token("budi@example.com"), technician_token("sari@example.com")
+
+    assert ping(budi, -6.2, 106.8).json() == {"moved": True}
+    assert ping(budi, -6.200001, 106.800001).json() == {"moved": False}
+    assert ping(budi, -6.21, 106.81).json() == {"moved": True}
+    assert ping(sari, -6.9, 107.6).status_code == 202
+    assert positions()["budi@example.com"] == (None, None)
+
+    with captured_sql() as statements:
+        assert asyncio.run(store.flush()) == 2
+
+    assert len([s for s in statements if s.startswith("UPDATE")]) == 1
+    assert positions()["budi@example.com"] == (Decimal("-6.21"), Decimal("106.81"))
+    assert positions()["sari@example.com"] == (Decimal("-6.9"), Decimal("107.6"))
+    assert asyncio.run(store.flush()) == 0
+
+
+def test_failed_flush_keeps_positions(store, monkeypatch, technician_token, ping, positions):
+    """Test that positions whose write failed are written by the next flush."""
+    token = technician_token("budi@example.com")
+    ping(token, -6.2, 106.8)
+
+    def unavailable(rows):
+        raise ConnectionError("database unavailable")
+
+    write = store.write
+    monkeypatch.setattr(store, "write", unavailable)
+    with pytest.raises(ConnectionError):
+        asyncio.run(store.flush())
+    monkeypatch.setattr(store, "write", write)
+
+    assert asyncio.run(store.flush()) == 1
+    assert positions()["budi@example.com"] == (Decimal("-6.2"), Decimal("106.8"))
+
+
+def test_only_technicians_report_location(store, auth_token, technician_token, ping):
+    """Test that customers can't report a location and coordinates are validated."""
+    assert ping(auth_token, -6.2, 106.8).status_code == 403
+    assert ping(technician_token("budi@example.com"), -95, 106.8).status_code == 422
@@ -0,0 +1,79 @@
+import logging
+from types import SimpleNamespace
+from app.db.profiling import SqlProfile, QueryRecord, _explain, log_profile, statement_shape, settings
+
+
+def test_statement_shape_ignores_bind_numbering_and_in_list_length():
+    """Test that executions of the same query normalize to one shape."""
+    a = statement_shape("SELECT * FROM bookings WHERE id IN (%(id_1_1)s, %(id_1_2)s)")
+    b = statement_shape("SELECT *\n FROM bookings  WHERE id IN (%(id_1_1)s, %(id_1_2)s, %(id_1_3)s)")
+    assert a == b
+
+
+def test_n_plus_one_flags_repeated_shapes():
+    """Test that repeated identical-shape statements are reported as N+1."""
+    profile = SqlProfile()
+    for i in range(settings.SQL_N_PLUS_ONE_THRESHOLD):
+        profile.queries.append(QueryRecord(
+            route="/api/v1/technicians/available",
+            statement=f"SELECT * FROM users WHERE users.id = %(pk_{i})s",
+            parameters={},
+            duration_ms=1.0,
+        ))
+    profile.queries.append(QueryRecord("/api/v1/technicians/available", "SELECT 1", {}, 1.0))
+
+    flagged = profile.n_plus_one()
+    assert len(flagged) == 1
+    assert flagged[0][1] == settings.SQL_N_PLUS_ONE_THRESHOLD
+
+
+def test_profile_only_reported_to_admins():
+    """Test that header-requested profiles are withheld from non-admin users."""
+    assert not SqlProfile().is_authorized("customer")
+    assert SqlProfile().is_authorized("admin")
+    assert SqlProfile(forced=True).is_authorized(None)
+
+
+class _Cursor:
+    def __init__(self, executed):
+        self.executed = executed
+
+    def execute(self, sql, parameters=None):
+        self.executed.append(sql)
+        if sql.startswith("EXPLAIN"):
+            raise RuntimeError("syntax error")
+
+    def close(self):
+        pass
+
+
+def test_failed_explain_is_rolled_back_to_savepoint():
+    """Test that a failing EXPLAIN on Postgres doesn't leave the request's transaction aborted."""
+    executed = []
+    conn = SimpleNamespace(
+        dialect=SimpleNamespace(name="postgresql"),
+        connection=SimpleNamespace(cursor=lambda: _Cursor(executed)),
+    )
+
+    assert _explain(conn, "SELECT 1", {}).startswith("EXPLAIN failed")
+    assert executed == [
+        "SAVEPOINT perabox_explain",
+        "EXPLAIN SELECT 1",
+        "ROLLBACK TO SAVEPOINT perabox_explain",
+        "RELEASE SAVEPOINT perabox_explain",
+    ]
+
+
+def test_slow_query_log_omits_parameters(caplog, monkeypatch):
+    """Test that slow-query logs carry the statement shape but never bound values."""
+    monkeypatch.setattr(settings, "SQL_SLOW_QUERY_MS", 0)
+    profile = SqlProfile()
+    profile.queries.append(QueryRecord(
+        "/api/v1/auth/login", "SELECT * FROM users WHERE email = %(email_1)s", {"email_1": "budi@example.com"}, 5.0,
+    ))
+
+    with caplog.at_level(logging.WARNING, logger="perabox.sql"):
+        log_profile(SimpleNamespace(method="POST", route="/api/v1/auth/login"), profile)
+
+    assert "users WHERE email" in caplog.text
+    assert "budi@example.com" not in caplog.text
@@ -0,0 +1,65 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from app.core import rate_limit
+from app.core.rate_limit import InMemorySlidingWindow, enforce_rate_limit
+
+
+def test_sliding_window_blocks_after_limit():
+    """Test that attempts beyond the limit are rejected with a retry hint."""
+    window = InMemorySlidingWindow()
+    for _ in range(3):
+        allowed, _ = window.hit("auth:login:email:a@example.com", limit=3, window_seconds=60)
+        assert allowed
+
+    allowed, retry_after = window.hit("auth:login:email:a@example.com", limit=3, window_seconds=60)
+    assert not allowed
+    assert 0 < retry_after <= 60
+
+    # Other keys are unaffected
+    allowed, _ = window.hit("auth:login:email:b@example.com", limit=3, window_seconds=60)
+    assert allowed
+
+
+def test_sliding_window_evicts_oldest_keys():
+    """Test that the in-memory store stays bounded."""
+    window = InMemorySlidingWindow(max_keys=2)
+    for key in ("a", "b", "c"):
+        window.hit(key, limit=1, window_seconds=60)
+    allowed, _ = window.hit("a", limit=1, window_seconds=60)
+    assert allowed
+
+
+def test_enforce_rate_limit_raises_429(monkeypatch):
+    """Test that exceeding the limit raises 429 with Retry-After, using the fallback when Redis is down."""
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "get_redis", lambda: None)
+    monkeypatch.setattr(rate_limit, "limiter", rate_limit.RateLimiter())
+
+    async def attempt():
+        await enforce_rate_limit("auth:login:ip:203.0.113.7", limit=2, window_seconds=60)
+
+    asyncio.run(attempt())
+    asyncio.run(attempt())
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(attempt())
+    assert exc.value.status_code == 429
+    assert int(exc.value.headers["Retry-After"]) >= 1
+
+
+def forwarded_request(forwarded_for):
+    return SimpleNamespace(headers={"x-forwarded-for": forwarded_for}, client=SimpleNamespace(host="10.0.0.1"))
+
+
+def test_client_ip_ignores_spoofed_forwarded_hops(monkeypatch):
+    """Test that only the hops appended by trusted proxies pick the rate-limit bucket."""
+    assert rate_limit.client_ip(forwarded_request("1.2.3.4, 203.0.113.7")) == "10.0.0.1"  # not trusted by default
+
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_TRUST_FORWARDED_FOR", True)
+    assert rate_limit.client_ip(forwarded_request("1.2.3.4, 203.0.113.7")) == "203.0.113.7"
+    assert rate_limit.client_ip(forwarded_request("5.6.7.8, 203.0.113.7")) == "203.0.113.7"
+
+    monkeypatch.setattr(rate_limit.settings, "RATE_LIMIT_TRUSTED_PROXIES", 2)
+    assert rate_limit.client_ip(forwarded_request("9.9.9.9, 203.0.113.7, 10.1.1.1")) == "203.0.113.7"
+    assert rate_limit.client_ip(forwarded_request("10.1.1.1")) == "10.0.0.1"
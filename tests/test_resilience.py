@@ -0,0 +1,145 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.core.context import RequestContext, _request_context
+from app.core.resilience import UpstreamGuard, UpstreamUnavailable, gemini_guard
+
+
+def make_guard(**overrides):
+    options = dict(timeout=1.0, max_concurrency=2, queue_timeout=0.05, failure_threshold=2, reset_seconds=0.1)
+    options.update(overrides)
+    return UpstreamGuard("tests", **options)
+
+
+class ProviderError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.http_status_code = code
+
+
+def fail_with(code):
+    def call():
+        raise ProviderError(code)
+    return call
+
+
+def test_circuit_opens_after_failures_and_probes_when_half_open():
+    """Test that consecutive failures open the circuit and a single half-open probe closes it."""
+    guard = make_guard()
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(ProviderError):
+                await guard.call("op", fail_with(503))
+        with pytest.raises(UpstreamUnavailable) as rejected:
+            await guard.call("op", lambda: "ok")
+        assert rejected.value.reason == "circuit_open"
+
+        await asyncio.sleep(0.15)
+        probe = asyncio.ensure_future(guard.call("op", time.sleep, 0.05))
+        await asyncio.sleep(0.01)
+        # Only one probe at a time while half-open
+        with pytest.raises(UpstreamUnavailable):
+            await guard.call("op", lambda: "ok")
+        await probe
+        assert guard.breaker.state == "closed"
+        assert await guard.call("op", lambda: "ok") == "ok"
+
+    asyncio.run(scenario())
+
+
+def test_failed_probe_reopens_circuit():
+    """Test that a failing half-open probe opens the circuit again."""
+    guard = make_guard(failure_threshold=1)
+
+    async def scenario():
+        with pytest.raises(ProviderError):
+            await guard.call("op", fail_with(500))
+        await asyncio.sleep(0.15)
+        with pytest.raises(ProviderError):
+            await guard.call("op", fail_with(500))
+        assert guard.breaker.state == "open"
+
+    asyncio.run(scenario())
+
+
+def test_probe_cancelled_while_queued_frees_the_circuit():
+    """Test that a half-open probe cancelled while waiting for a bulkhead slot lets the next call probe."""
+    guard = make_guard(failure_threshold=1, max_concurrency=1, queue_timeout=1.0)
+
+    async def scenario():
+        with pytest.raises(ProviderError):
+            await guard.call("op", fail_with(500))
+        await asyncio.sleep(0.15)
+
+        semaphore = guard._get_semaphore()
+        await semaphore.acquire()  # Slot held elsewhere
+        probe = asyncio.ensure_future(guard.call("op", lambda: "ok"))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        semaphore.release()
+
+        assert await guard.call("op", lambda: "ok") == "ok"
+        assert guard.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_client_errors_do_not_trip_circuit():
+    """Test that 4xx answers from a healthy provider don't count as failures."""
+    guard = make_guard(failure_threshold=1)
+
+    async def scenario():
+        for _ in range(3):
+            with pytest.raises(ProviderError):
+                await guard.call("op", fail_with(400))
+        assert guard.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_bulkhead_rejects_when_full_and_timed_out_call_keeps_slot():
+    """Test the concurrency cap, and that an abandoned call holds its slot until its thread returns."""
+    guard = make_guard(max_concurrency=1, timeout=0.05, failure_threshold=10)
+    hung = threading.Event()
+
+    async def scenario():
+        with pytest.raises(UpstreamUnavailable) as timed_out:
+            await guard.call("op", hung.wait, 5)
+        assert timed_out.value.reason == "timeout"
+
+        with pytest.raises(UpstreamUnavailable) as rejected:
+            await guard.call("op", lambda: "ok")
+        assert rejected.value.reason == "bulkhead_full"
+
+        hung.set()
+        await asyncio.sleep(0.05)
+        assert await guard.call("op", lambda: "ok") == "ok"
+
+    asyncio.run(scenario())
+
+
+def test_call_is_refused_past_request_deadline():
+    """Test that no upstream call starts once the request's deadline has passed."""
+    guard = make_guard()
+    token = _request_context.set(RequestContext(method="POST", path="/", deadline=time.monotonic() - 1))
+    try:
+        with pytest.raises(UpstreamUnavailable) as rejected:
+            asyncio.run(guard.call("op", lambda: "ok"))
+    finally:
+        _request_context.reset(token)
+    assert rejected.value.reason == "deadline"
+
+
+def test_chat_returns_503_while_gemini_circuit_is_open(monkeypatch, client, fake_gemini):
+    """Test that chat fails fast with 503 and Retry-After when Gemini's circuit is open."""
+    monkeypatch.setattr(gemini_guard.breaker, "state", "open")
+    monkeypatch.setattr(gemini_guard.breaker, "_opened_at", time.monotonic())
+
+    resp = client.post("/api/v1/chat/message", json={"message": "AC saya bocor dan berisik"})
+
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == str(int(gemini_guard.breaker.reset_seconds))
@@ -0,0 +1,101 @@
+import json
+import pytest
+from app.api.v1.testimonials import TestimonialSnapshot, testimonial_snapshot
+from app.models.models import Testimonial
+
+
+@pytest.fixture
+def seed_testimonials(TestingSessionLocal):
+    def seed(customer, ratings, featured=()):
+        db = TestingSessionLocal()
+        db.add_all([
+            Testimonial(customer_id=customer.id, content=f"Teknisi cepat dan rapi #{i}", rating=rating,
+                        is_featured=i in featured)
+            for i, rating in enumerate(ratings)
+        ])
+        db.commit()
+        db.close()
+        testimonial_snapshot.clear()
+    return seed
+
+
+def test_featured_testimonials_served_from_snapshot(test_customer, client, captured_sql, seed_testimonials):
+    """Test aggregates and featured rows, and that repeat reads don't query the table."""
+    seed_testimonials(test_customer, [5, 5, 4, 2], featured={0, 2})
+
+    first = client.get("/api/v1/testimonials/featured")
+    body = first.json()
+    assert body["summary"] == {"count": 4, "average": 4.0, "distribution": {"1": 0, "2": 1, "3": 0, "4": 1, "5": 2}}
+    assert sorted(t["rating"] for t in body["featured"]) == [4, 5]
+    assert "public" in first.headers["Cache-Control"]
+
+    with captured_sql() as statements:
+        again = client.get("/api/v1/testimonials/featured")
+    assert again.json() == body
+    assert not any("testimonials" in s for s in statements)
+
+
+def test_featured_testimonials_not_modified(test_customer, client, seed_testimonials):
+    """Test that a matching If-None-Match gets 304 without a body."""
+    seed_testimonials(test_customer, [5])
+    etag = client.get("/api/v1/testimonials/featured").headers["ETag"]
+
+    resp = client.get("/api/v1/testimonials/featured", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.content == b""
+
+
+def test_writes_refresh_snapshot(test_customer, auth_token, admin_token, client, seed_testimonials):
+    """Test that creating and featuring testimonials updates the snapshot immediately."""
+    seed_testimonials(test_customer, [3])
+    before = client.get("/api/v1/testimonials/featured")
+
+    created = client.post(
+        "/api/v1/testimonials",
+        json={"content": "Pelayanan sangat memuaskan!", "rating": 5},
+        headers={"Authorization": f"Bearer {auth_token}"},
+    )
+    assert created.status_code == 201
+    after = client.get("/api/v1/testimonials/featured")
+    assert after.json()["summary"]["count"] == 2
+    assert after.headers["ETag"] != before.headers["ETag"]
+
+    resp = client.patch(
+        f"/api/v1/testimonials/{created.json()['id']}/featured",
+        params={"is_featured": True},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert resp.status_code == 200
+    featured = client.get("/api/v1/testimonials/featured").json()["featured"]
+    assert [t["content"] for t in featured] == ["Pelayanan sangat memuaskan!"]
+
+
+def test_write_drops_snapshot_in_other_workers(
+    test_customer, admin_token, client, TestingSessionLocal, seed_testimonials
+):
+    """Test that unfeaturing a testimonial drops another worker's snapshot instead of waiting for its max age."""
+    seed_testimonials(test_customer, [5], featured={0})
+    other_worker = TestimonialSnapshot(max_age_seconds=300)
+    db = TestingSessionLocal()
+    assert len(json.loads(other_worker.get(db).body)["featured"]) == 1
+    testimonial_id = db.query(Testimonial).one().id
+
+    resp = client.patch(
+        f"/api/v1/testimonials/{testimonial_id}/featured",
+        params={"is_featured": False},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+
+    assert resp.status_code == 200
+    assert json.loads(other_worker.get(db).body)["featured"] == []
+    db.close()
+
+
+def test_only_customers_leave_testimonials(test_db, admin_token, client):
+    """Test that non-customers can't post testimonials."""
+    resp = client.post(
+        "/api/v1/testimonials",
+        json={"content": "Admin menulis ulasan", "rating": 5},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert resp.status_code == 403
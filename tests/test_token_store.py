@@ -0,0 +1,31 @@
+import asyncio
+from app.core import token_store
+from app.core.token_store import RefreshTokenStore, TOKEN_OK, TOKEN_REUSED, TOKEN_REVOKED
+
+
+def test_refresh_token_reuse_revokes_family(monkeypatch):
+    """Test that replaying a used refresh token revokes every token in its session."""
+    monkeypatch.setattr(token_store, "get_redis", lambda: None)
+    store = RefreshTokenStore()
+
+    async def scenario():
+        first = await store.consume("jti-1", "family-1", ttl_seconds=60)
+        rotated = await store.consume("jti-2", "family-1", ttl_seconds=60)
+        replay = await store.consume("jti-1", "family-1", ttl_seconds=60)
+        descendant = await store.consume("jti-3", "family-1", ttl_seconds=60)
+        other_session = await store.consume("jti-4", "family-2", ttl_seconds=60)
+        return first, rotated, replay, descendant, other_session
+
+    assert asyncio.run(scenario()) == (TOKEN_OK, TOKEN_OK, TOKEN_REUSED, TOKEN_REVOKED, TOKEN_OK)
+
+
+def test_logout_revokes_family(monkeypatch):
+    """Test that a revoked session's tokens can no longer be consumed."""
+    monkeypatch.setattr(token_store, "get_redis", lambda: None)
+    store = RefreshTokenStore()
+
+    async def scenario():
+        await store.revoke_family("family-1")
+        return await store.consume("jti-1", "family-1", ttl_seconds=60)
+
+    assert asyncio.run(scenario()) == TOKEN_REVOKED